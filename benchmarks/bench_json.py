@@ -0,0 +1,105 @@
+"""Response encoding: FastAPI's default path vs `src.api.responses`.
+
+    python -m benchmarks.bench_json
+
+"default" mirrors what FastAPI does for a route with `response_model`:
+validate the returned model against the response field, `jsonable_encoder`
+it and `json.dumps` the result. "fast" is `json_response()`: the model is
+dumped by pydantic and encoded by orjson, streamed for large file bodies.
+Payloads are shaped like real Zoho responses. For the file both paths start
+from the raw bytes, so the legacy base64 step is timed too, and streamed
+bodies are drained on one long lived event loop, as in the server.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.api.responses import json_response
+from src.api.schemas import AnalyzeIntentResponse, ExecuteActionResponse, SuggestedAction
+from src.serialization import Base64Body, dumps, loads
+
+
+def task_list(n=500):
+    return {"tasks": [
+        {
+            "id": str(10**15 + i), "name": f"Task {i}: fix payment retries", "description": "x" * 400,
+            "status": {"name": "Open", "id": "1", "color": "#fff"}, "priority": "High",
+            "owners": [{"id": str(i), "name": "Some One", "email": "some.one@example.com"}],
+            "start_date": "2025-01-10", "end_date": "2025-01-12", "tags": ["backend", "payments"],
+            "created_time": "2025-01-01T10:00:00+05:30", "link": {"self": {"url": "https://projectsapi.zoho.com/x"}},
+        } for i in range(n)
+    ]}
+
+
+def suggestions(n=4):
+    return AnalyzeIntentResponse(suggestions=[
+        SuggestedAction(tool="jira", score=0.9, title="Create ticket", description="Track the bug",
+                        expected_fields=["project_key", "summary", "description"],
+                        prefill={"summary": "Payment bug", "description": "y" * 300})
+        for _ in range(n)
+    ])
+
+
+def default_render(model, response_type):
+    validated = TypeAdapter(response_type).validate_python(model, from_attributes=True)
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+_loop = asyncio.new_event_loop()
+
+
+def fast_render(model):
+    resp = json_response(model)
+    if hasattr(resp, "body"):
+        return resp.body
+
+    async def collect():
+        return b"".join([c async for c in resp.body_iterator])
+    return _loop.run_until_complete(collect())
+
+
+def file_response(file_bytes: bytes, legacy: bool) -> ExecuteActionResponse:
+    # the legacy route built the base64 string up front
+    body = Base64Body(file_bytes).encode() if legacy else Base64Body(file_bytes)
+    return ExecuteActionResponse(success=True, result={"action_resp": {"file_id": str(uuid.uuid4()), "file_base64": body}})
+
+
+def bench(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    file_bytes = os.urandom(5 * 1024 * 1024)
+    analyze = suggestions()
+    tasks = ExecuteActionResponse(success=True, result={"action_resp": task_list()})
+    cases = [
+        ("analyze (4 suggestions)", lambda: default_render(analyze, AnalyzeIntentResponse), lambda: fast_render(analyze), 2000),
+        ("task list (500 tasks)", lambda: default_render(tasks, ExecuteActionResponse), lambda: fast_render(tasks), 50),
+        ("workdrive 5MB file",
+         lambda: default_render(file_response(file_bytes, legacy=True), ExecuteActionResponse),
+         lambda: fast_render(file_response(file_bytes, legacy=False)), 10),
+    ]
+    print(f"{'payload':<26} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for name, default, fast_path, repeat in cases:
+        slow = bench(default, repeat)
+        fast = bench(fast_path, repeat)
+        print(f"{name:<26} {slow:>11.3f} {fast:>9.3f} {slow / fast:>7.1f}x")
+
+    raw = dumps(task_list())
+    slow = bench(lambda: json.loads(raw), 50)
+    fast = bench(lambda: loads(raw), 50)
+    print(f"{'parse task list':<26} {slow:>11.3f} {fast:>9.3f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Throughput vs worker count for the production server.
+
+Starts `python -m src.main --workers N` for each N, drives it with a
+multi-process httpx load generator and prints requests/s per worker count.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --path /healthz
+    python -m benchmarks.bench_workers --workers 1 2 4 --path /metrics/tenants   # writes the shared store
+    LLM_BACKEND=replay python -m benchmarks.bench_workers --path /analyze-intent --body analyze.json
+
+Uses STATE_BACKEND=sqlite in a temp file so workers share state as in production.
+With `--body` requests are POSTed with that JSON file as the body.
+See docs/benchmarks.md for the methodology.
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+async def _drive(url: str, concurrency: int, duration: float, body: bytes | None = None) -> int:
+    done = 0
+    deadline = time.perf_counter() + duration
+
+    async def loop(client):
+        nonlocal done
+        while time.perf_counter() < deadline:
+            if body is None:
+                r = await client.get(url)
+            else:
+                r = await client.post(url, content=body, headers={"Content-Type": "application/json"})
+            r.raise_for_status()
+            done += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await asyncio.gather(*(loop(client) for _ in range(concurrency)))
+    return done
+
+
+def _client_proc(url, concurrency, duration, body, out):
+    out.put(asyncio.run(_drive(url, concurrency, duration, body)))
+
+
+def _wait_ready(base: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(base + "/healthz").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(workers: int, port: int, path: str, clients: int, concurrency: int, duration: float,
+        body: bytes | None = None) -> float:
+    env = dict(os.environ, STATE_BACKEND="sqlite", STATE_DB=os.path.join(tempfile.mkdtemp(), "bench.db"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.main", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_ready(base)
+        out = mp.Queue()
+        procs = [mp.Process(target=_client_proc, args=(base + path, concurrency, duration, body, out)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        total = sum(out.get() for _ in procs)
+        for p in procs:
+            p.join()
+        return total / duration
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/healthz")
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per load generator")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--body", help="JSON file to POST instead of a GET")
+    args = parser.parse_args()
+    body = open(args.body, "rb").read() if args.body else None
+
+    base_rps = None
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    for n in args.workers:
+        rps = run(n, args.port, args.path, args.clients, args.concurrency, args.duration, body)
+        base_rps = base_rps or rps
+        print(f"{n:>8} {rps:>10.0f} {rps / base_rps:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Offline evaluation of intent analysis: quality vs latency and token cost.
+
+    python -m benchmarks.eval_intent --record             # call Gemini, (re)record answers
+    python -m benchmarks.eval_intent                      # replay recorded LLM answers
+    python -m benchmarks.eval_intent --variants flash keywords --min-top1 0.9
+
+Runs the labelled messages in `benchmarks/data/intent_cases.jsonl` through
+`call_llm` for each variant (prompt template + model) and reports, per
+variant, top-1 tool accuracy, prefill field accuracy, mean prompt/completion
+tokens, mean and p95 latency and the estimated cost per 1000 requests, then
+names the cheapest variant that meets the quality bar.
+
+By default LLM answers are replayed from `--recordings` through the replay
+backend of `src.intent.backends` (keyed on a hash of model + prompt, so
+editing the prompt or the case set invalidates exactly the affected entries).
+Replayed latency is the recorded model latency plus the measured local
+overhead. `--record` calls the real API and appends new answers; it needs
+GOOGLE_API_KEY. No recordings are committed, so run it once first: a case with
+no recorded answer is reported as skipped, and a variant with skipped cases is
+not picked as the cheapest.
+
+The "keywords" variant is a zero-cost regex baseline: the floor any LLM
+variant has to beat to be worth its tokens.
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+
+from src.api.schemas import MessageMeta
+from src.integrations import TOOLS_INFO
+from src.intent.analysis import call_llm
+from src.intent.backends import GeminiBackend, RecordingBackend, RecordingStore, ReplayBackend, ReplayMiss, set_backend
+from src.intent.prompt import PROMPT_TEMPLATE
+
+DATA = Path(__file__).parent / "data"
+
+# name -> (prompt template, model); None marks the keyword baseline
+VARIANTS = {
+    "flash": (PROMPT_TEMPLATE, "gemini-2.0-flash"),
+    "flash-lite": (PROMPT_TEMPLATE, "gemini-2.0-flash-lite"),
+    "keywords": None,
+}
+
+# USD per 1M (prompt, completion) tokens, list prices; update when they change
+PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+}
+
+_KEYWORDS = [
+    ("zoho_workdrive", re.compile(r"\b(share|attach|send me|file|deck|pdf|zip|doc(ument)?s?)\b", re.I)),
+    ("zoho_calendar", re.compile(r"\b(meeting|sync|schedule|book|call|review|demo)\b|\d\s?(am|pm)\b|\d{1,2}:\d{2}", re.I)),
+    ("jira", re.compile(r"\b(bug|crash|ticket|issue|jira)\b", re.I)),
+    ("zoho_projects", re.compile(r"\b(task|project|owns?|board)\b", re.I)),
+]
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def load_cases(path: Path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def keyword_baseline(message: str) -> list[dict]:
+    return [{"tool": tool, "prefill": {}} for tool, pattern in _KEYWORDS if pattern.search(message)]
+
+
+def field_matches(expected, actual) -> bool:
+    """Label semantics: None = field present, {"contains": s} = substring, dates match by day, else equality."""
+    if actual in (None, "", []):
+        return False
+    if expected is None:
+        return True
+    if isinstance(expected, dict):
+        values = actual if isinstance(actual, list) else [actual]
+        return any(expected["contains"].lower() in str(v).lower() for v in values)
+    if isinstance(expected, str) and _DATE.match(expected):
+        return str(actual).startswith(expected)
+    return str(expected).strip().lower() == str(actual).strip().lower()
+
+
+async def run_variant(name: str, cases: list[dict], record: bool) -> dict:
+    variant = VARIANTS[name]
+    top1 = fields_ok = fields_total = failures = skipped = 0
+    prompt_tokens, completion_tokens, latencies = [], [], []
+    for case in cases:
+        usage = {}
+        start = time.perf_counter()
+        try:
+            if variant is None:
+                suggestions = keyword_baseline(case["message_text"])
+            else:
+                template, model = variant
+                suggestions = await call_llm(
+                    case["message_text"], MessageMeta(**case["metadata"]), TOOLS_INFO,
+                    template=template, model=model, usage=usage,
+                )
+        except ReplayMiss:
+            skipped += 1
+            continue
+        except Exception as exc:
+            print(f"  {name}/{case['id']}: {exc}")
+            suggestions = []
+            failures += 1
+        elapsed = time.perf_counter() - start
+        if not record:
+            elapsed += usage.get("latency", 0.0)  # replay answers instantly
+        latencies.append(elapsed)
+        prompt_tokens.append(usage.get("prompt_tokens", 0))
+        completion_tokens.append(usage.get("completion_tokens", 0))
+
+        expected = case.get("prefill", {})
+        fields_total += len(expected)
+        if suggestions and suggestions[0]["tool"] == case["tool"]:
+            top1 += 1
+            prefill = suggestions[0].get("prefill") or {}
+            fields_ok += sum(field_matches(v, prefill.get(k)) for k, v in expected.items())
+
+    n = len(latencies)
+    if not n:
+        return {"variant": name, "skipped": skipped, "failures": failures}
+    p_in, p_out = PRICES.get(variant[1], (0.0, 0.0)) if variant else (0.0, 0.0)
+    mean_in, mean_out = statistics.fmean(prompt_tokens), statistics.fmean(completion_tokens)
+    return {
+        "variant": name,
+        "top1": top1 / n,
+        "prefill": fields_ok / fields_total if fields_total else 1.0,
+        "prompt_tokens": mean_in,
+        "completion_tokens": mean_out,
+        "latency_ms": statistics.fmean(latencies) * 1000,
+        "p95_ms": sorted(latencies)[max(0, round(0.95 * n) - 1)] * 1000,
+        "cost_per_1k": (mean_in * p_in + mean_out * p_out) / 1000,
+        "failures": failures,
+        "skipped": skipped,
+    }
+
+
+def cheapest_passing(results: list[dict], min_top1: float, min_prefill: float) -> dict | None:
+    passing = [r for r in results if not r["failures"] and not r["skipped"] and r["top1"] >= min_top1 and r["prefill"] >= min_prefill]
+    return min(passing, key=lambda r: (r["cost_per_1k"], r["latency_ms"]), default=None)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=Path, default=DATA / "intent_cases.jsonl")
+    parser.add_argument("--recordings", type=Path, default=DATA / "llm_recordings.jsonl")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--record", action="store_true", help="call the real model and store its answers")
+    parser.add_argument("--min-top1", type=float, default=0.9)
+    parser.add_argument("--min-prefill", type=float, default=0.8)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    store = RecordingStore(str(args.recordings))
+    set_backend(RecordingBackend(GeminiBackend(), store) if args.record else ReplayBackend(store))
+    results = [await run_variant(name, cases, args.record) for name in args.variants]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(cases)} cases")
+        print(f"{'variant':<12} {'top1':>6} {'prefill':>8} {'tok in':>7} {'tok out':>8} {'ms':>8} {'p95 ms':>8} {'$/1k':>8} {'fail':>5} {'skip':>5}")
+        for r in results:
+            if "top1" not in r:
+                print(f"{r['variant']:<12} skipped, no recorded answers (run with --record first)")
+                continue
+            print(f"{r['variant']:<12} {r['top1']:>6.2f} {r['prefill']:>8.2f} {r['prompt_tokens']:>7.0f} "
+                  f"{r['completion_tokens']:>8.0f} {r['latency_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                  f"{r['cost_per_1k']:>8.4f} {r['failures']:>5} {r['skipped']:>5}")
+    best = cheapest_passing(results, args.min_top1, args.min_prefill)
+    print(f"cheapest variant meeting top1>={args.min_top1} prefill>={args.min_prefill}: "
+          f"{best['variant'] if best else 'none'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,9 @@
-from fastapi import FastAPI
-from .routes import router
-from . import auth
+"""HTTP API. The app is built on first access of `src.api.app`, so integrations can
+import `src.api.schemas` without pulling in the routes that import them back."""
 
-app = FastAPI(title="Actionizer - Contextual Action Engine for *cliq*")
 
-app.include_router(router)
-app.include_router(auth.router)
+def __getattr__(name):
+    if name == "app":
+        from .application import app
+        return app
+    raise AttributeError(name)
@@ -0,0 +1,12 @@
+from fastapi import FastAPI
+from .lifecycle import lifespan
+from .responses import FastJSONResponse
+from .routes import router
+from . import auth, webhooks
+
+app = FastAPI(title="Actionizer - Contextual Action Engine for *cliq*", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
+
+app.include_router(router)
+app.include_router(auth.router)
+app.include_router(webhooks.router)
@@ -1,16 +1,19 @@
 import logging
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from src.auth import create_zoho_access_token
+from src.auth import consume_oauth_state, create_zoho_access_token, grant_code_auth_url
+from src.tenancy import set_tenant
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
 @router.get("/auth")
-async def authorize(user_id="1"):
-    ...
+async def authorize(tenant: str | None = None, key: str | None = None):
+    """Sends the tenant's admin to Zoho's consent page; `key` is the tenant key when tenants are authenticated."""
+    tenant = set_tenant(tenant, key)
+    return RedirectResponse(grant_code_auth_url(tenant))
     
 @router.get("/authsuccess")
 async def authsuccess():
@@ -51,9 +54,14 @@ async def authsuccess():
 async def zoho_auth_callback(
     code:str, 
     location:str, 
-    accounts_server:str = Query(..., alias="accounts-server")
+    accounts_server:str = Query(..., alias="accounts-server"),
+    state: str | None = None,
 ):
-    logger.info(f"got code={code}")
-    await create_zoho_access_token(code)
+    tenant = consume_oauth_state(state)
+    if tenant is None:
+        raise HTTPException(status_code=400, detail="Invalid or expired OAuth state, start again from /auth")
+    logger.info(f"got code for tenant={tenant}")
+    set_tenant(tenant, verified=True)
+    await create_zoho_access_token(code, tenant)
 
     return RedirectResponse("/authsuccess", status_code=303)
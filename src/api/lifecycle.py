@@ -0,0 +1,81 @@
+"""App lifespan: opens shared resources on startup and drains them on shutdown.
+
+On SIGTERM uvicorn stops accepting connections and waits (up to
+`timeout_graceful_shutdown`) for open requests. Upstream calls made by
+`/execute-action` are additionally shielded and tracked here so an action that
+already hit Jira/Zoho is allowed to finish (and get recorded) even if the
+client went away, instead of being cancelled half way.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from src.auth import migrate_legacy_zoho_store
+from src.constants import SHUTDOWN_GRACE
+from src.http_client import close_client, get_client
+from src.metrics import flush, flush_periodically
+from src.state import close_store, get_store
+from src.warmer import warm_periodically
+
+logger = logging.getLogger(__name__)
+
+
+class InflightTracker:
+    """Keeps the set of running execute tasks so shutdown can wait for them."""
+
+    def __init__(self):
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def run(self, coro):
+        """Runs `coro` as a tracked task, shielded from cancellation of the caller."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(task)
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits for in-flight tasks. Returns False if some were still running at `timeout`."""
+        if not self._tasks:
+            return True
+        logger.info(f"Draining {len(self._tasks)} in-flight actions")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} actions still running after {timeout}s, abandoning them")
+        return not pending
+
+
+inflight = InflightTracker()
+
+
+def configure_logging():
+    # workers are separate processes, so the level travels through the environment
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=level)
+    logging.getLogger().setLevel(level)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    get_store()
+    migrate_legacy_zoho_store()
+    get_client()
+    flusher = asyncio.create_task(flush_periodically())
+    warmer = asyncio.create_task(warm_periodically())
+    logger.info(f"Worker {os.getpid()} started")
+    try:
+        yield
+    finally:
+        await inflight.drain(SHUTDOWN_GRACE)
+        flusher.cancel()
+        warmer.cancel()
+        await flush()
+        await close_client()
+        close_store()
+        logger.info(f"Worker {os.getpid()} stopped")
@@ -0,0 +1,26 @@
+"""Response classes backed by `src.serialization`.
+
+Routes return these directly with the pydantic models they built, which skips
+FastAPI's second validation pass of `response_model` (the models were just
+validated on construction) and its `jsonable_encoder` walk.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.constants import STREAM_RESPONSE_THRESHOLD
+from src.serialization import dumps, has_large_body, iter_json
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: dict[str, str] | None = None):
+    """Fast JSON response, streamed when `content` carries a large file body."""
+    if has_large_body(content, STREAM_RESPONSE_THRESHOLD):
+        return StreamingResponse(
+            iter_json(content), status_code=status_code, headers=headers, media_type="application/json"
+        )
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
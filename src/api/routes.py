@@ -1,65 +1,209 @@
+import functools
 import logging
 
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, status
+import httpx
 
-from src.integrations.zoho.workdrive import workdrive_action
-from src.api.schemas import AnalyzeIntentRequest, AnalyzeIntentResponse, ExecuteActionRequest, ExecuteActionResponse, PrefillHint, SuggestedAction
+from src.integrations.zoho.workdrive import restore_file_bodies, workdrive_action
+from src.api.schemas import AnalyzeIntentRequest, AnalyzeIntentResponse, ExecuteActionRequest, ExecuteActionResponse, SuggestedAction
+from src.api.lifecycle import inflight
+from src.api.responses import json_response
 from src.auth import UserNotFound, get_zoho_access_token
+from src.constants import ACTION_TTL, TENANT_SECRET
+from src.http_client import retry_after_seconds
+from src.idempotency import execution_key, run_once
+from src.indexes.freebusy import prefill_free_slot
+from src.indexes.tasks import find_duplicates, update_suggestion_for
 from src.integrations import TOOLS_INFO
 from src.integrations.jira import create_jira_ticket
 from src.integrations.zoho.calendar import create_zoho_calendar_event
-from src.integrations.zoho.projects import create_zoho_project_task
+from src.integrations.zoho.projects import create_zoho_project_task, update_zoho_project_task
 from src.intent.analysis import call_llm
+from src.intent.attachments import TICKET_TOOLS, add_digests, digest_message
+from src.intent.backends import ReplayMiss
+from src.intent.context import record_message, record_messages, render_context
+from src.intent.suggestions import make_suggestion
+from src.metrics import collect, track
+from src.ratelimit import RateLimited
+from src.resilience import UpstreamUnavailable
+from src.scheduler import analyze_scheduler, execute_scheduler
+from src.state import get_store
+from src.tenancy import current_tenant, set_tenant
+from src.warmer import record_usage
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-_actions_db: dict[str, SuggestedAction] = {}
+ACTIONS_NS = "actions"  # suggested actions, shared by all workers, keyed "<tenant>:<action_id>"
+
+
+async def save_action(action: SuggestedAction):
+    key = f"{current_tenant.get()}:{action.action_id}"
+    await get_store().aset(ACTIONS_NS, key, action.model_dump(mode="json"), ttl=ACTION_TTL)
+
+
+async def load_action(action_id: str) -> SuggestedAction:
+    data = await get_store().aget(ACTIONS_NS, f"{current_tenant.get()}:{action_id}")
+    if data is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired action_id")
+    return SuggestedAction(**data)
+
+
+def upstream_http_error(exp: Exception) -> HTTPException:
+    """Maps a failed integration call to the HTTP error returned to Cliq."""
+    if isinstance(exp, HTTPException):
+        return exp
+    if isinstance(exp, RateLimited):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"{exp.upstream} is busy, try again shortly",
+            headers={"Retry-After": str(max(1, round(exp.retry_after)))},
+        )
+    if isinstance(exp, UpstreamUnavailable):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{exp.upstream} is currently unavailable",
+            headers={"Retry-After": str(round(exp.retry_after))},
+        )
+    if isinstance(exp, httpx.HTTPStatusError) and exp.response.status_code == 429:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Upstream rate limit reached, try again shortly",
+            headers={"Retry-After": str(round(retry_after_seconds(exp.response)))},
+        )
+    return HTTPException(status_code=400, detail=f"{exp}")
+
+
+@router.get("/healthz")
+async def healthz():
+    return {"ok": True, "inflight": len(inflight)}
+
+
+@router.get("/metrics/tenants")
+async def tenant_metrics(tenant: str | None = None, tenant_key: str | None = Header(None, alias="X-Tenant-Key")):
+    """Per tenant request counts, errors, throttling and latency across all workers.
+
+    With `TENANT_SECRET` set only the caller's own tenant (`?tenant=` with its key) is returned.
+    """
+    metrics = await collect()
+    if not TENANT_SECRET:
+        return metrics
+    tenant = set_tenant(tenant, tenant_key)
+    return {tenant: metrics.get(tenant, {})}
 
 
 @router.post("/analyze-intent", response_model=AnalyzeIntentResponse)
-async def analyze_intent(req: AnalyzeIntentRequest):
+@track("analyze")
+async def analyze_intent(req: AnalyzeIntentRequest, tenant_key: str | None = Header(None, alias="X-Tenant-Key")):
     """
     Uses Gemini to analyze the message and return ranked integration suggestions with prefill hints.
     The LLM must return strict JSON per the prompt schema.
     """
+    set_tenant(req.tenant, tenant_key)
+    record_usage(user=req.metadata.sender)
     # Provide the LLM with the tool descriptions and ask for strict JSON output
-    llm_out = await call_llm(req.message_text, req.metadata, TOOLS_INFO)
+    context = ""
+    if req.use_context:
+        channel = req.metadata.channel
+        await record_messages(channel, [(text, None) for text in req.context_messages])
+        context = render_context(channel)
+        await record_message(channel, req.message_text, req.metadata)
+    message_text, digests = await digest_message(req.message_text, req.attachments)
+    try:
+        async with analyze_scheduler.slot():
+            llm_out = await call_llm(message_text, req.metadata, TOOLS_INFO, context, "\n\n".join(digests))
+    except RateLimited as exp:
+        raise upstream_http_error(exp) from exp
+    except ReplayMiss as exp:
+        logger.error(f"LLM replay miss: {exp}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{exp}") from exp
     try:
         suggestions = []
         for s in llm_out:
             logger.debug(f"Processing suggestion: {s.get('tool')}")
-            suggestion = SuggestedAction(
-                tool=s["tool"],
-                score=float(s.get("score", 0.0)),
-                title=s.get("title", ""),
-                description=s.get("description"),
-                expected_fields=s.get("expected_fields", []),
-                prefill=s.get("prefill", {})
-            )
+            suggestion = make_suggestion(s.get("tool"), s.get("score"), s.get("prefill"))
+            if suggestion is None:
+                continue
+            if suggestion.tool == "zoho_calendar" and prefill_free_slot(suggestion.prefill, req.metadata.sender):
+                logger.debug(f"Moved calendar prefill to a free slot")
             suggestions.append(suggestion)
-            _actions_db[str(suggestion.action_id)] = suggestion
+            if suggestion.tool == "zoho_projects":
+                suggestions.extend(_duplicate_task_suggestions(suggestion))
+            if suggestion.tool in TICKET_TOOLS:
+                # after duplicate detection, which should compare the task itself
+                add_digests(suggestion.prefill, digests)
+        for suggestion in suggestions:
+            await save_action(suggestion)
             logger.info(f"Stored action {suggestion.action_id} for tool {suggestion.tool}")
-        return AnalyzeIntentResponse(suggestions=suggestions)
+        return json_response(AnalyzeIntentResponse.model_construct(suggestions=suggestions))
     except Exception as e:
         logger.error(f"Invalid LLM schema or parse error: {e}")
         raise HTTPException(status_code=500, detail=f"Invalid LLM schema or parse error: {e}")
 
 
+def _duplicate_task_suggestions(suggestion: SuggestedAction) -> list[SuggestedAction]:
+    """Flags likely duplicates of a new Projects task and offers updating the closest one."""
+    prefill = suggestion.prefill
+    if not (prefill.get("portal_id") and prefill.get("project_id") and prefill.get("name")):
+        return []
+    text = f"{prefill.get('name')} {prefill.get('description') or ''}"
+    duplicates = find_duplicates(prefill["portal_id"], prefill["project_id"], text)
+    if not duplicates:
+        return []
+    prefill["possible_duplicates"] = duplicates
+    update = update_suggestion_for(prefill, duplicates)
+    if update is None:
+        return []
+    return [make_suggestion("zoho_projects_update", round(suggestion.score * duplicates[0]["score"], 3), update)]
+
+
 @router.post("/execute-action", response_model=ExecuteActionResponse)
-async def execute_action(req: ExecuteActionRequest):
+@track("execute")
+async def execute_action(
+    req: ExecuteActionRequest,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    tenant_key: str | None = Header(None, alias="X-Tenant-Key"),
+):
     """
     Executes the chosen integration action with the provided fields.
-    Supported tools: jira, zoho_projects (create task), zoho_calendar (create event), zoho_workdrive (find & share file)
+    Supported tools: jira, zoho_projects (create task), zoho_projects_update (update task), zoho_calendar (create event), zoho_workdrive (find & share file)
+
+    Repeated requests (same Idempotency-Key, or same action_id and updated_params)
+    join the running execution or replay its result instead of acting twice.
     """
-    action = _actions_db[str(req.action_id)]
+    set_tenant(req.tenant, tenant_key)
+    action = await load_action(str(req.action_id))
+    record_usage(action.tool, {**action.prefill, **req.updated_params})
+    key = execution_key(str(req.action_id), req.updated_params, idempotency_key)
+
+    async def execute():
+        try:
+            async with execute_scheduler.slot():
+                res = await _run_action(action, req.updated_params)
+        except RateLimited as exp:
+            raise upstream_http_error(exp) from exp
+        return {"success": res.success, "result": res.result}
+
+    result, replayed = await run_once(key, execute)
+    if replayed and action.tool == "zoho_workdrive":
+        try:
+            restored = await restore_file_bodies(await get_zoho_access_token(), result["result"])
+        except Exception as exp:
+            raise upstream_http_error(exp) from exp
+        result = {**result, "result": restored}
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    # built from our own data, so skip response_model re-validation
+    return json_response(ExecuteActionResponse.model_construct(**result), headers=headers)
+
+
+async def _run_action(action: SuggestedAction, updated_params: dict) -> ExecuteActionResponse:
     tool = action.tool
     fields = action.prefill
-    filtered_keys = [x for x in req.updated_params.keys() if x in set(action.expected_fields)]
-    fields.update({k:req.updated_params[k] for k in filtered_keys})
+    filtered_keys = [x for x in updated_params.keys() if x in set(action.expected_fields)]
+    fields.update({k:updated_params[k] for k in filtered_keys})
 
-    logger.debug(f"Executing action {req.action_id} for tool {tool}")
+    logger.debug(f"Executing action {action.action_id} for tool {tool}")
 
     # Short-circuit common validation
     if tool == "jira":
@@ -73,14 +217,18 @@ async def execute_action(req: ExecuteActionRequest):
         if not project_key or not summary:
             logger.warning("Missing project_key or summary for Jira")
             raise HTTPException(status_code=400, detail="Missing project_key or summary for Jira")
-        jira_res = await create_jira_ticket(project_key, summary, description, issuetype, duedate)
+        try:
+            jira_res = await inflight.run(create_jira_ticket(project_key, summary, description, issuetype, duedate))
+        except Exception as exp:
+            logger.exception(f"Jira action failed: {exp}")
+            raise upstream_http_error(exp) from exp
         logger.info(f"Jira ticket created successfully")
         return ExecuteActionResponse(success=True, result={"jira": jira_res})
 
     # Zoho flows require tenant OAuth setup ensure we have access token for tenant
     try:
         logger.debug("Retrieving Zoho access token")
-        access_token = await get_zoho_access_token()  # TODO: fix tenant configuration
+        access_token = await get_zoho_access_token()
     except UserNotFound:
         logger.warning("User not found, authorization required")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization not done")
@@ -100,13 +248,13 @@ async def execute_action(req: ExecuteActionRequest):
             logger.warning("Missing calendar_id/title/start_iso/end_iso")
             raise HTTPException(status_code=400, detail="Missing calendar_id/title/start_iso/end_iso")
         args.extend(
-            [calendar_id, title, start_iso, end_iso, fields.get("location"), fields("description", None)]
+            [calendar_id, title, start_iso, end_iso, fields.get("location"), fields.get("description", None)]
         )
         func = create_zoho_calendar_event
 
     elif tool == "zoho_workdrive":
         logger.info("Processing Zoho WorkDrive action")
-        # We support: search by name_or_query or direct file_id; then upload to Cliq chat if provided
+        # We support: search by name_or_query or direct file_id (each may be a list); then upload to Cliq chat if provided
         org_id = fields.get("org_id")
         name_or_query = fields.get("name_or_query")
         file_id = fields.get("file_id")
@@ -126,9 +274,9 @@ async def execute_action(req: ExecuteActionRequest):
         project_id = fields.get("project_id")
         name = fields.get("name")
         description = fields.get("description", "")
-        start_date = fields.get("start_date", None),
-        end_date = fields.get("end_date", None),
-        priority = fields.get("priority", None),
+        start_date = fields.get("start_date", None)
+        end_date = fields.get("end_date", None)
+        priority = fields.get("priority", None)
         owner_ids = fields.get("owner_ids", None)
 
         if not (portal_id and project_id and name):
@@ -137,11 +285,23 @@ async def execute_action(req: ExecuteActionRequest):
         args.extend((portal_id, project_id, name, description, start_date, end_date, priority, owner_ids))
         func = create_zoho_project_task
 
+    elif tool == "zoho_projects_update":
+        logger.info("Processing Zoho Projects update action")
+        portal_id = fields.get("portal_id")
+        project_id = fields.get("project_id")
+        task_id = fields.get("task_id")
+        if not (portal_id and project_id and task_id):
+            logger.warning("Missing portal_id, project_id, or task_id for Projects update")
+            raise HTTPException(status_code=400, detail="Missing portal_id, project_id, or task_id")
+        updates = {k: fields[k] for k in ("name", "description", "end_date", "priority") if fields.get(k)}
+        args.extend((portal_id, project_id, task_id))
+        func = functools.partial(update_zoho_project_task, **updates)
+
     try:
         logger.debug(f"Calling function with args")
-        r = await func(*args)
+        r = await inflight.run(func(*args))
         logger.info(f"Action executed successfully")
         return ExecuteActionResponse(success=True, result={"action_resp": r})
     except Exception as exp:
         logger.exception(f"Action execution failed: {exp}")
-        raise HTTPException(status_code=400, detail=f"{exp}") from exp
+        raise upstream_http_error(exp) from exp
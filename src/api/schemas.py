@@ -9,10 +9,20 @@ class MessageMeta(BaseModel):
     message_id: Optional[str] = None
 
 
+class Attachment(BaseModel):
+    name: Optional[str] = None
+    content: Optional[str] = Field(None, description="inline text, e.g. a log pasted as a snippet")
+    file_id: Optional[str] = Field(None, description="WorkDrive file id")
+    url: Optional[str] = Field(None, description="https download url on a Zoho domain, e.g. of a Cliq attachment")
+
+
 class AnalyzeIntentRequest(BaseModel):
     message_text: str
     metadata: MessageMeta
     tenant: Optional[str] = Field(None, description="tenant id or org id to resolve tokens")
+    use_context: bool = Field(False, description="add the channel's recent conversation to the analysis")
+    context_messages: list[str] = Field([], description="earlier messages of the thread to add to the channel context, oldest first")
+    attachments: list[Attachment] = Field([], description="files attached to the message; logs are digested for the analysis")
 
 
 # class PrefillHint(BaseModel):
@@ -38,6 +48,7 @@ class AnalyzeIntentResponse(BaseModel):
 class ExecuteActionRequest(BaseModel):
     action_id: str
     updated_params: dict[str, Any]
+    tenant: Optional[str] = Field(None, description="tenant the action was suggested for")
 
 
 class ExecuteActionResponse(BaseModel):
@@ -0,0 +1,208 @@
+"""Receiver for Zoho WorkDrive, Projects and Calendar change notifications.
+
+Subscribe each org with `/webhooks/zoho?tenant=<tenant>&source=<workdrive|projects|calendar>`.
+Every tenant gets its own webhook secret, the hex HMAC-SHA256 of the tenant
+id under `ZOHO_WEBHOOK_SECRET` (`python -m src.api.webhooks <tenant>` prints
+it), so one org's subscription can't post changes for another tenant.
+Requests are accepted when they carry either
+    - `X-Zoho-Webhook-Signature`: hex or base64 HMAC-SHA256 of the raw body
+      keyed with the tenant's secret, or
+    - `token=<tenant's secret>` in the URL, for products that can only send
+      static parameters.
+Neither carries a timestamp, so replays are caught instead: a body seen
+within `WEBHOOK_REPLAY_WINDOW` is acknowledged without being applied again,
+and a payload whose own event time is older than the window is rejected.
+Payload shapes differ between products (and versions), so fields are looked
+up leniently; a change that can't be pinned down makes the affected cache
+stale instead of being dropped.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import sys
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request
+
+from src.constants import WEBHOOK_REPLAY_WINDOW, ZOHO_WEBHOOK_SECRET
+from src.indexes import freebusy, tasks
+from src.indexes.changes import mark_webhook
+from src.indexes.files import invalidate_file
+from src.integrations.zoho.calendar import _parse_ts
+from src.serialization import loads
+from src.state import get_store
+from src.tenancy import DEFAULT_TENANT, current_tenant, set_tenant
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("workdrive", "projects", "calendar")
+SEEN_NS = "webhook_bodies_seen"
+
+
+def webhook_secret(tenant: str) -> str:
+    return hmac.new(ZOHO_WEBHOOK_SECRET.encode(), f"webhook:{tenant}".encode(), hashlib.sha256).hexdigest()
+
+
+def _verified(tenant: str, body: bytes, signature: str | None, token: str | None) -> bool:
+    secret = webhook_secret(tenant).encode()
+    # compared as bytes: compare_digest raises on non-ASCII str
+    if token is not None:
+        return hmac.compare_digest(token.encode(), secret)
+    if not signature:
+        return False
+    digest = hmac.new(secret, body, hashlib.sha256).digest()
+    signature = signature.encode()
+    return hmac.compare_digest(signature, digest.hex().encode()) or hmac.compare_digest(signature, base64.b64encode(digest))
+
+
+def _event_time(payload: dict) -> float | None:
+    for key in ("event_time", "timestamp"):
+        value = payload.get(key)
+        if isinstance(value, (int, float)):
+            return value / 1000 if value > 1e11 else value
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+async def _replayed(body: bytes) -> bool:
+    seen = f"{current_tenant.get()}:{hashlib.sha256(body).hexdigest()}"
+    return not await get_store().aadd(SEEN_NS, seen, True, ttl=WEBHOOK_REPLAY_WINDOW)
+
+
+def _event_type(payload: dict) -> str:
+    for key in ("event_type", "event", "operation", "action"):
+        if isinstance(payload.get(key), str):
+            return payload[key].lower()
+    return ""
+
+
+def _removed(event: str) -> bool:
+    return any(word in event for word in ("delet", "trash", "remov"))
+
+
+def _items(payload: dict, *keys: str) -> list[dict]:
+    for key in keys:
+        value = payload.get(key)
+        if isinstance(value, list):
+            return [v for v in value if isinstance(v, dict)]
+        if isinstance(value, dict):
+            return [value]
+    return [payload]
+
+
+def _id(obj: dict | None, *keys: str) -> str | None:
+    for key in keys:
+        value = (obj or {}).get(key)
+        if isinstance(value, dict):
+            value = value.get("id")
+        if value:
+            return str(value)
+    return None
+
+
+def _guess_source(payload: dict) -> str:
+    if "portal_id" in payload or "task" in payload or "tasks" in payload:
+        return "projects"
+    if "calendar" in _event_type(payload) or "events" in payload or "dateandtime" in payload:
+        return "calendar"
+    return "workdrive"
+
+
+def _workdrive(payload: dict, event: str) -> int:
+    applied = 0
+    for item in _items(payload, "data", "resource", "file"):
+        attrs = item.get("attributes") or item
+        file_id = _id(item, "id", "resource_id", "file_id")
+        name = attrs.get("name") or attrs.get("display_attr_name")
+        # a deleted file only matters to searches that returned it
+        invalidate_file(file_id, None if _removed(event) else name)
+        applied += 1
+    return applied
+
+
+def _projects(payload: dict, event: str) -> int:
+    applied = 0
+    for item in _items(payload, "tasks", "task", "data"):
+        portal_id = _id(payload, "portal_id", "portal") or _id(item, "portal_id", "portal")
+        project_id = _id(payload, "project_id", "project") or _id(item, "project_id", "project")
+        task_id = _id(item, "id_string", "id", "task_id")
+        if not (portal_id and project_id and task_id):
+            logger.warning(f"Projects webhook without portal/project/task id: {event}")
+            continue
+        tasks.publish_change(
+            portal_id, project_id, task_id,
+            name=item.get("name"), description=item.get("description"), removed=_removed(event),
+        )
+        applied += 1
+    return applied
+
+
+def _times(item: dict) -> tuple[datetime | None, datetime | None]:
+    when = item.get("dateandtime") or item
+    try:
+        return _parse_ts(when["start"]), _parse_ts(when["end"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+
+def _calendar(payload: dict, event: str) -> int:
+    applied = 0
+    for item in _items(payload, "events", "data", "event"):
+        user = payload.get("user") or payload.get("user_id") or _id(item, "organizer")
+        if not user:
+            logger.warning(f"Calendar webhook without user: {event}")
+            continue
+        start, end = _times(item)
+        # only a new event can be added as is; an edit may have freed its old slot
+        freebusy.publish_change(user, start, end, busy="creat" in event or "add" in event)
+        applied += 1
+    return applied
+
+
+_HANDLERS = {"workdrive": _workdrive, "projects": _projects, "calendar": _calendar}
+
+
+@router.post("/webhooks/zoho")
+async def zoho_webhook(request: Request, tenant: str | None = None, source: str | None = None, token: str | None = None):
+    """Invalidates or patches cached Zoho data affected by a change notification."""
+    if not ZOHO_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhooks are not configured")
+    body = await request.body()
+    tenant = tenant or DEFAULT_TENANT
+    if not _verified(tenant, body, request.headers.get("X-Zoho-Webhook-Signature"), token):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        payload = loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Webhook body must be a JSON object")
+    if source is not None and source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(SOURCES)}")
+
+    # the signature (or token) was made with this tenant's secret
+    set_tenant(tenant, verified=True)
+    event_time = _event_time(payload)
+    if event_time is not None and event_time < time.time() - WEBHOOK_REPLAY_WINDOW:
+        raise HTTPException(status_code=401, detail="Webhook event is too old")
+    source = source or _guess_source(payload)
+    event = _event_type(payload)
+    if await _replayed(body):
+        logger.info(f"Ignoring replayed webhook {source}/{event or '?'} for tenant {tenant}")
+        return {"ok": True, "source": source, "changes": 0, "duplicate": True}
+    mark_webhook(source)
+    applied = _HANDLERS[source](payload, event)
+    logger.info(f"Webhook {source}/{event or '?'} for tenant {tenant}: {applied} changes")
+    return {"ok": True, "source": source, "changes": applied}
+
+
+if __name__ == "__main__":
+    print(webhook_secret(sys.argv[1]))
@@ -1,18 +1,30 @@
 
-import atexit
+import asyncio
+import secrets
+import weakref
+from dataclasses import asdict, dataclass
 from enum import StrEnum
+import logging
 import os
 from fastapi import HTTPException
 from typing import Any
 import requests
 import time
+from urllib.parse import urlencode
 import httpx
-from src.constants import DEFAULT_TIMEOUT, ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, SERVER_PORT, SERVER_HOST
+from src.constants import OAUTH_STATE_TTL, DEFAULT_TIMEOUT, ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, SERVER_PORT, SERVER_HOST
+from src.http_client import request
+from src.serialization import loads
 from src.integrations.zoho.urls import ZOHO_ACCOUNTS_URL
+from src.state import get_store
+from src.tenancy import current_tenant
 import pickle
 import sys
 
+logger = logging.getLogger(__name__)
 
+
+@dataclass
 class ZohoTokenStore:
     access_token: str = ""
     refresh_token: str = ""
@@ -27,6 +39,7 @@ class Scopes(StrEnum):
     Projects="ZohoProjects.portals.ALL%20ZohoProjects.tasks.ALL"
     WorkDrive="WorkDrive.files.READ%20WorkDrive.files.ALL"
     Calendar="ZohoCalendar.event.ALL"
+    Cliq="ZohoCliq.Attachments.READ"  # attachment URLs digested for intent analysis
     # Cliq="ZohoCliq.Webhook.CREATE%20ZohoCliq.Chats.READ%20ZohoCliq.Chats.UPDATE"
 
 
@@ -36,25 +49,56 @@ EXCHANGE_GRANT_CODE = ZOHO_ACCOUNTS_URL + "/v2/token" #"?grant_type=authorizatio
 
 REDIRECT_URI = f"http://{SERVER_HOST}:{SERVER_PORT}/authsuccess"
 
-ZOHO_REFRESH_STORE: dict[str, ZohoTokenStore] = {}  # keyed by user_or_tenant
+# tokens live in the shared state store (keyed by user_or_tenant) so every worker sees them
+TOKENS_NS = "zoho_tokens"
+OAUTH_STATES_NS = "oauth_states"  # one time `state` nonce -> tenant, between /auth and the callback
+# held only while a refresh runs, so idle tenants don't accumulate
+_refresh_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+ZOHO_STORE_FILE = "zoho_token_store.pkl"  # legacy single process store
+
+
+def load_token(user_id: str) -> ZohoTokenStore:
+    data = get_store().get(TOKENS_NS, user_id)
+    if data is None:
+        raise UserNotFound(user_id)
+    return ZohoTokenStore(**data)
+
+
+def save_token(user_id: str, store: ZohoTokenStore):
+    get_store().set(TOKENS_NS, user_id, asdict(store))
+
 
-ZOHO_REFRESH_STORE["1"] = ZohoTokenStore()  # only one user for now
-ZOHO_STORE_FILE = "zoho_token_store.pkl"
+def migrate_legacy_zoho_store():
+    """Imports tokens from the old pickle file into the shared store, once."""
+    if not os.path.exists(ZOHO_STORE_FILE):
+        return
+    with open(ZOHO_STORE_FILE, "rb") as f:
+        legacy = pickle.load(f)
+    for user_id, store in legacy.items():
+        if store.refresh_token and get_store().add(TOKENS_NS, user_id, asdict(ZohoTokenStore(**vars(store)))):
+            logger.info(f"Migrated legacy zoho token for user {user_id}")
 
-def load_zoho_store():
-    global ZOHO_REFRESH_STORE
-    if os.path.exists(ZOHO_STORE_FILE):
-        with open(ZOHO_STORE_FILE, "rb") as f:
-            ZOHO_REFRESH_STORE = pickle.load(f)
-    else:
-        ZOHO_REFRESH_STORE["1"] = ZohoTokenStore()
 
-def save_zoho_store():
-    with open(ZOHO_STORE_FILE, "wb") as f:
-        pickle.dump(ZOHO_REFRESH_STORE, f)
+def grant_code_auth_url(tenant: str) -> str:
+    """Zoho consent page URL; `state` is a one time nonce the callback resolves back to the tenant."""
+    state = secrets.token_urlsafe(24)
+    get_store().set(OAUTH_STATES_NS, state, tenant, ttl=OAUTH_STATE_TTL)
+    scopes = "%20".join(scope.value for scope in Scopes)
+    url = GRANT_CODE_AUTH_URI.format(scopes=scopes, client_id=ZOHO_CLIENT_ID, redirect_uri=REDIRECT_URI)
+    return f"{url}&{urlencode({'state': state})}"
 
-load_zoho_store()
-atexit.register(save_zoho_store)
+
+def consume_oauth_state(state: str | None) -> str | None:
+    """The tenant `state` was issued for, or None if it is unknown, expired or already used."""
+    if not state:
+        return None
+    store = get_store()
+    tenant = store.get(OAUTH_STATES_NS, state)
+    # `add` succeeds once, so a replayed callback can't use the same state again
+    if tenant is None or not store.add(OAUTH_STATES_NS, f"{state}:used", True, ttl=OAUTH_STATE_TTL):
+        return None
+    store.delete(OAUTH_STATES_NS, state)
+    return tenant
 
 
 def zoho_headers(access_token):
@@ -64,7 +108,7 @@ def zoho_headers(access_token):
     }
 
 
-async def create_zoho_access_token(code, user_id="1") -> ZohoTokenStore:
+async def create_zoho_access_token(code, user_id: str | None = None) -> ZohoTokenStore:
     data = {
         "grant_type": "authorization_code",
         "client_id": ZOHO_CLIENT_ID,
@@ -72,12 +116,12 @@ async def create_zoho_access_token(code, user_id="1") -> ZohoTokenStore:
         "code": code,
         "redirect_uri": REDIRECT_URI,
     }
+    user_id = user_id or current_tenant.get()
 
-    async with httpx.AsyncClient() as ac:
-        resp = await ac.post(EXCHANGE_GRANT_CODE, data=data)
-        resp.raise_for_status()
-        resp_json = resp.json()
-        assert "error" not in resp_json, f"error in oauth flow {resp_json=}"
+    resp = await request("zoho_accounts", "POST", EXCHANGE_GRANT_CODE, data=data)
+    resp.raise_for_status()
+    resp_json = loads(resp.content)
+    assert "error" not in resp_json, f"error in oauth flow {resp_json=}"
 
     # resp format
     # {
@@ -86,28 +130,38 @@ async def create_zoho_access_token(code, user_id="1") -> ZohoTokenStore:
     #   "expires_in": 3600,
     #   "api_domain": "https://www.zohoapis.com"
     # }
-    store = ZOHO_REFRESH_STORE[user_id]
-    store.access_token = resp_json["access_token"]
-    store.expiry_ts = time.time() + 3600
-    store.refresh_token = resp_json["refresh_token"]
+    store = ZohoTokenStore(
+        access_token=resp_json["access_token"],
+        refresh_token=resp_json["refresh_token"],
+        expiry_ts=time.time() + 3600,
+    )
+    save_token(user_id, store)
     return store
 
 
-async def get_zoho_access_token(user_id="1"):
-    """Returns a valid access token (refreshes if expired)."""
-    if user_id not in ZOHO_REFRESH_STORE:
-        raise UserNotFound(user_id)
-
-    store = ZOHO_REFRESH_STORE[user_id]
-    if store.access_token and store.expiry_ts > time.time() + 60:
+async def get_zoho_access_token(user_id: str | None = None, min_valid: float = 60):
+    """Returns an access token valid for at least `min_valid` seconds (refreshing it if needed)
+    for `user_id`, the current tenant by default."""
+    user_id = user_id or current_tenant.get()
+    store = load_token(user_id)
+    if store.access_token and store.expiry_ts > time.time() + min_valid:
         return store.access_token
-    return await refresh_zoho_access_token(user_id)
-
-
-async def refresh_zoho_access_token(user_id="1"):
+    # one refresh per tenant at a time; the accounts server throttles refreshes hard
+    lock = _refresh_locks.get(user_id)
+    if lock is None:
+        lock = _refresh_locks[user_id] = asyncio.Lock()
+    async with lock:
+        store = load_token(user_id)
+        if store.access_token and store.expiry_ts > time.time() + min_valid:
+            return store.access_token
+        return await refresh_zoho_access_token(user_id)
+
+
+async def refresh_zoho_access_token(user_id: str | None = None):
     """Refresh the Zoho access token using a stored refresh token."""
-    url = f"{ZOHO_ACCOUNTS_URL}/oauth/v2/token"
-    store = ZOHO_REFRESH_STORE[user_id]
+    user_id = user_id or current_tenant.get()
+    url = EXCHANGE_GRANT_CODE
+    store = load_token(user_id)
 
     params = {
         "grant_type": "refresh_token",
@@ -116,12 +170,12 @@ async def refresh_zoho_access_token(user_id="1"):
         "refresh_token": store.refresh_token
     }
 
-    async with httpx.AsyncClient(timeout=20) as cl:
-        resp = await cl.post(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await request("zoho_accounts", "POST", url, params=params, timeout=20)
+    resp.raise_for_status()
+    data = loads(resp.content)
 
-        store.access_token = data["access_token"]
-        store.expiry_ts = time.time() + data.get("expires_in", 3600)
+    store.access_token = data["access_token"]
+    store.expiry_ts = time.time() + data.get("expires_in", 3600)
+    save_token(user_id, store)
 
-        return store.access_token
+    return store.access_token
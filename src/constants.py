@@ -6,3 +6,121 @@ ZOHO_CLIENT_ID = os.getenv("SER_CLIENT_ID", "")
 ZOHO_CLIENT_SECRET = os.getenv("SER_CLIENT_SECRET", "")
 SERVER_PORT = 8000
 SERVER_HOST = "localhost"
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # gemini | record | replay, see src/intent/backends.py
+LLM_RECORDINGS = os.getenv("LLM_RECORDINGS", "llm_recordings.jsonl")
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0")  # seconds, or "recorded"
+LLM_REPLAY_LATENCY = LLM_REPLAY_LATENCY if LLM_REPLAY_LATENCY == "recorded" else float(LLM_REPLAY_LATENCY)
+
+# production server
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "25"))  # seconds to finish in-flight executes
+
+# shared state (tokens, actions, caches) visible to every worker
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")  # "sqlite" | "memory"
+STATE_DB = os.getenv("STATE_DB", "actionizer_state.db")
+STATE_BUSY_TIMEOUT = 0.05  # seconds one sqlite attempt waits for another worker's write lock
+STATE_BUSY_MAX = 10.0  # seconds of retries before a locked store raises
+TENANT_SECRET = os.getenv("TENANT_SECRET", "")  # signs tenant keys, see src/tenancy.py
+OAUTH_STATE_TTL = 600  # seconds between /auth and Zoho's callback
+TENANTS_TRACKED = 1000  # per worker rate limiters kept for recently active tenants
+ACTION_TTL = int(os.getenv("ACTION_TTL", str(24 * 3600)))
+
+# pooled upstream http client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+# upstream budgets per tenant: (requests/s, burst, initial concurrency).
+# Ceilings follow the providers' documented per-org limits; tune to the org's plan.
+# Each worker process gets an equal share of the budget.
+UPSTREAM_LIMITS = {
+    "zoho_projects": (100 / 120, 20, 4),  # 100 requests / 2 min
+    "zoho_workdrive": (5.0, 20, 8),
+    "zoho_calendar": (2.0, 10, 4),
+    "zoho_cliq": (2.0, 10, 4),
+    "zoho_accounts": (1 / 60, 5, 1),  # token endpoints are throttled hard
+    "jira": (10.0, 20, 8),
+    "default": (5.0, 10, 4),
+}
+UPSTREAM_LIMITS = {k: (rate / WORKERS, max(1, burst / WORKERS), conc) for k, (rate, burst, conc) in UPSTREAM_LIMITS.items()}
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))  # seconds a call may queue for a slot
+
+# retries and circuit breakers for upstream calls
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))  # retries after the first try
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 8.0
+RETRY_BUDGET = float(os.getenv("RETRY_BUDGET", "20"))  # total seconds a call may spend retrying
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+CONNECT_TIMEOUT = 5.0
+
+# /execute-action duplicate suppression
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))  # how long completed results are replayed
+IDEMPOTENCY_CLAIM_TTL = 30  # renewed while the execution runs; a crashed worker's claim expires after this
+
+# responses carrying file bodies at least this big are streamed
+STREAM_RESPONSE_THRESHOLD = 256 * 1024
+
+# large file transfers
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_RESUME_TTL = 24 * 3600
+UPLOAD_SPOOL_MAX = 16 * 1024 * 1024  # async sources above this spill to a temp file
+WORKDRIVE_FANOUT = 4  # concurrent downloads for a multi-file share
+WORKDRIVE_MAX_TOTAL_BYTES = int(os.getenv("WORKDRIVE_MAX_TOTAL_BYTES", str(100 * 1024 * 1024)))
+CLIQ_MAX_ATTACHMENTS = 10  # above this a multi-file share is sent as one zip
+
+# calendar free/busy cache
+FREEBUSY_HORIZON = 14 * 24 * 3600  # how far ahead busy time is cached
+FREEBUSY_NEAR = 24 * 3600  # window refetched when stale, where changes matter most
+FREEBUSY_TTL = 300
+FREEBUSY_CALENDARS = 2000  # per worker calendars kept, least recently used dropped first
+
+# projects task index (duplicate detection)
+TASK_INDEX_DIM = 2 ** 12  # hashed feature buckets
+TASK_INDEX_TTL = 120  # incremental refresh interval
+TASK_INDEX_FULL_SYNC = 3600  # full relist, drops deleted tasks
+TASK_INDEX_PENDING = 256  # patched tasks scored from the overlay before a background rebuild
+TASK_INDEXES = 500  # per worker project indexes kept, least recently used dropped first
+TASK_DUP_THRESHOLD = float(os.getenv("TASK_DUP_THRESHOLD", "0.75"))
+
+# per channel conversation context for intent analysis
+CONTEXT_RING = 8  # recent messages kept verbatim
+CONTEXT_MESSAGE_CHARS = 300  # per recent message
+CONTEXT_SUMMARY_ITEMS = 6  # per summary section
+CONTEXT_TTL = 24 * 3600
+
+# multi-tenant fairness, per worker: (total slots, slots one tenant may hold)
+ANALYZE_SLOTS = (int(os.getenv("ANALYZE_SLOTS", "16")), int(os.getenv("ANALYZE_TENANT_SLOTS", "4")))
+EXECUTE_SLOTS = (int(os.getenv("EXECUTE_SLOTS", "32")), int(os.getenv("EXECUTE_TENANT_SLOTS", "8")))
+TENANT_QUEUE_WAIT = float(os.getenv("TENANT_QUEUE_WAIT", "15"))  # seconds a request may queue for a slot
+METRICS_FLUSH = 10  # seconds between per-worker metrics snapshots
+
+# zoho webhooks and polling fallback
+ZOHO_WEBHOOK_SECRET = os.getenv("ZOHO_WEBHOOK_SECRET", "")  # HMAC key / shared token for /webhooks/zoho
+WEBHOOK_REPLAY_WINDOW = 300  # seconds a webhook body is remembered, and the oldest event accepted
+WEBHOOK_LIVE_WINDOW = 24 * 3600  # a tenant that sent webhooks this recently is polled at POLL_MAX_INTERVAL
+CHANGE_LOG_TTL = 3600  # workers further behind than this on a resource rebuild it instead of patching
+POLL_MAX_INTERVAL = 1800  # upper bound of the adaptive polling interval
+WORKDRIVE_SEARCH_TTL = 60  # search cache lifetime without webhooks
+
+# refresh-ahead warming of hot tenants' tokens and caches
+WARM_INTERVAL = 60  # seconds between warming passes
+WARM_LEAD = 15 * 60  # how far ahead of predicted activity caches are warmed
+WARM_BUDGET = int(os.getenv("WARM_BUDGET", "20"))  # upstream calls per worker per pass
+WARM_HEADROOM = 0.5  # only warm an upstream while this share of its budget is unused
+WARM_MIN_SHARE = 0.2  # an hour counts as active at this share of the tenant's busiest hour
+USAGE_HOT_ITEMS = 5  # files / projects / users warmed per tenant
+USAGE_HALF_LIFE = 14 * 24 * 3600  # old usage fades out so changed habits are picked up
+
+# attachments and pasted logs in intent analysis
+ATTACHMENT_MAX = 5  # attachments read per message
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(64 * 1024 * 1024)))  # read at most this much of one file
+LOG_READ_BUDGET = float(os.getenv("LOG_READ_BUDGET", "1"))  # seconds to read all attachments, added before the LLM call
+LOG_CHUNK = 64 * 1024
+LOG_LINE_CHARS = 1000  # longer lines are cut
+LOG_SIGNATURES = 256  # distinct error signatures counted per file
+LOG_TRACES = 8  # distinct stack traces kept per file
+LOG_TRACE_FRAMES = 8  # frames kept per stack trace
+LOG_DIGEST_CHARS = 2500  # per file, in the prompt and in ticket descriptions
+LOG_INLINE_CHARS = 4000  # a longer message is read as a pasted log
@@ -0,0 +1,167 @@
+"""Process wide pooled HTTP client for upstream calls.
+
+Opening an `httpx.AsyncClient` per call throws away the connection (and the TLS
+handshake) every time. Integrations use `get_client()` instead; the app
+lifespan closes the pool on shutdown.
+
+`request()` is the entry point for upstream calls: it runs each call inside
+the (tenant, upstream) rate limiter so bursts queue instead of turning into
+429 storms, retries what is safe to retry and fails fast through the
+upstream's circuit breaker (see `src.resilience`). `stream()` does the same
+for bodies read incrementally.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from src.constants import (
+    CONNECT_TIMEOUT, DEFAULT_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, RETRY_ATTEMPTS, RETRY_BUDGET
+)
+from src.ratelimit import get_limiter
+from src.resilience import IDEMPOTENT_METHODS, RETRY_STATUSES, backoff_delay, get_breaker
+
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        logger.debug("Opened upstream connection pool")
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.debug("Closed upstream connection pool")
+    _client = None
+
+
+def retry_after_seconds(resp: httpx.Response, default: float = 1.0) -> float:
+    """Parses a Retry-After header (seconds form); falls back to `default`."""
+    value = resp.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+async def _send(upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    limiter = get_limiter(upstream)
+    async with limiter.slot() as permit:
+        try:
+            resp = await get_client().request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            permit.throttled = True
+            raise
+        if resp.status_code == 429:
+            permit.throttled = True
+            limiter.pause(retry_after_seconds(resp))
+    return resp
+
+
+async def request(
+    upstream: str,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool | None = None,
+    retries: int = RETRY_ATTEMPTS,
+    **kwargs,
+) -> httpx.Response:
+    """Sends a request through the shared pool, within `upstream`'s rate limit.
+
+    Args:
+        idempotent: whether the call may be repeated after it possibly reached
+            the server. Defaults to True for GET/HEAD/PUT/DELETE/OPTIONS.
+        retries: extra attempts allowed; pass 0 for bodies that can't be re-sent.
+
+    Raises `RateLimited` when no slot frees up within the allowed wait and
+    `UpstreamUnavailable` while the upstream's circuit breaker is open.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    breaker = get_breaker(upstream)
+    deadline = time.monotonic() + RETRY_BUDGET
+
+    for attempt in range(retries + 1):
+        breaker.before_call()
+        try:
+            resp = await _send(upstream, method, url, **kwargs)
+        except httpx.TransportError as exc:
+            breaker.record_failure()
+            # connect errors never reached the server, so even a POST is safe to repeat
+            safe = idempotent or isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+            delay = backoff_delay(attempt)
+            if not safe or attempt == retries or time.monotonic() + delay > deadline:
+                raise
+            logger.warning(f"{upstream} {method} failed ({exc!r}), retry {attempt + 1} in {delay:.2f}s")
+        except BaseException:
+            # cancelled or rate limited locally: says nothing about the upstream
+            breaker.release_probe()
+            raise
+        else:
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            retryable = resp.status_code == 429 or (idempotent and resp.status_code in RETRY_STATUSES)
+            if not retryable or attempt == retries:
+                return resp
+            delay = retry_after_seconds(resp, default=backoff_delay(attempt))
+            if time.monotonic() + delay > deadline:
+                return resp
+            logger.warning(f"{upstream} {method} got {resp.status_code}, retry {attempt + 1} in {delay:.2f}s")
+            await resp.aclose()
+        await asyncio.sleep(delay)
+
+
+@asynccontextmanager
+async def stream(upstream: str, method: str, url: str, **kwargs):
+    """Like `request()`, but yields the response with its body unread (`resp.aiter_bytes()`).
+
+    The rate limit slot is held until the headers arrive. There are no retries:
+    a partly consumed body can't be replayed.
+    """
+    breaker = get_breaker(upstream)
+    breaker.before_call()
+    limiter = get_limiter(upstream)
+    client = get_client()
+    try:
+        async with limiter.slot() as permit:
+            try:
+                resp = await client.send(client.build_request(method, url, **kwargs), stream=True)
+            except httpx.TimeoutException:
+                permit.throttled = True
+                raise
+            if resp.status_code == 429:
+                permit.throttled = True
+                limiter.pause(retry_after_seconds(resp))
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release_probe()
+        raise
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    try:
+        yield resp
+    finally:
+        await resp.aclose()
@@ -0,0 +1,107 @@
+"""Duplicate suppression for `/execute-action`.
+
+Double clicks and client retries send the same execute twice. Requests are
+keyed on the `Idempotency-Key` header when present, otherwise on the action id
+plus a hash of `updated_params`. For one key:
+    - concurrent duplicates in this worker join the running execution,
+    - duplicates in other workers wait for the claiming worker's result,
+    - completed results are cached for `IDEMPOTENCY_TTL` and replayed. File
+      bodies are not cached (see `without_bodies`); the caller fetches them
+      again for a replay.
+
+Only successful results are cached; a failed execution releases its claim so
+the next attempt runs again. The claim is renewed every third of
+`IDEMPOTENCY_CLAIM_TTL` while the execution runs, however long retries and
+uploads take, so it only expires when its worker dies.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+from src.constants import IDEMPOTENCY_CLAIM_TTL, IDEMPOTENCY_TTL
+from src.serialization import without_bodies
+from src.state import get_store
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+RESULTS_NS = "idempotency_results"
+CLAIMS_NS = "idempotency_claims"
+POLL_INTERVAL = 0.1
+
+
+def execution_key(action_id: str, updated_params: dict[str, Any], header_key: str | None = None) -> str:
+    if header_key:
+        raw = f"header:{header_key}"
+    else:
+        params = json.dumps(updated_params, sort_keys=True, separators=(",", ":"), default=str)
+        raw = f"action:{action_id}:{params}"
+    return f"{current_tenant.get()}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+_inflight: dict[str, asyncio.Future] = {}
+
+
+async def _wait_for_other_worker(key: str) -> dict | None:
+    """Polls until the claiming worker stores a result or gives up (or loses) its claim."""
+    store = get_store()
+    while True:
+        result = await store.aget(RESULTS_NS, key)
+        if result is not None:
+            return result
+        if await store.aget(CLAIMS_NS, key) is None:
+            return None
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def _renew_claim(key: str):
+    store = get_store()
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_CLAIM_TTL / 3)
+        await store.aset(CLAIMS_NS, key, True, ttl=IDEMPOTENCY_CLAIM_TTL)
+
+
+async def run_once(key: str, execute: Callable[[], Awaitable[dict]]) -> tuple[dict, bool]:
+    """Runs `execute` at most once per `key` and returns (result, replayed)."""
+    store = get_store()
+    cached = await store.aget(RESULTS_NS, key)
+    if cached is not None:
+        logger.info(f"Replaying cached result for {key}")
+        return cached, True
+
+    running = _inflight.get(key)
+    if running is not None:
+        logger.info(f"Joining in-flight execution for {key}")
+        return await asyncio.shield(running), True
+
+    future = asyncio.get_running_loop().create_future()
+    # nobody may be waiting on a failure; don't let asyncio warn about it
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+    try:
+        while not await store.aadd(CLAIMS_NS, key, True, ttl=IDEMPOTENCY_CLAIM_TTL):
+            result = await _wait_for_other_worker(key)
+            if result is not None:
+                future.set_result(result)
+                return result, True
+
+        heartbeat = asyncio.create_task(_renew_claim(key))
+        try:
+            result = await execute()
+            await store.aset(RESULTS_NS, key, without_bodies(result), ttl=IDEMPOTENCY_TTL)
+        finally:
+            heartbeat.cancel()
+            await store.adelete(CLAIMS_NS, key)
+        future.set_result(result)
+        return result, False
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        if not future.done():
+            future.set_exception(exc)
+        raise
+    finally:
+        _inflight.pop(key, None)
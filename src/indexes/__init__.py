@@ -0,0 +1,8 @@
+"""Local, in-process indexes over Zoho data.
+
+They let `/analyze-intent` check suggestions against the user's real data
+without an upstream round trip per request. Each index is refreshed
+incrementally in the background and only ever read on the request path.
+Zoho webhooks (`/webhooks/zoho`) patch them through `changes`, with adaptive
+polling as the fallback.
+"""
@@ -0,0 +1,88 @@
+"""Change notifications shared by all workers, and the polling fallback.
+
+The free/busy and task indexes live in each worker's memory, but a Zoho
+webhook reaches only one worker. `publish()` appends the change to a per
+resource log in the shared store; every worker replays the entries it has not
+applied yet (`since()`) on its next lookup, which costs one store read when
+nothing changed. Entries expire after `CHANGE_LOG_TTL`; a worker that fell
+further behind sees a gap and rebuilds the resource from Zoho instead.
+
+Polling stays as the fallback for tenants without webhooks. `AdaptiveInterval`
+doubles the interval after every refresh that found nothing new and drops
+back to the minimum when something changed; tenants whose webhooks arrived
+within `WEBHOOK_LIVE_WINDOW` are only polled at `POLL_MAX_INTERVAL`, as a
+safety net for missed notifications.
+"""
+import time
+
+from src.constants import CHANGE_LOG_TTL, POLL_MAX_INTERVAL, WEBHOOK_LIVE_WINDOW
+from src.state import get_store
+from src.tenancy import current_tenant
+
+CHANGES_NS = "cache_changes"
+HEADS_NS = "cache_change_heads"
+WEBHOOKS_NS = "webhooks_seen"
+
+
+def _resource(resource: str, tenant: str | None) -> str:
+    return f"{tenant or current_tenant.get()}:{resource}"
+
+
+def head(resource: str, tenant: str | None = None) -> int:
+    """Sequence number of the latest change published for `resource` (0 if none)."""
+    return get_store().get(HEADS_NS, _resource(resource, tenant)) or 0
+
+
+def publish(resource: str, change: dict, tenant: str | None = None) -> int:
+    """Appends `change` to the log of `resource` and returns its sequence number."""
+    store = get_store()
+    res = _resource(resource, tenant)
+    seq = head(resource, tenant) + 1
+    # add() is atomic, so concurrent publishers on other workers take the next free number
+    while not store.add(CHANGES_NS, f"{res}:{seq}", change, ttl=CHANGE_LOG_TTL):
+        seq += 1
+    if seq > head(resource, tenant):
+        store.set(HEADS_NS, res, seq, ttl=CHANGE_LOG_TTL)
+    return seq
+
+
+def since(resource: str, applied: int, tenant: str | None = None) -> tuple[list[dict], int, bool]:
+    """Changes after `applied`: (changes, new applied seq, gap).
+
+    `gap` is True when some of them already expired and the caller must rebuild.
+    """
+    latest = head(resource, tenant)
+    if latest <= applied:
+        return [], applied, False
+    store = get_store()
+    res = _resource(resource, tenant)
+    changes = []
+    for seq in range(applied + 1, latest + 1):
+        change = store.get(CHANGES_NS, f"{res}:{seq}")
+        if change is None:
+            return [], latest, True
+        changes.append(change)
+    return changes, latest, False
+
+
+def mark_webhook(source: str, tenant: str | None = None):
+    get_store().set(WEBHOOKS_NS, _resource(source, tenant), time.time(), ttl=WEBHOOK_LIVE_WINDOW)
+
+
+def webhooks_live(source: str, tenant: str | None = None) -> bool:
+    return get_store().get(WEBHOOKS_NS, _resource(source, tenant)) is not None
+
+
+class AdaptiveInterval:
+    """Polling interval that backs off while a resource is quiet."""
+
+    def __init__(self, minimum: float, maximum: float = POLL_MAX_INTERVAL):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.interval = minimum
+
+    def record(self, changed: bool):
+        self.interval = self.minimum if changed else min(self.maximum, self.interval * 2)
+
+    def due(self, last: float, push_live: bool = False) -> bool:
+        return time.time() - last > (self.maximum if push_live else self.interval)
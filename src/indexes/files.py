@@ -0,0 +1,96 @@
+"""Cache of WorkDrive search results.
+
+Searches are cached in the shared store per (tenant, org, query) together with
+the ids of the files they returned, so a WorkDrive webhook can drop exactly the
+entries a change affects:
+    - a changed, moved or deleted file drops every search that returned it
+    - a new or renamed file drops the searches whose words all appear in its name
+Entries live `WORKDRIVE_SEARCH_TTL` seconds, or `POLL_MAX_INTERVAL` for tenants
+whose WorkDrive webhooks are arriving. To find them without scanning the cache,
+each entry is referenced from its file ids and its query words (`REFS_NS`).
+References are read-modify-write: two workers caching at once can lose one,
+and that search then only goes stale until its TTL.
+"""
+import logging
+import re
+from typing import Awaitable, Callable
+
+from src.constants import POLL_MAX_INTERVAL, WORKDRIVE_SEARCH_TTL
+from src.indexes.changes import webhooks_live
+from src.metrics import record
+from src.state import get_store
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+SEARCH_NS = "workdrive_search"
+WARMED_NS = "workdrive_search_warmed"  # entries filled by the warmer and not used yet
+REFS_NS = "workdrive_search_refs"  # "<tenant>:id:<file id>" / "<tenant>:word:<word>" -> search keys
+REFS_MAX = 64  # most recent searches kept per file id / word
+_WORD = re.compile(r"\w+")
+
+
+def _hit_ids(result) -> list[str]:
+    hits = (result.get("data") or result.get("files")) if isinstance(result, dict) else result
+    return [str(h.get("id") or h.get("file_id")) for h in hits or [] if isinstance(h, dict)]
+
+
+def _search_key(org_id: str | None, query: str, limit: int) -> str:
+    return f"{current_tenant.get()}:{org_id}:{limit}:{query.strip().lower()}"
+
+
+def _refs(ref: str) -> list[str]:
+    return get_store().get(REFS_NS, f"{current_tenant.get()}:{ref}") or []
+
+
+def _add_ref(ref: str, key: str):
+    keys = [k for k in _refs(ref) if k != key] + [key]
+    # as long as the longest lived search may still be cached
+    get_store().set(REFS_NS, f"{current_tenant.get()}:{ref}", keys[-REFS_MAX:], ttl=POLL_MAX_INTERVAL)
+
+
+def is_cached(org_id: str | None, query: str, limit: int) -> bool:
+    return get_store().get(SEARCH_NS, _search_key(org_id, query, limit)) is not None
+
+
+async def cached_search(org_id: str | None, query: str, limit: int, search: Callable[[], Awaitable[dict]],
+                        warming: bool = False) -> dict:
+    """Returns the cached result of `search()` for this query, calling it on a miss."""
+    store = get_store()
+    key = _search_key(org_id, query, limit)
+    entry = store.get(SEARCH_NS, key)
+    if entry is not None:
+        if not warming and store.get(WARMED_NS, key) is not None:
+            store.delete(WARMED_NS, key)
+            record("warm.saved")
+        return entry["result"]
+    result = await search()
+    ttl = POLL_MAX_INTERVAL if webhooks_live("workdrive") else WORKDRIVE_SEARCH_TTL
+    ids = _hit_ids(result)
+    store.set(SEARCH_NS, key, {"query": query, "ids": ids, "result": result}, ttl=ttl)
+    for ref in {*(f"id:{i}" for i in ids), *(f"word:{w}" for w in _WORD.findall(query.lower()))}:
+        _add_ref(ref, key)
+    if warming:
+        store.set(WARMED_NS, key, True, ttl=ttl)
+    return result
+
+
+def invalidate_file(file_id: str | None, name: str | None = None) -> int:
+    """Drops the tenant's cached searches affected by a change to `file_id` / a file now called `name`."""
+    store = get_store()
+    name_words = set(_WORD.findall(name.lower())) if name else set()
+    # a search is affected only if it returned the file or shares a word with its name
+    candidates = set(_refs(f"id:{file_id}")) if file_id else set()
+    for word in name_words:
+        candidates.update(_refs(f"word:{word}"))
+    dropped = 0
+    for key in candidates:
+        entry = store.get(SEARCH_NS, key)
+        if entry is None:
+            continue
+        query_words = set(_WORD.findall(entry["query"].lower()))
+        if (file_id and str(file_id) in entry["ids"]) or (query_words and query_words <= name_words):
+            store.delete(SEARCH_NS, key)
+            dropped += 1
+    logger.debug(f"Dropped {dropped} cached WorkDrive searches for file {file_id}")
+    return dropped
@@ -0,0 +1,271 @@
+"""Cached free/busy index used to prefill conflict free calendar slots.
+
+Busy time of a user is kept as sorted, merged, non-overlapping intervals
+(a flattened interval tree: since only the union of busy time matters,
+merged intervals answer "does [s, e) overlap anything" and "next free slot"
+with two bisects). Lookups are pure in-memory and take microseconds; fetching
+from Zoho happens in the background:
+    - the first lookup for a user schedules a fetch of [now, now + horizon)
+    - later refreshes only fetch the part of the horizon not covered yet, plus
+      the near window [now, now + FREEBUSY_NEAR) once its adaptive polling
+      interval (FREEBUSY_TTL while it keeps changing, backing off while quiet) is up
+Calendar webhooks add busy time or mark a range stale through the shared
+change log (`src.indexes.changes`) instead of dropping the whole calendar.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from src.auth import UserNotFound, get_zoho_access_token
+from src.constants import FREEBUSY_CALENDARS, FREEBUSY_HORIZON, FREEBUSY_NEAR, FREEBUSY_TTL
+from src.indexes import changes
+from src.integrations.zoho.calendar import get_zoho_freebusy
+from src.metrics import record
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class BusyIndex:
+    """Merged busy intervals in epoch seconds."""
+
+    def __init__(self):
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start: float, end: float):
+        if end <= start:
+            return
+        # every interval touching [start, end] is merged into one
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def clear_range(self, start: float, end: float):
+        """Forgets busy time inside [start, end), trimming intervals that stick out."""
+        lo = bisect_right(self.ends, start)
+        hi = bisect_left(self.starts, end)
+        keep_s, keep_e = [], []
+        for s, e in zip(self.starts[lo:hi], self.ends[lo:hi]):
+            if s < start:
+                keep_s.append(s); keep_e.append(start)
+            if e > end:
+                keep_s.append(end); keep_e.append(e)
+        self.starts[lo:hi] = keep_s
+        self.ends[lo:hi] = keep_e
+
+    def window(self, start: float, end: float) -> list[tuple[float, float]]:
+        """Busy intervals clipped to [start, end)."""
+        lo = bisect_right(self.ends, start)
+        hi = bisect_left(self.starts, end)
+        return [(max(s, start), min(e, end)) for s, e in zip(self.starts[lo:hi], self.ends[lo:hi])]
+
+    def conflicts(self, start: float, end: float) -> bool:
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def next_free(self, start: float, duration: float, not_after: float | None = None) -> float | None:
+        """Earliest slot start >= `start` with `duration` free seconds, or None past `not_after`."""
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < start + duration:
+            start = max(start, self.ends[i])
+            i += 1
+        if not_after is not None and start > not_after:
+            return None
+        return start
+
+
+class UserCalendar:
+    def __init__(self):
+        self.index = BusyIndex()
+        self.covered_until = 0.0  # busy data is known for [.., covered_until)
+        self.near_fetched_at = 0.0
+        self.refreshing: asyncio.Task | None = None
+        self.poll = changes.AdaptiveInterval(FREEBUSY_TTL)
+        self.applied = 0  # last change log entry applied
+        self.warmed = False  # filled by the warmer, not looked up since
+
+    def near_stale(self, tenant: str | None = None) -> bool:
+        return self.poll.due(self.near_fetched_at, changes.webhooks_live("calendar", tenant))
+
+    def mark_stale(self, start: float | None = None, end: float | None = None):
+        """Forces [start, end) (everything if not given) to be refetched on the next refresh."""
+        if start is None or end is None:
+            self.near_fetched_at = self.covered_until = 0.0
+            return
+        near_end = time.time() + FREEBUSY_NEAR
+        if start < near_end:
+            self.near_fetched_at = 0.0
+        if end > near_end:
+            self.covered_until = min(self.covered_until, max(start, near_end))
+
+
+# most recently used last; a dropped calendar is fetched again on its next lookup
+_calendars: OrderedDict[tuple[str, str], UserCalendar] = OrderedDict()
+
+
+def get_calendar(user: str, tenant: str | None = None) -> UserCalendar:
+    key = (tenant or current_tenant.get(), user)
+    cal = _calendars.get(key)
+    if cal is None:
+        cal = _calendars[key] = UserCalendar()
+        cal.applied = changes.head(f"calendar:{user}", tenant)
+        excess = len(_calendars) - FREEBUSY_CALENDARS
+        if excess > 0:
+            for old_key, old in list(_calendars.items())[:excess]:
+                if old.refreshing is None or old.refreshing.done():
+                    del _calendars[old_key]
+    else:
+        _calendars.move_to_end(key)
+    return cal
+
+
+def publish_change(user: str, start: datetime | None = None, end: datetime | None = None, busy: bool = False):
+    """Records a calendar change (from a webhook) for every worker's index.
+
+    With `busy` the range is added as busy time right away (a new event);
+    otherwise the range (or the whole calendar) is refetched on the next refresh.
+    """
+    change = {
+        "start": start.timestamp() if start else None,
+        "end": end.timestamp() if end else None,
+        "busy": busy and start is not None and end is not None,
+    }
+    changes.publish(f"calendar:{user}", change)
+
+
+def apply_changes(user: str):
+    """Patches this worker's busy index with changes published since it last looked."""
+    cal = get_calendar(user)
+    pending, cal.applied, gap = changes.since(f"calendar:{user}", cal.applied)
+    if gap:
+        cal.mark_stale()
+    for change in pending:
+        if change["busy"]:
+            if change["end"] <= cal.covered_until:
+                cal.index.add(change["start"], change["end"])
+        else:
+            cal.mark_stale(change["start"], change["end"])
+
+
+def invalidate(user: str, tenant: str | None = None):
+    """Drops cached busy time so the next lookup refetches it."""
+    _calendars.pop((tenant or current_tenant.get(), user), None)
+
+
+async def refresh(user: str, access_token: str, tenant: str | None = None, max_calls: int | None = None) -> int:
+    """Fetches the parts of the horizon that are missing or stale; returns the calls made.
+
+    With `max_calls` 1 only the first range (the near window when it is stale) is fetched.
+    """
+    cal = get_calendar(user, tenant)
+    now = time.time()
+    target = now + FREEBUSY_HORIZON
+    near_stale = cal.near_stale(tenant)
+    fetch_from = now if near_stale else max(now, cal.covered_until)
+    if not near_stale and fetch_from >= target:
+        return 0
+    # one call covers the stale near window and the uncovered tail when they touch
+    ranges = [(fetch_from, target)]
+    if near_stale and cal.covered_until > now + FREEBUSY_NEAR:
+        ranges = [(now, now + FREEBUSY_NEAR), (cal.covered_until, target)]
+    ranges = [(start, end) for start, end in ranges if end > start][:max_calls]
+
+    before = cal.index.window(now, now + FREEBUSY_NEAR)
+    for start, end in ranges:
+        busy = await get_zoho_freebusy(
+            access_token, user,
+            datetime.fromtimestamp(start, tz=timezone.utc), datetime.fromtimestamp(end, tz=timezone.utc),
+        )
+        cal.index.clear_range(start, end)
+        for s, e in busy:
+            cal.index.add(s.timestamp(), e.timestamp())
+        cal.covered_until = max(cal.covered_until, end)
+    if near_stale:
+        cal.near_fetched_at = now
+        cal.poll.record(cal.index.window(now, now + FREEBUSY_NEAR) != before)
+    logger.debug(f"Free/busy for {user}: {len(cal.index)} busy ranges")
+    return len(ranges)
+
+
+def schedule_refresh(user: str):
+    """Starts a background refresh for `user` unless one is already running."""
+    cal = get_calendar(user)
+    if cal.refreshing is not None and not cal.refreshing.done():
+        return
+    tenant = current_tenant.get()
+
+    async def run():
+        try:
+            await refresh(user, await get_zoho_access_token(tenant), tenant)
+        except UserNotFound:
+            logger.debug(f"No zoho token for tenant {tenant}, skipping free/busy refresh")
+        except Exception as exc:
+            logger.warning(f"Free/busy refresh for {user} failed: {exc!r}")
+
+    cal.refreshing = asyncio.create_task(run())
+
+
+def suggest_slot(user: str, start: datetime, end: datetime) -> tuple[datetime, datetime] | None:
+    """Returns a conflict free slot of the same length at or after `start`.
+
+    Only cached data is used. Returns None when the cache can't tell (cold or
+    beyond the horizon) or when [start, end) is already free; a refresh is
+    scheduled when the cache is stale.
+    """
+    apply_changes(user)
+    cal = get_calendar(user)
+    if cal.warmed:
+        cal.warmed = False
+        record("warm.saved")
+    s, e = start.timestamp(), end.timestamp()
+    now = time.time()
+    if cal.near_stale() or cal.covered_until < now + FREEBUSY_HORIZON / 2:
+        schedule_refresh(user)
+    if e > cal.covered_until or not cal.index.conflicts(s, e):
+        return None
+    free = cal.index.next_free(s, e - s, not_after=cal.covered_until - (e - s))
+    if free is None:
+        return None
+    return (
+        datetime.fromtimestamp(free, tz=start.tzinfo or timezone.utc),
+        datetime.fromtimestamp(free + (e - s), tz=start.tzinfo or timezone.utc),
+    )
+
+
+def prefill_free_slot(prefill: dict, user: str | None) -> bool:
+    """Moves `start_iso`/`end_iso` in a calendar prefill to the next free slot if they clash.
+
+    The requested times are kept as `requested_start_iso`/`requested_end_iso`.
+    Returns True when the prefill was changed.
+    """
+    if not user or not prefill.get("start_iso") or not prefill.get("end_iso"):
+        return False
+    try:
+        start = datetime.fromisoformat(str(prefill["start_iso"]).replace("Z", "+00:00"))
+        end = datetime.fromisoformat(str(prefill["end_iso"]).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    # the LLM may give one of them with an offset and the other without
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if end <= start:
+        return False
+    slot = suggest_slot(user, start, end)
+    if slot is None:
+        return False
+    prefill["requested_start_iso"], prefill["requested_end_iso"] = prefill["start_iso"], prefill["end_iso"]
+    prefill["start_iso"], prefill["end_iso"] = slot[0].isoformat(), slot[1].isoformat()
+    return True
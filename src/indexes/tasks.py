@@ -0,0 +1,362 @@
+"""Per project task index for duplicate detection.
+
+Before suggesting a new Zoho Projects task we check the project's existing
+tasks locally instead of calling `search_zoho_project_tasks` per action.
+
+Each task's name and description are turned into a hashed TF-IDF vector
+(word unigrams and character trigrams hashed into `TASK_INDEX_DIM` buckets),
+L2-normalised and kept as sparse rows: a task uses a few dozen of the buckets,
+so the project is stored as flat (row, bucket, weight) arrays, about 0.75 KB
+per task (1.5 MB for 2000 tasks, see benchmarks/bench_task_index.py), and
+scoring a new task against the whole project is one vectorised gather and
+`bincount`. A worker keeps at most `TASK_INDEXES` projects, least recently used
+dropped first.
+
+Refreshes run in the background: recently modified tasks are listed newest
+first until the page reaches the last sync watermark, and the whole project
+is relisted every `TASK_INDEX_FULL_SYNC` seconds to drop deleted tasks.
+Projects webhooks patch the index through the shared change log
+(`src.indexes.changes`), so polling backs off while they arrive. Patches go
+to an overlay next to the built rows and are folded in by a background
+rebuild, so a change never makes a lookup rebuild the index.
+"""
+import asyncio
+import logging
+import re
+import time
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from src.auth import UserNotFound, get_zoho_access_token
+from src.constants import (
+    TASK_DUP_THRESHOLD, TASK_INDEX_DIM, TASK_INDEX_FULL_SYNC, TASK_INDEX_PENDING, TASK_INDEX_TTL, TASK_INDEXES,
+)
+from src.indexes import changes
+from src.integrations.zoho.projects import list_zoho_project_tasks
+from src.metrics import record
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+_WORD = re.compile(r"\w+")
+
+
+def _features(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Hashed term counts of word unigrams and character trigrams, as (buckets, log counts)."""
+    counts = Counter()
+    for word in _WORD.findall(text.lower()):
+        counts[zlib.crc32(word.encode()) % TASK_INDEX_DIM] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode()) % TASK_INDEX_DIM] += 1
+    buckets = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return buckets, values
+
+
+def _modified(task: dict) -> float:
+    value = task.get("last_modified_time") or task.get("last_updated_time")
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class _Built(NamedTuple):
+    ids: list[str]
+    pos: dict[str, int]  # task id -> row
+    rows: np.ndarray  # row of each stored weight
+    buckets: np.ndarray
+    weights: np.ndarray  # idf weighted, rows L2 normalised
+    idf: np.ndarray
+
+
+def _normalised(features: tuple[np.ndarray, np.ndarray], idf: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    buckets, tf = features
+    weighted = tf * idf[buckets]
+    return buckets, weighted / max(float(np.linalg.norm(weighted)), 1e-9)
+
+
+def _compute(features: dict[str, tuple[np.ndarray, np.ndarray]]) -> _Built:
+    """Flattens term vectors into idf weighted, row normalised sparse rows."""
+    ids = list(features)
+    vectors = [features[i] for i in ids]
+    lengths = np.fromiter((len(b) for b, _ in vectors), dtype=np.int64, count=len(vectors))
+    rows = np.repeat(np.arange(len(vectors), dtype=np.int32), lengths)
+    buckets = np.concatenate([b for b, _ in vectors]) if vectors else np.zeros(0, dtype=np.int32)
+    tf = np.concatenate([v for _, v in vectors]) if vectors else np.zeros(0, dtype=np.float32)
+    df = np.bincount(buckets, minlength=TASK_INDEX_DIM)
+    idf = (np.log((1 + len(ids)) / (1 + df)) + 1).astype(np.float32)
+    weighted = tf * idf[buckets]
+    norms = np.sqrt(np.bincount(rows, weights=weighted * weighted, minlength=len(ids)))
+    weights = (weighted / np.maximum(norms, 1e-9)[rows]).astype(np.float32)
+    return _Built(ids, {task_id: row for row, task_id in enumerate(ids)}, rows, buckets, weights, idf)
+
+
+class TaskIndex:
+    """Built rows plus a small overlay of changes made since the last build.
+
+    A change to a built index masks the task's old row and scores its new text
+    from the overlay (weighted with the idf of the last build), so lookups
+    never rebuild; `rebuild()` folds the overlay in off the event loop.
+    """
+
+    def __init__(self):
+        self.tasks: dict[str, dict] = {}  # task id -> {"name", "description"}
+        self.features: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self.watermark = 0.0  # newest last_modified_time seen
+        self.synced_at = 0.0
+        self.full_synced_at = 0.0
+        self.refreshing: asyncio.Task | None = None
+        self.rebuilding: asyncio.Task | None = None
+        self.poll = changes.AdaptiveInterval(TASK_INDEX_TTL)
+        self.applied = 0  # last change log entry applied
+        self.warmed = False  # filled by the warmer, not looked up since
+        self._built: _Built | None = None
+        self._dead = np.zeros(0, dtype=bool)  # built rows replaced or removed since
+        self._overlay: dict[str, tuple] = {}  # task id -> (version, buckets, weights), None weights if removed
+        self._version = 0
+
+    def upsert(self, task_id: str, name: str, description: str | None = None):
+        self.tasks[task_id] = {"name": name, "description": description or ""}
+        self.features[task_id] = _features(f"{name} {description or ''}")
+        self._changed(task_id)
+
+    def remove(self, task_id: str):
+        if self.tasks.pop(task_id, None) is not None:
+            self.features.pop(task_id, None)
+            self._changed(task_id)
+
+    def _changed(self, task_id: str):
+        self._version += 1
+        if self._built is not None:
+            self._patch(task_id, self._version)
+        else:
+            # the first build may be running on an older snapshot; `_swap` replays this change onto it
+            self._overlay[task_id] = (self._version, None, None)
+
+    def _patch(self, task_id: str, version: int):
+        """Masks the task's built row and moves its current text (if any) to the overlay."""
+        row = self._built.pos.get(task_id)
+        if row is not None:
+            self._dead[row] = True
+        features = self.features.get(task_id)
+        self._overlay[task_id] = (version, None, None) if features is None else (
+            version, *_normalised(features, self._built.idf))
+
+    @property
+    def pending(self) -> int:
+        """Changes not folded into the built rows yet (nothing is built before the first build)."""
+        return len(self._overlay) if self._built is not None else 0
+
+    def _swap(self, built: _Built, version: int):
+        """Installs rows built from the tasks as of `version`, keeping later changes in the overlay."""
+        self._built = built
+        self._dead = np.zeros(len(built.ids), dtype=bool)
+        overlay, self._overlay = self._overlay, {}
+        for task_id, (changed, _, _) in overlay.items():
+            if changed > version:
+                self._patch(task_id, changed)
+
+    def build(self):
+        self._swap(_compute(dict(self.features)), self._version)
+
+    async def rebuild(self):
+        """`build()` in a worker thread; lookups use the previous rows meanwhile."""
+        snapshot, version = dict(self.features), self._version
+        self._swap(await asyncio.to_thread(_compute, snapshot), version)
+
+    def schedule_rebuild(self):
+        if self.rebuilding is None or self.rebuilding.done():
+            self.rebuilding = asyncio.create_task(self.rebuild())
+
+    def similar(self, text: str, k: int = 3) -> list[tuple[str, float]]:
+        """Top `k` (task id, cosine similarity) for `text`."""
+        if self._built is None:
+            self.build()
+        built = self._built
+        buckets, values = _features(text)
+        q = np.zeros(TASK_INDEX_DIM, dtype=np.float32)
+        q[buckets] = values * built.idf[buckets]
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        q /= norm
+        scores = np.bincount(built.rows, weights=built.weights * q[built.buckets], minlength=len(built.ids))
+        scores = scores.astype(np.float64, copy=False)  # bincount of nothing is an int array
+        scores[self._dead] = -np.inf
+        ids = built.ids
+        live = [(task_id, b, w) for task_id, (_, b, w) in self._overlay.items() if w is not None]
+        if live:
+            ids = ids + [task_id for task_id, _, _ in live]
+            scores = np.concatenate([scores, [float(w @ q[b]) for _, b, w in live]])
+        k = min(k, int(np.count_nonzero(scores > -np.inf)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+
+# most recently used last; portal and project ids come from LLM prefills, so they are bounded
+_indexes: OrderedDict[tuple[str, str, str], TaskIndex] = OrderedDict()
+
+
+def _resource(portal_id: str, project_id: str) -> str:
+    return f"projects:{portal_id}:{project_id}"
+
+
+def get_index(portal_id: str, project_id: str, tenant: str | None = None) -> TaskIndex:
+    key = (tenant or current_tenant.get(), str(portal_id), str(project_id))
+    idx = _indexes.get(key)
+    if idx is None:
+        idx = _indexes[key] = TaskIndex()
+        # a new index is built from a full listing, older changes are already in it
+        idx.applied = changes.head(_resource(portal_id, project_id), tenant)
+        excess = len(_indexes) - TASK_INDEXES
+        if excess > 0:
+            for old_key, old in list(_indexes.items())[:excess]:
+                if all(t is None or t.done() for t in (old.refreshing, old.rebuilding)):
+                    del _indexes[old_key]
+    else:
+        _indexes.move_to_end(key)
+    return idx
+
+
+def publish_change(portal_id: str, project_id: str, task_id: str, name: str | None = None,
+                   description: str | None = None, removed: bool = False):
+    """Records a task change (from a webhook) for every worker's index."""
+    change = {"id": str(task_id), "removed": removed, "name": name, "description": description}
+    changes.publish(_resource(portal_id, project_id), change)
+
+
+def apply_changes(portal_id: str, project_id: str):
+    """Patches this worker's index with changes published since it last looked."""
+    idx = get_index(portal_id, project_id)
+    pending, idx.applied, gap = changes.since(_resource(portal_id, project_id), idx.applied)
+    if gap:
+        idx.synced_at = idx.full_synced_at = 0.0  # rebuild on the next lookup
+        return
+    for change in pending:
+        if change["removed"]:
+            idx.remove(change["id"])
+        elif change["name"]:
+            idx.upsert(change["id"], change["name"], change["description"])
+        else:
+            idx.synced_at = 0.0  # change without details, pick it up with an incremental refresh
+
+
+def pages_needed(idx: TaskIndex) -> int:
+    """Expected list calls of the next refresh: every page on a full sync, usually one otherwise."""
+    if time.time() - idx.full_synced_at > TASK_INDEX_FULL_SYNC:
+        return len(idx.tasks) // PAGE_SIZE + 1
+    return 1
+
+
+async def refresh(portal_id: str, project_id: str, access_token: str, tenant: str | None = None,
+                  max_pages: int | None = None) -> int:
+    """Pulls tasks changed since the last sync (or every task on a full sync); returns the pages fetched.
+
+    A sync cut short by `max_pages` keeps what it fetched but doesn't count as a sync, so the next one redoes it.
+    """
+    idx = get_index(portal_id, project_id, tenant)
+    now = time.time()
+    full = now - idx.full_synced_at > TASK_INDEX_FULL_SYNC
+    seen: set[str] = set()
+    newest = idx.watermark
+    page = 1
+    while True:
+        if max_pages is not None and page > max_pages:
+            logger.debug(f"Task index {portal_id}/{project_id}: sync stopped after {max_pages} pages")
+            await idx.rebuild()
+            return max_pages
+        resp = await list_zoho_project_tasks(
+            access_token, portal_id, project_id,
+            page=page, per_page=PAGE_SIZE, sort_by="DESC(last_modified_time)",
+        )
+        tasks = resp.get("tasks") or []
+        stale = 0
+        for task in tasks:
+            modified = _modified(task)
+            if not full and modified and modified <= idx.watermark:
+                stale += 1  # unchanged since the last sync
+                continue
+            task_id = str(task.get("id") or task.get("id_string"))
+            seen.add(task_id)
+            idx.upsert(task_id, task.get("name") or "", task.get("description"))
+            newest = max(newest, modified)
+        # pages come newest first, so a page holding unchanged tasks is the last one with changes;
+        # should the order ever not hold, the periodic full sync still catches what was skipped
+        if stale or len(tasks) < PAGE_SIZE:
+            break
+        page += 1
+
+    removed = set(idx.tasks) - seen if full else set()
+    for task_id in removed:
+        idx.remove(task_id)
+    if full:
+        idx.full_synced_at = now
+    # a full sync relists everything, so only new modifications or deletions count as change
+    idx.poll.record(newest > idx.watermark or bool(removed))
+    idx.watermark = newest
+    idx.synced_at = now
+    await idx.rebuild()  # here rather than on the first lookup, keeps the analyze path cheap
+    logger.debug(f"Task index {portal_id}/{project_id}: {len(idx.tasks)} tasks ({'full' if full else 'incremental'})")
+    return page
+
+
+def schedule_refresh(portal_id: str, project_id: str):
+    """Starts a background refresh unless one is already running."""
+    idx = get_index(portal_id, project_id)
+    if idx.refreshing is not None and not idx.refreshing.done():
+        return
+    tenant = current_tenant.get()
+
+    async def run():
+        try:
+            await refresh(portal_id, project_id, await get_zoho_access_token(tenant), tenant)
+        except UserNotFound:
+            logger.debug(f"No zoho token for tenant {tenant}, skipping task index refresh")
+        except Exception as exc:
+            logger.warning(f"Task index refresh for {portal_id}/{project_id} failed: {exc!r}")
+
+    idx.refreshing = asyncio.create_task(run())
+
+
+def find_duplicates(portal_id: str, project_id: str, text: str, k: int = 3) -> list[dict]:
+    """Cached lookup of existing tasks similar to `text` (score >= TASK_DUP_THRESHOLD).
+
+    Never calls Zoho; schedules a refresh when the adaptive polling interval is up.
+    """
+    apply_changes(portal_id, project_id)
+    idx = get_index(portal_id, project_id)
+    if idx.warmed:
+        idx.warmed = False
+        record("warm.saved")
+    if idx.poll.due(idx.synced_at, changes.webhooks_live("projects")):
+        schedule_refresh(portal_id, project_id)
+    elif idx.pending > TASK_INDEX_PENDING:
+        idx.schedule_rebuild()
+    return [
+        {"task_id": task_id, "name": idx.tasks[task_id]["name"], "score": round(score, 3)}
+        for task_id, score in idx.similar(text, k)
+        if score >= TASK_DUP_THRESHOLD
+    ]
+
+
+def update_suggestion_for(prefill: dict, duplicates: list[dict]) -> dict | None:
+    """Prefill for updating the best matching existing task instead of creating a new one."""
+    if not duplicates or not prefill.get("portal_id") or not prefill.get("project_id"):
+        return None
+    best = duplicates[0]
+    update = {k: prefill[k] for k in ("portal_id", "project_id", "description", "end_date", "priority") if prefill.get(k)}
+    update["task_id"] = best["task_id"]
+    update["name"] = best["name"]
+    return update
@@ -1,19 +1,71 @@
 """Integrations that are available in the extenstion
 
 Each file typically exposes a simple `create` function.
+
+`TOOLS` describes every tool once: what the LLM is told about it (`TOOLS_INFO`)
+and the fixed parts of its suggestions (see `src.intent.suggestions`).
 """
-from textwrap import dedent
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Tool:
+    id: str
+    summary: str  # what the tool does, for the LLM
+    fields: dict[str, str]  # form fields in display order -> hint for the LLM ("" if self explanatory)
+    title: str  # suggestion title, may use {field} placeholders from the prefill
+    description: str
+    form_fields: tuple[str, ...] = ()  # extra fields the form accepts but the LLM doesn't fill
+    suggested_by_llm: bool = True
+
 
+TOOLS = {t.id: t for t in [
+    Tool(
+        "jira", "Create a Jira ticket",
+        {"project_key": "", "summary": "", "description": "", "issuetype": "Task/Bug", "duedate": "ISO"},
+        title="Create Jira ticket: {summary}",
+        description="Create a Jira ticket to track this.",
+    ),
+    Tool(
+        "zoho_projects", "Create Zoho Projects task",
+        {"portal_id": "", "project_id": "", "name": "", "description": "", "start_date": "", "end_date": "",
+         "priority": "optional"},
+        title="Create Zoho Projects task: {name}",
+        description="Create a task in Zoho Projects.",
+    ),
+    Tool(
+        "zoho_calendar", "Create Zoho Calendar event",
+        {"calendar_id": "", "title": "", "start_iso": "", "end_iso": "", "description": "", "location": "optional"},
+        title="Schedule: {title}",
+        description="Create a Zoho Calendar event.",
+    ),
+    Tool(
+        "zoho_workdrive", "Retrieve or attach WorkDrive files",
+        {"org_id": "",
+         "name_or_query": "a string, or a list of strings when several files are asked for",
+         "file_id": "optional, string or list",
+         "bundle": 'optional, "zip" to send several files as one archive'},
+        title="Share from WorkDrive: {name_or_query}",
+        description="Find the file(s) in WorkDrive and share them here.",
+        form_fields=("cliq_target", "message", "filename"),
+    ),
+    Tool(
+        "zoho_projects_update", "Update an existing Zoho Projects task",
+        {"portal_id": "", "project_id": "", "task_id": "", "name": "", "description": "", "end_date": "",
+         "priority": ""},
+        title="Update existing task: {name}",
+        description="A similar task already exists in this project; update it instead of creating a duplicate.",
+        suggested_by_llm=False,  # offered by duplicate detection
+    ),
+]}
 
-# def make_tool_info(funs):
-#     return "\n".join([str(f.__doc__) for f in funs])
 
-# TOOLS_INFO = make_tool_info()
+def make_tool_info(tools) -> str:
+    lines = []
+    for tool in tools:
+        fields = ", ".join(f"{name} ({hint})" if hint else name for name, hint in tool.fields.items())
+        lines.append(f"- {tool.id}: {tool.summary}. Fields: {fields}")
+    return "\n" + "\n".join(lines) + "\n"
 
 
-TOOLS_INFO = dedent("""
-    - jira: Create a Jira ticket. Expected fields: project_key, summary, description, issuetype (Task/Bug), duedate (ISO)
-    - zoho_projects: Create Zoho Projects task. Expected fields: portal_id, project_id, name, description, start_date, end_date
-    - zoho_calendar: Create Zoho Calendar event. Expected fields: calendar_id, title, start_iso, end_iso, description, location(optional)
-    - zoho_workdrive: Retrieve or attach WorkDrive file. Expected fields: org_id, name_or_query, file_id (optional)
-""")
+TOOLS_INFO = make_tool_info(t for t in TOOLS.values() if t.suggested_by_llm)
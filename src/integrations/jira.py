@@ -1,18 +1,27 @@
-from jira import JIRA
+import asyncio
 
+from jira import JIRA, JIRAError
+import requests
 
-def create_jira_ticket(title, description, issuetype, project_key, due_date):
+from src.ratelimit import get_limiter
+from src.resilience import get_breaker
+
+
+def _create_issue(project_key, summary, description, issuetype, duedate):
     jira = JIRA(
         server="https://your-domain.atlassian.net",
         basic_auth=("email@example.com", "api_token")
     )
 
-    issue = jira.create_issue(fields={
+    fields = {
         "project": {"key": project_key},
-        "summary": title,
+        "summary": summary,
         "description": description,
         "issuetype": {"name": issuetype}
-    })
+    }
+    if duedate:
+        fields["duedate"] = duedate[:10]  # jira wants YYYY-MM-DD
+    issue = jira.create_issue(fields=fields)
 
     return {
         "id": issue.id,
@@ -20,5 +29,36 @@ def create_jira_ticket(title, description, issuetype, project_key, due_date):
         "url": f"https://your-domain.atlassian.net/browse/{issue.key}"
     }
 
+
+def _retry_after(exc: JIRAError, default: float = 1.0) -> float:
+    """Seconds from the Retry-After header of a 429; falls back to `default`."""
+    value = exc.response.headers.get("Retry-After") if exc.response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+def _is_outage(exc: Exception) -> bool:
+    if isinstance(exc, JIRAError):
+        return exc.status_code is None or exc.status_code >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+async def create_jira_ticket(project_key, summary, description="", issuetype="Task", duedate=None):
+    """Creates a Jira issue. The jira client is blocking, so it runs in a thread within the jira rate limit.
+
+    Issue creation isn't idempotent, so it is never retried; the breaker still fails fast during outages.
+    """
+    limiter = get_limiter("jira")
+    async with get_breaker("jira").guard(_is_outage), limiter.slot() as permit:
+        try:
+            return await asyncio.to_thread(_create_issue, project_key, summary, description, issuetype, duedate)
+        except JIRAError as exc:
+            if exc.status_code == 429:
+                permit.throttled = True
+                limiter.pause(_retry_after(exc))
+            raise
+
 def create(payload) -> dict:
     return {"id": "...", "url": "..."}
@@ -1,14 +1,17 @@
+from datetime import datetime, timezone
 import httpx
 from src.auth import zoho_headers
+from src.http_client import request
+from src.serialization import loads
 from src.constants import DEFAULT_TIMEOUT
+from .urls import CALENDAR_API
 
 
 async def create_zoho_calendar_event(access_token, calendar_id, title, start_iso, end_iso, location=None, description=None):
     """
     Use RFC3339 / ISO timestamps (Zoho expects those); confirm exact expected field names in the Calendar API doc. 
     """
-    base = "https://calendar.zoho.com/api/v1"
-    url = f"{base}/calendars/{calendar_id}/events"
+    url = f"{CALENDAR_API}/calendars/{calendar_id}/events"
 
     payload = {
         "title": title,
@@ -18,10 +21,44 @@ async def create_zoho_calendar_event(access_token, calendar_id, title, start_iso
     if location: payload["location"] = location
     if description: payload["description"] = description
 
-    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
-        r = await client.post(url, params=zoho_headers(access_token))
-        r.raise_for_status()
-        return r.json()
+    r = await request("zoho_calendar", "POST", url, headers=zoho_headers(access_token), json=payload)
+    r.raise_for_status()
+    return loads(r.content)
+
+
+def _zoho_ts(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _parse_ts(value) -> datetime:
+    if isinstance(value, (int, float)):  # epoch millis
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    value = str(value)
+    if len(value) == 16 and value[8] == "T":  # yyyyMMddTHHmmssZ
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+async def get_zoho_freebusy(access_token, user_email, start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Returns the busy ranges of `user_email` between `start` and `end`.
+    Zoho answers with a `freebusy` list of {startTime, endTime, fbtype}; only busy entries are kept.
+    """
+    url = f"{CALENDAR_API}/calendars/freebusy"
+    params = {
+        "uemail": user_email,
+        "sdate": _zoho_ts(start),
+        "edate": _zoho_ts(end),
+        "ftype": "eventbased",
+    }
+    r = await request("zoho_calendar", "GET", url, headers=zoho_headers(access_token), params=params)
+    r.raise_for_status()
+    busy = []
+    for item in loads(r.content).get("freebusy", []):
+        if item.get("fbtype", "busy") != "busy":
+            continue
+        busy.append((_parse_ts(item["startTime"]), _parse_ts(item["endTime"])))
+    return busy
 
 def create(payload) -> dict:
     return {"id": "...", "url": "..."}
\ No newline at end of file
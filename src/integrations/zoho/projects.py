@@ -3,6 +3,8 @@ import requests
 import json
 
 from src.auth import zoho_headers
+from src.http_client import request
+from src.serialization import loads
 from .urls import PROJECT_API
 
 
@@ -65,14 +67,13 @@ async def create_zoho_project_task(
 
     payload = {"task": task_data}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            url,
-            headers=zoho_headers(access_token),
-            json=payload
-        )
-        resp.raise_for_status()
-        return resp.json()
+    resp = await request(
+        "zoho_projects", "POST", url,
+        headers=zoho_headers(access_token),
+        json=payload
+    )
+    resp.raise_for_status()
+    return loads(resp.content)
 
 
 async def update_zoho_project_task(
@@ -115,10 +116,9 @@ async def update_zoho_project_task(
 
     payload = {"task": updates}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, headers=zoho_headers(access_token), json=payload)
-        resp.raise_for_status()
-        return resp.json()
+    resp = await request("zoho_projects", "POST", url, headers=zoho_headers(access_token), json=payload)
+    resp.raise_for_status()
+    return loads(resp.content)
 
 async def list_zoho_project_tasks(
     access_token: str,
@@ -126,6 +126,9 @@ async def list_zoho_project_tasks(
     project_id: str,
     owner_id: str | None = None,
     status: str | None = None,
+    page: int | None = None,
+    per_page: int | None = None,
+    sort_by: str | None = None,
 ):
     """List tasks inside a Zoho Projects project.
 
@@ -141,6 +144,13 @@ async def list_zoho_project_tasks(
         status (str, optional):
             Filter by task status
             (Open, Closed, In Progress, On Hold).
+        page (int, optional):
+            1-based page number for paged listing.
+        per_page (int, optional):
+            Tasks per page (Zoho caps this at 100).
+        sort_by (str, optional):
+            Sort expression, "ASC(<field>)" or "DESC(<field>)", e.g.
+            "DESC(last_modified_time)" to list recently changed tasks first.
 
     Returns:
         dict: JSON list of tasks returned by Zoho Projects API.
@@ -152,11 +162,16 @@ async def list_zoho_project_tasks(
         params["owner"] = owner_id
     if status:
         params["task_status"] = status
+    if page:
+        params["page"] = page
+    if per_page:
+        params["per_page"] = per_page
+    if sort_by:
+        params["sort_by"] = sort_by
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(url, headers=zoho_headers(access_token), params=params)
-        resp.raise_for_status()
-        return resp.json()
+    resp = await request("zoho_projects", "GET", url, headers=zoho_headers(access_token), params=params)
+    resp.raise_for_status()
+    return loads(resp.content)
 
 async def search_zoho_project_tasks(
     access_token: str,
@@ -186,10 +201,9 @@ async def search_zoho_project_tasks(
 
     params = {"search": query}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(url, headers=zoho_headers(access_token), params=params)
-        resp.raise_for_status()
-        return resp.json()
+    resp = await request("zoho_projects", "GET", url, headers=zoho_headers(access_token), params=params)
+    resp.raise_for_status()
+    return loads(resp.content)
 
 async def create_zoho_project_task_in_milestone(
     access_token: str,
@@ -247,7 +261,6 @@ async def create_zoho_project_task_in_milestone(
 
     payload = {"task": task}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, headers=zoho_headers(access_token), json=payload)
-        resp.raise_for_status()
-        return resp.json()
+    resp = await request("zoho_projects", "POST", url, headers=zoho_headers(access_token), json=payload)
+    resp.raise_for_status()
+    return loads(resp.content)
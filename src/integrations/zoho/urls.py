@@ -2,3 +2,4 @@ PROJECT_API = "https://projectsapi.zoho.com/api/v3"
 CALENDAR_API = "https://calendar.zoho.com/api/v1"
 WORKDRIVE_API = "https://www.zohoapis.com/workdrive/api/v1"
 ZOHO_ACCOUNTS_URL = "https://accounts.zoho.com/oauth"
+WORKDRIVE_UPLOAD_API = "https://upload.zoho.com/workdrive-api/v1"
@@ -1,35 +1,218 @@
-import base64
+import asyncio
+import mimetypes
+import shutil
+import tempfile
+import uuid
+import zipfile
+from contextlib import aclosing
+from typing import AsyncIterator, BinaryIO
+from urllib.parse import quote
 from fastapi import HTTPException
 import httpx
 import requests
 from src.api.schemas import ExecuteActionResponse
 from src.auth import zoho_headers
-from .urls import WORKDRIVE_API
+from src.constants import (
+    CLIQ_MAX_ATTACHMENTS, UPLOAD_CHUNK_SIZE, UPLOAD_RESUME_TTL, UPLOAD_SPOOL_MAX, WORKDRIVE_FANOUT,
+    WORKDRIVE_MAX_TOTAL_BYTES,
+)
+from src.http_client import request, stream
+from src.indexes.files import cached_search
+from src.serialization import Base64Body, is_body_ref, loads
+from src.state import get_store
+from .urls import WORKDRIVE_API, WORKDRIVE_UPLOAD_API
 import logging
 logger = logging.getLogger(__name__)
 
-async def create_workdrive_file(access_token, parent_id, name, content_bytes):
+UploadSource = bytes | BinaryIO | AsyncIterator[bytes]
+UPLOADS_NS = "workdrive_uploads"
+
+
+async def create_workdrive_file(access_token, parent_id, name, content: UploadSource, size: int | None = None,
+                                resume_key: str | None = None, chunk_size: int = UPLOAD_CHUNK_SIZE, parallel: int = 1):
+    """
+    Uploads a file into the WorkDrive folder `parent_id`.
+
+    `content` may be bytes, a binary file object or an async iterator of bytes.
+    Small byte payloads go in a single multipart POST; anything else goes
+    through `upload_workdrive_file_chunked` so memory stays bounded. Pass the
+    same `resume_key` when retrying a failed upload to continue where it stopped.
+    """
+    if resume_key or not isinstance(content, (bytes, bytearray)) or len(content) > chunk_size:
+        return await upload_workdrive_file_chunked(
+            access_token, parent_id, name, content, size=size,
+            chunk_size=chunk_size, parallel=parallel, resume_key=resume_key,
+        )
+
     url = f"{WORKDRIVE_API}/files"
     data = {"parent_id": parent_id, "name": name}
-    files = {"content": (name, content_bytes)}
+    files = {"content": (name, content)}
 
     headers = zoho_headers(access_token)
     del headers["Content-Type"]
-    async with httpx.AsyncClient() as client:
-        r = await client.post(url, headers=headers, data=data, files=files)
-        r.raise_for_status()
-        return r.json()
-    
+    r = await request("zoho_workdrive", "POST", url, headers=headers, data=data, files=files)
+    r.raise_for_status()
+    return loads(r.content)
+
+
+async def aiter_chunks(source: UploadSource, chunk_size: int, skip: int = 0) -> AsyncIterator[bytes]:
+    """Re-chunks bytes / file object / async iterator into `chunk_size` pieces, after skipping `skip` bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for i in range(skip, len(view), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+        return
+
+    if hasattr(source, "read"):
+        if skip:
+            source.seek(skip)
+        while chunk := await asyncio.to_thread(source.read, chunk_size):
+            yield chunk
+        return
+
+    buf = bytearray()
+    async for piece in source:
+        if skip:
+            dropped = min(skip, len(piece))
+            piece, skip = piece[dropped:], skip - dropped
+        buf += piece
+        while len(buf) >= chunk_size:
+            yield bytes(buf[:chunk_size])
+            del buf[:chunk_size]
+    if buf:
+        yield bytes(buf)
+
+
+async def upload_workdrive_file_chunked(
+    access_token: str,
+    parent_id: str,
+    name: str,
+    source: UploadSource,
+    size: int | None = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    parallel: int = 1,
+    resume_key: str | None = None,
+):
+    """Uploads a large file to WorkDrive in chunks through the stream upload API.
+
+    Every chunk is a POST with the stream upload headers (`x-filename`, URL
+    encoded, `x-parent_id`, `upload-id`, `x-streammode: 1`) and its byte range in
+    `Content-Range`, so a failed chunk is simply re-sent (chunks are retried like
+    idempotent calls). Acknowledged chunks are recorded in the shared store under
+    `resume_key`; calling again with the same key skips them and continues from
+    the last acknowledged offset. The final chunk is sent last and its response
+    is recorded too, so resuming an upload that already completed returns the
+    created file. Resuming an async iterator source re-reads and discards the
+    acknowledged prefix.
+
+    WorkDrive assembles stream uploads in order, so `parallel` defaults to 1; raise it
+    only for endpoints that accept out of order parts. At most `parallel` chunks are
+    held in memory.
+
+    Returns:
+        dict: WorkDrive response for the final chunk (the created file).
+    """
+    url = f"{WORKDRIVE_UPLOAD_API}/stream/upload"
+    if size is None and isinstance(source, (bytes, bytearray)):
+        size = len(source)
+    store = get_store()
+    progress = store.get(UPLOADS_NS, resume_key) if resume_key else None
+    if progress is None or progress["chunk_size"] != chunk_size:
+        progress = {"upload_id": uuid.uuid4().hex, "chunk_size": chunk_size, "acked": 0}
+    if progress.get("result") is not None:
+        logger.info(f"Upload {progress['upload_id']} of {name} already completed")
+        store.delete(UPLOADS_NS, resume_key)
+        return progress["result"]
+    upload_id = progress["upload_id"]
+    acked = progress["acked"]  # number of leading chunks the server acknowledged, never the final one
+    if acked:
+        logger.info(f"Resuming upload {upload_id} of {name} at offset {acked * chunk_size}")
+
+    base_headers = {
+        "Authorization": f"Zoho-oauthtoken {access_token}",
+        "Content-Type": "application/octet-stream",
+        "x-filename": quote(name),
+        "x-parent_id": parent_id,
+        "upload-id": upload_id,
+        "x-streammode": "1",
+    }
+    done: set[int] = set()
+    slots = asyncio.Semaphore(parallel)
+
+    async def send(index: int, chunk: bytes, last: bool):
+        nonlocal acked
+        start = index * chunk_size
+        total = size if size is not None else (start + len(chunk) if last else "*")
+        headers = dict(base_headers, **{"Content-Range": f"bytes {start}-{start + len(chunk) - 1}/{total}"})
+        try:
+            r = await request("zoho_workdrive", "POST", url, headers=headers, content=chunk, idempotent=True, timeout=120.0)
+            r.raise_for_status()
+        finally:
+            slots.release()
+        if last:
+            result = loads(r.content)
+            if resume_key:
+                store.set(UPLOADS_NS, resume_key, dict(progress, acked=acked, result=result), ttl=UPLOAD_RESUME_TTL)
+            return result
+        done.add(index)
+        # advance the contiguous acknowledged prefix so a retry can resume after it
+        while acked in done:
+            acked += 1
+        if resume_key:
+            store.set(UPLOADS_NS, resume_key, dict(progress, acked=acked), ttl=UPLOAD_RESUME_TTL)
+
+    tasks = []
+    index = acked
+    pending: bytes | None = None
+    try:
+        # hold one chunk back so the final chunk is only sent after every other part landed
+        async for chunk in aiter_chunks(source, chunk_size, skip=acked * chunk_size):
+            if pending is not None:
+                await slots.acquire()
+                # a failed chunk frees its slot too; stop at it instead of sending the parts after it
+                for t in tasks:
+                    if t.done() and t.exception() is not None:
+                        raise t.exception()
+                tasks.append(asyncio.create_task(send(index, pending, last=False)))
+                index += 1
+            pending = chunk
+        await asyncio.gather(*tasks)
+        if pending is None:
+            # the final chunk is never counted as acknowledged, so only an empty or shrunk source gets here
+            raise HTTPException(status_code=400, detail="Nothing to upload")
+        await slots.acquire()
+        result = await send(index, pending, last=True)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    if resume_key:
+        store.delete(UPLOADS_NS, resume_key)
+    logger.info(f"Uploaded {name} to WorkDrive in {index + 1} chunks")
+    return result
+
+
 async def workdrive_download_file_bytes(access_token: str, file_id: str) -> bytes:
     """
-    Returns raw bytes of the file. Use this when you want to re-upload into Cliq as binary.
+    Returns raw bytes of the file, for results that carry the body itself (base64).
+    Shares to Cliq use `download_workdrive_file`, which never holds the file in memory.
     """
     url = f"{WORKDRIVE_API}/files/{file_id}/download"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.get(url, headers=headers)
-        r.raise_for_status()
-        return r.content
+    r = await request("zoho_workdrive", "GET", url, headers=headers)
+    r.raise_for_status()
+    return r.content
+
+async def workdrive_file_info(access_token: str, file_id: str) -> dict:
+    """Metadata of one file as a search hit shaped dict (`id`, `attributes` with name and size)."""
+    url = f"{WORKDRIVE_API}/files/{file_id}"
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    r = await request("zoho_workdrive", "GET", url, headers=headers, timeout=15.0)
+    r.raise_for_status()
+    data = loads(r.content).get("data") or {}
+    return {**data, "id": file_id}
+
 
 async def workdrive_search_files(access_token: str, org_id: str, query: str, limit: int = 10) -> list[dict]:
     """
@@ -43,80 +226,293 @@ async def workdrive_search_files(access_token: str, org_id: str, query: str, lim
         "limit": limit,
         "org_id": org_id
     }
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        r = await client.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        return r.json()
+    r = await request("zoho_workdrive", "GET", url, headers=headers, params=params, timeout=15.0)
+    r.raise_for_status()
+    return loads(r.content)
+
+async def spool(source: UploadSource) -> bytes | BinaryIO:
+    """Turns an async iterator into a file object that spills to disk past `UPLOAD_SPOOL_MAX`."""
+    if isinstance(source, (bytes, bytearray)) or hasattr(source, "read"):
+        return source
+    f = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX)
+    try:
+        async for piece in source:
+            await asyncio.to_thread(f.write, piece)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+
+class _MultipartBody:
+    """A multipart/form-data body whose file parts are read in a worker thread.
+
+    httpx's encoder sizes file parts with `fileno()`, which rolls a
+    SpooledTemporaryFile over to disk, and reads them on the event loop. Each
+    iteration starts from the top of every file, so a retried request resends
+    the whole body.
+    """
+
+    def __init__(self, files: list[tuple[str, tuple[str, bytes | BinaryIO]]], data: dict | None = None):
+        self.boundary = uuid.uuid4().hex
+        self._parts: list[tuple[bytes, bytes | BinaryIO]] = []
+        for name, value in (data or {}).items():
+            self._parts.append((self._header(name), str(value).encode()))
+        for name, (filename, body) in files:
+            self._parts.append((self._header(name, filename), body))
+
+    def _header(self, name: str, filename: str | None = None) -> bytes:
+        disposition = f'form-data; name="{_form_quote(name)}"'
+        if filename is None:
+            return f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+        return (f'--{self.boundary}\r\nContent-Disposition: {disposition}; filename="{_form_quote(filename)}"\r\n'
+                f"Content-Type: {mimetypes.guess_type(filename)[0] or 'application/octet-stream'}\r\n\r\n").encode()
+
+    @property
+    def headers(self) -> dict[str, str]:
+        length = len(self.boundary) + 6  # closing "--boundary--\r\n"
+        for header, body in self._parts:
+            if isinstance(body, (bytes, bytearray)):
+                size = len(body)
+            else:
+                size = body.seek(0, 2)  # seek and tell never roll a spooled file over
+            length += len(header) + size + 2
+        return {"Content-Type": f"multipart/form-data; boundary={self.boundary}", "Content-Length": str(length)}
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for header, body in self._parts:
+            yield header
+            if isinstance(body, (bytes, bytearray)):
+                yield bytes(body)
+            else:
+                await asyncio.to_thread(body.seek, 0)
+                while chunk := await asyncio.to_thread(body.read, UPLOAD_CHUNK_SIZE):
+                    yield chunk
+            yield b"\r\n"
+        yield f"--{self.boundary}--\r\n".encode()
+
+
+def _form_quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
 
 async def cliq_share_file_to_chat(
     authtoken: str, 
     chat_id: str, 
     filename: str, 
-    file_bytes: bytes, 
+    file_bytes: UploadSource, 
     message_text: str | None = None
 ):
     """
     Uploads a file to a Cliq chat (chat_id). `authtoken` should be a valid Cliq auth token (Zoho-authtoken or Zoho-oauthtoken).
+
+    Cliq has no chunked upload, so async iterators are spooled first and the
+    multipart body is streamed from the file by `_MultipartBody`; the body is
+    never held in memory whole.
     """
     url = f"https://cliq.zoho.com/api/v2/chats/{chat_id}/files"
     headers = {
         "Authorization": authtoken
     }
-    files = {
-        "file": (filename, file_bytes)
-    }
+    body = await spool(file_bytes)
     data = {}
     if message_text:
         data["text"] = message_text
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(url, headers=headers, files=files, data=data)
+    try:
+        form = _MultipartBody([("file", (filename, body))], data)
+        r = await request("zoho_cliq", "POST", url, headers={**headers, **form.headers}, content=form)
+    finally:
+        if body is not file_bytes:
+            body.close()
+    r.raise_for_status()
+    return loads(r.content)
+
+async def resolve_workdrive_file(access_token, org_id, name_or_query) -> dict:
+    """Searches WorkDrive and returns the best hit: the exact name match, else the first result."""
+    logger.debug(f"Searching for file: {name_or_query}")
+    search_json = await cached_search(
+        org_id, name_or_query, 5, lambda: workdrive_search_files(access_token, org_id, name_or_query, limit=5)
+    )
+    # choose best match: first exact name or first result
+    hits = search_json.get("data") or search_json.get("files") or search_json
+    chosen = None
+    for item in (hits or []):
+        logger.debug(f"Evaluating search result: {item}")
+        nm = _file_name(item)
+        if nm == name_or_query:
+            logger.debug(f"Found exact match: {nm}")
+            chosen = item; break
+    if not chosen:
+        chosen = (hits or [None])[0]
+        logger.debug(f"Using first search result")
+    if not chosen:
+        logger.error(f"No file found in WorkDrive for {name_or_query}")
+        raise HTTPException(status_code=404, detail=f"No file found in WorkDrive for {name_or_query!r}")
+    return chosen
+
+
+def _file_name(item: dict) -> str | None:
+    attrs = item.get("attributes") or {}
+    return item.get("name") or item.get("file_name") or item.get("title") or attrs.get("name")
+
+
+def _file_size(item: dict) -> int | None:
+    attrs = item.get("attributes") or {}
+    size = item.get("size") or (attrs.get("storage_info") or {}).get("size_in_bytes")
+    try:
+        return int(size) if size is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _download_url(file_ref: dict) -> str:
+    file_id = file_ref.get("id") or file_ref.get("file_id")
+    if file_id:
+        logger.debug(f"Downloading file with id: {file_id}")
+        return f"{WORKDRIVE_API}/files/{file_id}/download"
+    logger.debug("File_id not found, attempting download via URL")
+    # maybe the search returned downloadUrl
+    dl = file_ref.get("download_url") or file_ref.get("webUrl")
+    if not dl:
+        logger.error("Search result lacks file_id or download_url")
+        raise HTTPException(status_code=500, detail="Search result lacks file_id or download_url")
+    return dl
+
+
+async def stream_workdrive_file(access_token, file_ref: dict) -> AsyncIterator[bytes]:
+    """Yields the body of a search hit or `{"id": ...}` in `UPLOAD_CHUNK_SIZE` pieces as it downloads."""
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    async with stream("zoho_workdrive", "GET", _download_url(file_ref), headers=headers, timeout=60.0) as r:
         r.raise_for_status()
-        return r.json()
+        async for chunk in r.aiter_bytes(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+async def download_workdrive_file(access_token, file_ref: dict) -> BinaryIO:
+    """Downloads a file into a temp file that spills to disk past `UPLOAD_SPOOL_MAX`; the caller closes it."""
+    return await spool(stream_workdrive_file(access_token, file_ref))
+
+
+def _as_list(value) -> list:
+    if not value:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+async def fetch_workdrive_files(access_token, org_id, queries: list[str], file_ids: list[str]) -> list[tuple[dict, BinaryIO]]:
+    """Resolves and downloads several files concurrently.
+
+    Searches and metadata lookups of explicit ids run in parallel; downloads are
+    bounded to `WORKDRIVE_FANOUT` at a time and to `WORKDRIVE_MAX_TOTAL_BYTES`
+    overall. The budget is checked against the metadata before anything is
+    downloaded, and against the bytes of every chunk as it arrives, so a file
+    larger than its metadata claims is cut off instead of read in full. Bodies
+    are spooled to temp files; the caller closes them. Results keep the request order.
+    """
+    refs = await asyncio.gather(
+        *(workdrive_file_info(access_token, fid) for fid in file_ids),
+        *(resolve_workdrive_file(access_token, org_id, q) for q in queries),
+    )
+
+    known = sum(_file_size(ref) or 0 for ref in refs)
+    if known > WORKDRIVE_MAX_TOTAL_BYTES:
+        raise HTTPException(status_code=413, detail="Requested files exceed the share size limit")
+
+    slots = asyncio.Semaphore(WORKDRIVE_FANOUT)
+    total = 0
+
+    async def budgeted(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        nonlocal total
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > WORKDRIVE_MAX_TOTAL_BYTES:
+                raise HTTPException(status_code=413, detail="Requested files exceed the share size limit")
+            yield chunk
+
+    async def fetch(ref):
+        async with slots:
+            chunks = budgeted(stream_workdrive_file(access_token, ref))
+            async with aclosing(chunks):
+                return ref, await spool(chunks)
+
+    tasks = [asyncio.create_task(fetch(ref)) for ref in refs]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            if t.done() and not t.cancelled() and t.exception() is None:
+                t.result()[1].close()
+        raise
+
+
+def zip_files(files: list[tuple[str, bytes | BinaryIO]]) -> BinaryIO:
+    """Zips `files` into a temp file that spills to disk past `UPLOAD_SPOOL_MAX`."""
+    out = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX)
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in files:
+            if isinstance(body, (bytes, bytearray)):
+                zf.writestr(name, body)
+                continue
+            with zf.open(name, "w") as dst:
+                shutil.copyfileobj(body, dst, UPLOAD_CHUNK_SIZE)
+    out.seek(0)
+    return out
+
+
+async def cliq_share_files_to_chat(authtoken: str, chat_id: str, files: list[tuple[str, bytes | BinaryIO]], message_text: str | None = None):
+    """Posts several files to a Cliq chat as one message with multiple attachments."""
+    url = f"https://cliq.zoho.com/api/v2/chats/{chat_id}/files"
+    headers = {
+        "Authorization": authtoken
+    }
+    data = {}
+    if message_text:
+        data["text"] = message_text
+    form = _MultipartBody([("file", (name, body)) for name, body in files], data)
+    r = await request("zoho_cliq", "POST", url, headers={**headers, **form.headers}, content=form)
+    r.raise_for_status()
+    return loads(r.content)
+
+
+def _unique_names(names: list[str]) -> list[str]:
+    seen: dict[str, int] = {}
+    out = []
+    for name in names:
+        n = seen.get(name, 0)
+        seen[name] = n + 1
+        out.append(name if not n else f"{n}_{name}")
+    return out
+
 
 async def workdrive_action(access_token, org_id, name_or_query, file_id, cliq_target, fields):
-    # if file_id absent, search
-    if not file_id:
-        logger.debug(f"Searching for file: {name_or_query}")
-        search_json = await workdrive_search_files(access_token, org_id, name_or_query, limit=5)
-        # choose best match: first exact name or first result
-        hits = search_json.get("data") or search_json.get("files") or search_json
-        chosen = None
-        for item in (hits or []):
-            logger.debug(f"Evaluating search result: {item}")
-            nm = item.get("name") or item.get("file_name") or item.get("title")
-            if nm == name_or_query:
-                logger.debug(f"Found exact match: {nm}")
-                chosen = item; break
-        if not chosen:
-            chosen = (hits or [None])[0]
-            logger.debug(f"Using first search result")
-        if not chosen:
-            logger.error("No file found in WorkDrive")
-            raise HTTPException(status_code=404, detail="No file found in WorkDrive")
-        file_id = chosen.get("id") or chosen.get("file_id")
-        if not file_id:
-            logger.debug("File_id not found, attempting download via URL")
-            # maybe the search returned downloadUrl
-            dl = chosen.get("download_url") or chosen.get("webUrl")
-            if not dl:
-                logger.error("Search result lacks file_id or download_url")
-                raise HTTPException(status_code=500, detail="Search result lacks file_id or download_url")
-            # download direct
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                r = await client.get(dl, headers={"Authorization": f"Zoho-oauthtoken {access_token}"})
-                r.raise_for_status()
-                file_bytes = r.content
-        else:
-            logger.debug(f"Downloading file with id: {file_id}")
-            file_bytes = await workdrive_download_file_bytes(access_token, file_id)
+    """Fetches one or more WorkDrive files and shares them to Cliq (or returns them base64 encoded).
 
-    else:
-        logger.debug(f"Downloading file with id: {file_id}")
-        file_bytes = await workdrive_download_file_bytes(access_token, file_id)
+    `name_or_query` and `file_id` may each be a single value or a list. Several
+    files are fetched concurrently and posted as one Cliq message, either with one
+    attachment per file or, with `bundle: "zip"` (or above `CLIQ_MAX_ATTACHMENTS`), as a zip.
+    """
+    queries = _as_list(name_or_query)
+    file_ids = _as_list(file_id)
+    if file_ids and not isinstance(name_or_query, (list, tuple)):
+        # a single query next to explicit ids is just the hint the id was picked from
+        queries = []
+    fetched = await fetch_workdrive_files(access_token, org_id, queries, file_ids)
+    try:
+        return await _share_fetched(access_token, fetched, cliq_target, fields)
+    finally:
+        for _, body in fetched:
+            body.close()
+
+
+async def _share_fetched(access_token, fetched: list[tuple[dict, BinaryIO]], cliq_target, fields):
+    multiple = len(fetched) > 1
 
     # If a Cliq target is provided, post it
     if cliq_target:
-        logger.info("Posting file to Cliq")
+        logger.info(f"Posting {len(fetched)} file(s) to Cliq")
         target_type = cliq_target.get("type")
         target_id = cliq_target.get("id")
         if target_type != "chat":
@@ -125,14 +521,49 @@ async def workdrive_action(access_token, org_id, name_or_query, file_id, cliq_ta
             raise HTTPException(status_code=501, detail="Only chat target implemented in this demo")
         # We need a Cliq auth header — you can reuse Zoho product token (if it has Cliq scope) OR a bot token.
         # Here we assume the same Zoho OAuth token can be used for Cliq (if the token had cliq scope)
-        res = await cliq_share_file_to_chat(access_token, target_id, fields.get("filename") or "file.bin", file_bytes, message_text=fields.get("message"))
+        message = fields.get("message")
+        if not multiple:
+            ref, file_bytes = fetched[0]
+            name = fields.get("filename") or _file_name(ref) or "file.bin"
+            res = await cliq_share_file_to_chat(access_token, target_id, name, file_bytes, message_text=message)
+        else:
+            names = _unique_names([_file_name(ref) or f"file_{i}.bin" for i, (ref, _) in enumerate(fetched)])
+            files = [(name, body) for name, (_, body) in zip(names, fetched)]
+            if fields.get("bundle") == "zip" or len(files) > CLIQ_MAX_ATTACHMENTS:
+                archive = await asyncio.to_thread(zip_files, files)
+                try:
+                    res = await cliq_share_file_to_chat(access_token, target_id, fields.get("filename") or "files.zip", archive, message_text=message)
+                finally:
+                    archive.close()
+            else:
+                res = await cliq_share_files_to_chat(access_token, target_id, files, message_text=message)
         logger.info("File shared to Cliq successfully")
         return {"shared_to_cliq": res}
     else:
         logger.debug("Returning file as base64")
-        # return file bytes base64 encoded for demo
-        b64 = base64.b64encode(file_bytes).decode()
-        return {"file_id": file_id, "file_base64": b64}
+        # return file bytes base64 encoded for demo; encoded lazily while the response streams
+        out = [
+            {"file_id": ref.get("id") or ref.get("file_id"), "name": _file_name(ref), "file_base64": Base64Body(body.read())}
+            for ref, body in fetched
+        ]
+        if not multiple:
+            return {"file_id": out[0]["file_id"], "file_base64": out[0]["file_base64"]}
+        return {"files": out}
+
+async def restore_file_bodies(access_token, obj):
+    """Copy of a replayed result with the file bodies left out of the cache downloaded again."""
+    if isinstance(obj, list):
+        return list(await asyncio.gather(*(restore_file_bodies(access_token, v) for v in obj)))
+    if not isinstance(obj, dict):
+        return obj
+    if is_body_ref(obj.get("file_base64")):
+        if not obj.get("file_id"):
+            raise HTTPException(status_code=410, detail="File is no longer available, run the action again")
+        body = await workdrive_download_file_bytes(access_token, obj["file_id"])
+        return {**obj, "file_base64": Base64Body(body)}
+    values = await asyncio.gather(*(restore_file_bodies(access_token, v) for v in obj.values()))
+    return dict(zip(obj, values))
+
 
 def create(payload) -> dict:
     return {"id": "...", "url": "..."}
\ No newline at end of file
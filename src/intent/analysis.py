@@ -1,39 +1,49 @@
 import os
 import asyncio
 import re
-import json
 
 import dotenv
-import google.generativeai as genai
 
+from .backends import get_backend
 from .prompt import PROMPT_TEMPLATE
 from src.api.schemas import MessageMeta
+from src.constants import LLM_MODEL
+from src.serialization import loads
 
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+def _parse_suggestions(text: str) -> list[dict]:
+    json_block = re.search(r'(\{.*\})', text, re.DOTALL)
+    assert json_block, f"No json found in llm resp {text=}"
+    tools = loads(json_block.group())
+    return sorted(tools["suggestions"], key=lambda x: x["score"], reverse=True)
 
 
-async def _call_gemini_llm(prompt: str):
+async def _call_gemini_llm(prompt: str, model_name: str = LLM_MODEL, usage: dict | None = None):
     """
-    Calls Gemini 2.0 Flash using official google-generativeai SDK.
-    Returns raw text output from the model.
+    Calls Gemini through the configured backend (live, recording or replaying).
+    Returns the suggestions sorted by score; token counts and latency are added to `usage` if given.
     """
-    response = await model.generate_content_async(prompt)
-    json_block = re.search(r'(\{.*\})', response.text, re.DOTALL)
-    assert json_block, f"No json found in llm resp {response.text=}"
-    tools = json.loads(json_block.group())
-    return sorted(tools["suggestions"], key=lambda x: x["score"], reverse=True)
+    text, counts = await get_backend().generate(prompt, model_name)
+    if usage is not None:
+        usage.update(counts)
+    return _parse_suggestions(text)
 
-async def call_llm(message, message_metadata: MessageMeta, tools):
+async def call_llm(message, message_metadata: MessageMeta, tools, context: str = "", attachments: str = "", *,
+                   template: str = PROMPT_TEMPLATE, model: str = LLM_MODEL, usage: dict | None = None):
     """Calls gemini to get best tool calls with their parameters
+
+    `context` is the bounded conversation block from `src.intent.context`,
+    `attachments` the digests from `src.intent.attachments`.
+    `template` and `model` are overridden by the offline evaluation to compare variants.
     """
-    prompt = PROMPT_TEMPLATE.format(
+    prompt = template.format(
         message_text=message,
         metadata_json=message_metadata.model_dump(),
+        conversation_context=context or "(none)",
+        attachments=attachments or "(none)",
         tool_info=tools,
     )
-    return await _call_gemini_llm(prompt)
+    return await _call_gemini_llm(prompt, model, usage)
 
 """sample output
 
@@ -41,15 +51,6 @@ async def call_llm(message, message_metadata: MessageMeta, tools):
   {
     "tool": "jira",
     "score": 0.9,
-    "title": "Create Jira ticket for payment bug",
-    "description": "Create a Jira ticket to track and resolve the payment bug.",
-    "expected_fields": [
-      "project_key",
-      "summary",
-      "description",
-      "issuetype",
-      "duedate"
-    ],
     "prefill": {
       "summary": "Payment bug fix",
       "description": "Describe the payment bug in detail.",
@@ -60,16 +61,6 @@ async def call_llm(message, message_metadata: MessageMeta, tools):
   {
     "tool": "zoho_projects",
     "score": 0.7,
-    "title": "Create Zoho Projects task for payment bug",
-    "description": "Create a Zoho Projects task to track and resolve the payment bug.",
-    "expected_fields": [
-      "portal_id",
-      "project_id",
-      "name",
-      "description",
-      "start_date",
-      "end_date"
-    ],
     "prefill": {
       "name": "Fix payment bug",
       "description": "Describe the payment bug in detail.",
@@ -79,16 +70,6 @@ async def call_llm(message, message_metadata: MessageMeta, tools):
   {
     "tool": "zoho_calendar",
     "score": 0.3,
-    "title": "Create Zoho Calendar event for payment bug fix",
-    "description": "Create a Zoho Calendar event to schedule time for fixing the payment bug.",
-    "expected_fields": [
-      "calendar_id",
-      "title",
-      "start_iso",
-      "end_iso",
-      "description",
-      "location"
-    ],
     "prefill": {
       "title": "Payment bug fix",
       "start_iso": "2025-01-11T09:00:00Z",
@@ -98,4 +79,5 @@ async def call_llm(message, message_metadata: MessageMeta, tools):
   }
 ]
 
-"""
\ No newline at end of file
+titles, descriptions and expected_fields come from `src.intent.suggestions`
+"""
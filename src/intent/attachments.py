@@ -0,0 +1,136 @@
+"""Digests of message attachments and pasted logs for intent analysis.
+
+An attachment is a WorkDrive file, a Zoho download URL (e.g. of a Cliq
+attachment, read with the `Scopes.Cliq` grant; tenants authorized before it
+was requested get "could not be read" until they re-authorize) or inline text. Each is streamed through a `LogDigest`, so files
+are parsed as their bytes arrive and are never held in memory whole. Reading
+stops at `LOG_MAX_BYTES` per file, and all attachments of a message share a
+budget of `LOG_READ_BUDGET` seconds; whatever was read by then is digested, so
+a huge or slow file can't hold up the analysis.
+
+A message longer than `LOG_INLINE_CHARS` is taken as a pasted log: the LLM sees
+its beginning and the digest of the whole text instead of the raw paste.
+"""
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from src.api.schemas import Attachment
+from src.auth import UserNotFound, get_zoho_access_token
+from src.constants import ATTACHMENT_MAX, LOG_CHUNK, LOG_INLINE_CHARS, LOG_MAX_BYTES, LOG_READ_BUDGET
+from src.http_client import stream
+from src.integrations.zoho.urls import WORKDRIVE_API
+from src.intent.logdigest import LogDigest
+from src.ratelimit import RateLimited
+from src.resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+# the Zoho token is sent along, so URLs must point at Zoho
+ZOHO_DOMAINS = ("zoho.com", "zohoapis.com", "zohocliq.com", "zoho.eu", "zohoapis.eu", "zoho.in", "zohoapis.in",
+                "zoho.com.au", "zohoapis.com.au", "zohocloud.ca")
+INLINE_HEAD_CHARS = 500  # of a pasted log, kept verbatim as the request itself
+TICKET_TOOLS = ("jira", "zoho_projects")
+
+
+def _zoho_url(url: str) -> bool:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return parts.scheme == "https" and any(host == d or host.endswith(f".{d}") for d in ZOHO_DOMAINS)
+
+
+def _name(att: Attachment) -> str:
+    if att.name:
+        return att.name
+    if att.file_id:
+        return f"WorkDrive file {att.file_id}"
+    if att.url:
+        return urlsplit(att.url).path.rsplit("/", 1)[-1] or "attachment"
+    return "attachment"
+
+
+async def _chunks(att: Attachment, access_token: str | None) -> AsyncIterator[bytes]:
+    if att.content is not None:
+        data = att.content.encode()
+        for i in range(0, len(data), LOG_CHUNK):
+            yield data[i:i + LOG_CHUNK]
+        return
+    url = f"{WORKDRIVE_API}/files/{att.file_id}/download" if att.file_id else att.url
+    upstream = "zoho_workdrive" if att.file_id else "zoho_cliq"
+    headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
+    async with stream(upstream, "GET", url, headers=headers, timeout=60.0) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes(LOG_CHUNK):
+            yield chunk
+
+
+async def _read(digest: LogDigest, chunks: AsyncIterator[bytes]):
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            # parsing a chunk is CPU bound; keep it off the event loop
+            feeding = asyncio.ensure_future(asyncio.to_thread(digest.feed, chunk))
+            try:
+                await asyncio.shield(feeding)
+            except asyncio.CancelledError:
+                # the thread can't be stopped; it must be done with the digest before it is finished
+                await feeding
+                raise
+            if digest.bytes >= LOG_MAX_BYTES:
+                digest.truncated = True
+                return
+
+
+async def digest_attachment(att: Attachment, access_token: str | None, deadline: float) -> str:
+    digest = LogDigest(_name(att))
+    if att.content is None and access_token is None:
+        return f"{digest.name}: not read, Zoho authorization required"
+    try:
+        async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+            await _read(digest, _chunks(att, access_token))
+    except TimeoutError:
+        digest.truncated = True
+    except (httpx.HTTPError, RateLimited, UpstreamUnavailable) as exc:
+        logger.warning(f"Reading attachment {digest.name} failed: {exc!r}")
+        if not digest.bytes:
+            return f"{digest.name}: could not be read"
+        digest.truncated = True
+    digest.finish()
+    logger.debug(f"Digested {digest.name}: {digest.bytes} bytes, {digest.lines} lines")
+    return digest.render()
+
+
+async def digest_message(message_text: str, attachments: list[Attachment]) -> tuple[str, list[str]]:
+    """Returns the message as the LLM should see it and the digests of its attachments and pasted log."""
+    for att in attachments:
+        if att.content is None and not att.file_id and not (att.url and _zoho_url(att.url)):
+            raise HTTPException(status_code=400, detail="Attachments need content, a file_id or an https Zoho url")
+    attachments = list(attachments[:ATTACHMENT_MAX])
+    if len(message_text) > LOG_INLINE_CHARS:
+        attachments.append(Attachment(name="pasted log", content=message_text))
+        message_text = message_text[:INLINE_HEAD_CHARS] + "\n[... pasted log, see the digest below]"
+    if not attachments:
+        return message_text, []
+
+    access_token = None
+    if any(att.content is None for att in attachments):
+        try:
+            access_token = await get_zoho_access_token()
+        except UserNotFound:
+            logger.warning("Attachments can't be read without Zoho authorization")
+    deadline = time.monotonic() + LOG_READ_BUDGET
+    digests = await asyncio.gather(*(digest_attachment(att, access_token, deadline) for att in attachments))
+    return message_text, list(digests)
+
+
+def add_digests(prefill: dict, digests: list[str]):
+    """Appends the digests to the description of a suggested ticket or task."""
+    if not digests:
+        return
+    description = prefill.get("description") or ""
+    prefill["description"] = "\n\n".join([description, *digests] if description else digests)
@@ -0,0 +1,139 @@
+"""Pluggable LLM backends for intent analysis.
+
+`get_backend()` returns the backend picked by `LLM_BACKEND`:
+    - gemini: the real model (default)
+    - record: the real model, and every answer is appended to `LLM_RECORDINGS`
+    - replay: answers served from `LLM_RECORDINGS` without any API call, after
+      `LLM_REPLAY_LATENCY` seconds ("recorded" sleeps as long as the original call)
+
+Recordings are keyed on a hash of model + prompt, so tests and benchmarks that
+replay them are deterministic and free. A prompt that was never recorded
+raises `ReplayMiss` instead of silently calling the API.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from src.constants import LLM_BACKEND, LLM_RECORDINGS, LLM_REPLAY_LATENCY
+from src.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()[:32]
+
+
+class RecordingStore:
+    """Append-only JSON lines file of {"key", "text", "usage"}; the last entry for a key wins.
+
+    Every worker of a recording run appends to the same file, so each record is
+    written under an exclusive `flock`, and read back under a shared one: lines
+    never interleave and are never read half written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                fcntl.flock(f, fcntl.LOCK_SH)  # not while a worker is halfway through a line
+                for line in f:
+                    if line.strip():
+                        rec = loads(line)
+                        self._records[rec.pop("key")] = rec
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key: str) -> dict | None:
+        return self._records.get(key)
+
+    def put(self, key: str, text: str, usage: dict):
+        rec = {"text": text, "usage": usage}
+        with self._lock:
+            self._records[key] = rec
+            with open(self.path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+                f.write(dumps({"key": key, **rec}) + b"\n")
+
+
+class GeminiBackend:
+    def __init__(self):
+        # imported here so replay runs need neither the SDK nor an API key
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+        self._models = {}
+
+    async def generate(self, prompt: str, model: str) -> tuple[str, dict]:
+        """Raw model text plus usage: prompt/completion token counts and latency in seconds."""
+        if model not in self._models:
+            self._models[model] = self._genai.GenerativeModel(model)
+        start = time.perf_counter()
+        response = await self._models[model].generate_content_async(prompt)
+        meta = response.usage_metadata
+        return response.text, {
+            "prompt_tokens": meta.prompt_token_count,
+            "completion_tokens": meta.candidates_token_count,
+            "latency": time.perf_counter() - start,
+        }
+
+
+class RecordingBackend:
+    def __init__(self, inner, store: RecordingStore):
+        self.inner = inner
+        self.store = store
+
+    async def generate(self, prompt: str, model: str) -> tuple[str, dict]:
+        text, usage = await self.inner.generate(prompt, model)
+        self.store.put(prompt_key(model, prompt), text, usage)
+        return text, usage
+
+
+class ReplayBackend:
+    def __init__(self, store: RecordingStore, latency: float | str = 0.0):
+        self.store = store
+        self.latency = latency  # seconds, or "recorded"
+
+    async def generate(self, prompt: str, model: str) -> tuple[str, dict]:
+        rec = self.store.get(prompt_key(model, prompt))
+        if rec is None:
+            raise ReplayMiss(f"No recorded {model} answer for this prompt, record it with LLM_BACKEND=record")
+        delay = rec["usage"].get("latency", 0.0) if self.latency == "recorded" else float(self.latency)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return rec["text"], dict(rec["usage"])
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND == "replay":
+            _backend = ReplayBackend(RecordingStore(LLM_RECORDINGS), LLM_REPLAY_LATENCY)
+        elif LLM_BACKEND == "record":
+            _backend = RecordingBackend(GeminiBackend(), RecordingStore(LLM_RECORDINGS))
+        else:
+            _backend = GeminiBackend()
+        logger.info(f"Using {LLM_BACKEND} LLM backend")
+    return _backend
+
+
+def set_backend(backend):
+    """Overrides the configured backend (tests, benchmarks); returns the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,143 @@
+"""Per channel conversation context for intent analysis.
+
+Keeps, per (tenant, channel), a bounded ring of the most recent messages and
+a rolling summary of everything older. When a message falls out of the ring
+its salient bits (dates, times, ticket keys, file names, mentions, links and
+a short gist) are folded into the summary, whose sections are themselves
+bounded, so the block added to the prompt has a fixed maximum size no matter
+how long the thread gets.
+
+The buffer lives in the shared state store so every worker sees the same
+conversation. Updates take a short lock in the store, so concurrent requests on
+one channel don't overwrite each other's messages. Messages are de-duplicated
+by message id, and ones without an id by a hash of their text (clients re-send
+the same thread as `context_messages` with every request).
+"""
+import asyncio
+import hashlib
+import re
+from contextlib import asynccontextmanager
+
+from src.api.schemas import MessageMeta
+from src.constants import CONTEXT_MESSAGE_CHARS, CONTEXT_RING, CONTEXT_SUMMARY_ITEMS, CONTEXT_TTL
+from src.state import get_store
+from src.tenancy import current_tenant
+
+CONTEXT_NS = "channel_context"
+LOCKS_NS = "channel_context_locks"
+LOCK_TTL = 5  # seconds; a crashed holder's lock expires after this
+LOCK_POLL = 0.01
+SEEN_MAX = 512  # ids and text hashes remembered, beyond the ring, to drop re-sent messages
+
+# summary section -> pattern of things worth remembering from older messages
+_EXTRACTORS = {
+    "dates": re.compile(
+        r"\b(?:\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?Z?)?|\d{1,2}(?::\d{2})?\s?(?:am|pm)"
+        r"|(?:today|tonight|tomorrow|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b)",
+        re.IGNORECASE,
+    ),
+    "keys": re.compile(r"\b[A-Z][A-Z0-9]+-\d+\b"),
+    "files": re.compile(r"\b[\w.-]+\.(?:json|csv|xlsx?|docx?|pptx?|pdf|txt|log|zip|png|jpe?g|ya?ml)\b", re.IGNORECASE),
+    "mentions": re.compile(r"@[\w.]+"),
+    "links": re.compile(r"https?://\S+"),
+}
+GIST_CHARS = 80
+
+
+def _key(channel: str) -> str:
+    return f"{current_tenant.get()}:{channel}"
+
+
+def _empty() -> dict:
+    return {"recent": [], "summary": {name: [] for name in [*_EXTRACTORS, "gist"]}, "folded": 0}
+
+
+def _remember(items: list[str], new: list[str]):
+    """Moves `new` to the end of `items` (most recent last), keeping at most CONTEXT_SUMMARY_ITEMS."""
+    for item in new:
+        if item in items:
+            items.remove(item)
+        items.append(item)
+    del items[:-CONTEXT_SUMMARY_ITEMS]
+
+
+def _fold(summary: dict, message: dict):
+    text = message["text"]
+    for name, pattern in _EXTRACTORS.items():
+        _remember(summary[name], [m.group(0) for m in pattern.finditer(text)])
+    gist = " ".join(text.split())[:GIST_CHARS]
+    if gist:
+        _remember(summary["gist"], [f"{message.get('sender') or 'someone'}: {gist}"])
+
+
+@asynccontextmanager
+async def _locked(key: str):
+    store = get_store()
+    while not await store.aadd(LOCKS_NS, key, True, ttl=LOCK_TTL):
+        await asyncio.sleep(LOCK_POLL)
+    try:
+        yield
+    finally:
+        await store.adelete(LOCKS_NS, key)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+async def record_messages(channel: str | None, messages: list[tuple[str, MessageMeta | None]]):
+    """Appends (text, metadata) messages to the channel buffer, folding the oldest into the summary."""
+    messages = [(text, metadata) for text, metadata in messages if text.strip()]
+    if not channel or not messages:
+        return
+    store = get_store()
+    async with _locked(_key(channel)):
+        ctx = await store.aget(CONTEXT_NS, _key(channel)) or _empty()
+        seen = ctx.setdefault("seen", [])
+        known = set(seen)
+        for text, metadata in messages:
+            message_id = metadata.message_id if metadata else None
+            digest = _digest(text)
+            # a message without id (re-sent context) is known if any message had its text
+            if (f"id:{message_id}" if message_id else digest) in known:
+                continue
+            new = [digest, f"id:{message_id}"] if message_id else [digest]
+            known.update(new)
+            seen.extend(new)
+            ctx["recent"].append({
+                "id": message_id,
+                "sender": metadata.sender if metadata else None,
+                "text": text[:CONTEXT_MESSAGE_CHARS],
+            })
+        del seen[:-SEEN_MAX]
+        while len(ctx["recent"]) > CONTEXT_RING:
+            _fold(ctx["summary"], ctx["recent"].pop(0))
+            ctx["folded"] += 1
+        await store.aset(CONTEXT_NS, _key(channel), ctx, ttl=CONTEXT_TTL)
+
+
+async def record_message(channel: str | None, text: str, metadata: MessageMeta | None = None):
+    await record_messages(channel, [(text, metadata)])
+
+
+def render_context(channel: str | None) -> str:
+    """Prompt block with the rolling summary and recent messages; empty if nothing is known."""
+    if not channel:
+        return ""
+    ctx = get_store().get(CONTEXT_NS, _key(channel))
+    if not ctx:
+        return ""
+    lines = []
+    summary = ctx["summary"]
+    if ctx["folded"]:
+        lines.append(f"Summary of {ctx['folded']} earlier messages:")
+        for name in _EXTRACTORS:
+            if summary[name]:
+                lines.append(f"- {name}: {', '.join(summary[name])}")
+        if summary["gist"]:
+            lines.append("- earlier topics: " + " | ".join(summary["gist"]))
+    if ctx["recent"]:
+        lines.append("Recent messages (oldest first):")
+        for m in ctx["recent"]:
+            lines.append(f"- {m.get('sender') or 'someone'}: {m['text']}")
+    return "\n".join(lines)
@@ -0,0 +1,248 @@
+"""Streaming digest of log files and pasted logs for intent analysis.
+
+A log is fed in byte chunks and read line by line, in constant memory:
+    - its format (json lines, syslog, timestamped application log or plain
+      text) is guessed from the first lines
+    - error and warning lines are reduced to signatures (timestamps, ids,
+      addresses and numbers replaced by placeholders) and counted in a table
+      of at most `LOG_SIGNATURES` entries; when it is full the least frequent
+      entry makes room and its count is inherited (space saving), so the
+      frequent errors come out on top even in logs with many distinct ones
+    - Python and Java stack traces are kept with their innermost frames,
+      de-duplicated by exception and frames, at most `LOG_TRACES`
+    - the first and last lines and timestamps are kept for orientation
+`render()` turns that into a digest of at most `LOG_DIGEST_CHARS`, used in
+the prompt and in the description of suggested tickets.
+"""
+import codecs
+import re
+from collections import Counter, deque
+
+from src.constants import LOG_DIGEST_CHARS, LOG_LINE_CHARS, LOG_SIGNATURES, LOG_TRACE_FRAMES, LOG_TRACES
+from src.serialization import loads
+
+_TS = r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?|[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}"
+_TIMESTAMP = re.compile(_TS)
+_FORMATS = {
+    "syslog": re.compile(r"^[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2} \S+ [^:\s]+:"),
+    "timestamped": re.compile(r"^\[?\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}"),
+}
+DETECT_LINES = 20
+
+_LEVEL = re.compile(r"\b(FATAL|CRITICAL|PANIC|SEVERE|ERROR|WARN(?:ING)?)\b", re.IGNORECASE)
+_LEVELS = {"fatal": "FATAL", "critical": "FATAL", "panic": "FATAL", "severe": "ERROR", "error": "ERROR",
+           "warn": "WARN", "warning": "WARN"}
+_RANK = {"FATAL": 0, "ERROR": 1, "WARN": 2}
+_EXCEPTION = re.compile(r"^(?:[\w$]+\.)*\w*(?:Error|Exception|Exit|Interrupt)\b(?::|$)")
+
+_VOLATILE = [
+    (re.compile(_TS), "<ts>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<n>"),
+]
+
+_PY_TRACE = "Traceback (most recent call last):"
+_JAVA_FRAME = re.compile(r"^\s+at [\w$.<>/]+\(|^\s+\.\.\. \d+ more|^Caused by: |^\s+Suppressed: ")
+EXAMPLE_CHARS = 200
+
+
+def signature(text: str) -> str:
+    """`text` with the parts that differ between repeats of the same event replaced by placeholders."""
+    for pattern, placeholder in _VOLATILE:
+        text = pattern.sub(placeholder, text)
+    return " ".join(text.split())
+
+
+def _size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class LogDigest:
+    def __init__(self, name: str = "log"):
+        self.name = name
+        self.bytes = 0
+        self.lines = 0
+        self.truncated = False
+        self.format = "text"
+        self.first_ts: str | None = None
+        self.last_ts: str | None = None
+        self.levels = Counter()
+        self.signatures: dict[str, list] = {}  # signature -> [count, level, first example]
+        self.traces: dict[tuple, dict] = {}
+        self.other_traces = 0
+        self.head: list[str] = []
+        self.tail = deque(maxlen=3)
+        self._formats = Counter()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+        self._prev = ""
+        self._trace: dict | None = None
+
+    def feed(self, chunk: bytes):
+        self.bytes += len(chunk)
+        parts = (self._partial + self._decoder.decode(chunk)).split("\n")
+        # the rest of an overlong line is dropped, so a file without newlines stays bounded too
+        self._partial = parts.pop()[:LOG_LINE_CHARS]
+        for line in parts:
+            self._line(line.rstrip("\r")[:LOG_LINE_CHARS])
+
+    def finish(self):
+        rest = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if rest:
+            self._line(rest[:LOG_LINE_CHARS])
+        if self._trace is not None:
+            self._end_trace()
+
+    def _line(self, line: str):
+        self.lines += 1
+        if self._trace is not None and self._in_trace(line):
+            return
+        if line.startswith(_PY_TRACE):
+            self._trace = {"kind": "python", "exception": "", "frames": deque(maxlen=LOG_TRACE_FRAMES), "omitted": 0}
+            return
+        if _JAVA_FRAME.match(line) and line.lstrip().startswith("at "):
+            self._trace = {"kind": "java", "exception": self._prev, "frames": [], "omitted": 0, "causes": []}
+            self._in_trace(line)
+            return
+        if not line.strip():
+            return
+        self._prev = line
+        if len(self.head) < 3:
+            self.head.append(line)
+        self.tail.append(line)
+        if self.lines <= DETECT_LINES:
+            self._formats[self._detect(line)] += 1
+            self.format = self._formats.most_common(1)[0][0]
+
+        text, level, ts = line, None, None
+        if line.startswith("{"):
+            text, level, ts = self._json(line)
+        if ts is None and (found := _TIMESTAMP.search(line, 0, 40)):
+            ts = found.group(0)
+        if ts:
+            self.first_ts = self.first_ts or ts
+            self.last_ts = ts
+        if level is None:
+            found = _LEVEL.search(text)
+            if found:
+                level = _LEVELS[found.group(1).lower()]
+                text = text[found.start():]
+            elif _EXCEPTION.match(text):
+                level = "ERROR"
+        if level:
+            self.levels[level] += 1
+            self._count(signature(text), level, line)
+
+    @staticmethod
+    def _detect(line: str) -> str:
+        if line.startswith("{") and line.rstrip().endswith("}"):
+            return "json lines"
+        for name, pattern in _FORMATS.items():
+            if pattern.match(line):
+                return name
+        return "text"
+
+    def _json(self, line: str) -> tuple[str, str | None, str | None]:
+        try:
+            obj = loads(line)
+        except ValueError:
+            return line, None, None
+        if not isinstance(obj, dict):
+            return line, None, None
+        message = str(obj.get("message") or obj.get("msg") or line)
+        level = str(obj.get("level") or obj.get("severity") or obj.get("levelname") or "").lower()
+        ts = obj.get("timestamp") or obj.get("time") or obj.get("@timestamp")
+        stack = obj.get("stack_trace") or obj.get("exc_info") or obj.get("exception")
+        if isinstance(stack, str) and "\n" in stack:
+            for stack_line in stack.splitlines()[:LOG_TRACE_FRAMES * 8]:
+                self._line(stack_line[:LOG_LINE_CHARS])
+            if self._trace is not None:
+                self._end_trace()
+        return message, _LEVELS.get(level), str(ts) if ts else None
+
+    def _count(self, sig: str, level: str, example: str):
+        entry = self.signatures.get(sig)
+        if entry is None:
+            floor = 0
+            if len(self.signatures) >= LOG_SIGNATURES:
+                victim = min(self.signatures, key=lambda k: self.signatures[k][0])
+                floor = self.signatures.pop(victim)[0]
+            entry = self.signatures[sig] = [floor, level, example[:EXAMPLE_CHARS]]
+        entry[0] += 1
+
+    def _in_trace(self, line: str) -> bool:
+        """Adds `line` to the open stack trace; False (after closing it) if it isn't part of it."""
+        trace = self._trace
+        if trace["kind"] == "python":
+            if line[:1].isspace():
+                if line.lstrip().startswith("File "):
+                    if len(trace["frames"]) == trace["frames"].maxlen:
+                        trace["omitted"] += 1
+                    trace["frames"].append(line.strip())
+                return True
+            # the exception line closes a python trace, and is counted as an error line too
+            trace["exception"] = line.strip()
+            self._end_trace()
+            return False
+        if not _JAVA_FRAME.match(line):
+            self._end_trace()
+            return False
+        if line.startswith("Caused by: "):
+            if len(trace["causes"]) < 3:
+                trace["causes"].append(line.strip())
+        elif len(trace["frames"]) < LOG_TRACE_FRAMES:
+            trace["frames"].append(line.strip())
+        else:
+            trace["omitted"] += 1
+        return True
+
+    def _end_trace(self):
+        trace, self._trace = self._trace, None
+        exception = trace["exception"].strip()[:EXAMPLE_CHARS]
+        key = (signature(exception), *trace["frames"], *map(signature, trace.get("causes", ())))
+        if key in self.traces:
+            self.traces[key]["count"] += 1
+        elif len(self.traces) < LOG_TRACES:
+            self.traces[key] = {**trace, "exception": exception, "frames": list(trace["frames"]), "count": 1}
+        else:
+            self.other_traces += 1
+
+    def render(self, limit: int = LOG_DIGEST_CHARS) -> str:
+        """The digest as text of at most `limit` characters, most important parts first."""
+        header = f"{self.name}: {self.lines:,} lines, {_size(self.bytes)}, {self.format}"
+        out = [header + (" (only the beginning was read)" if self.truncated else "")]
+        if self.first_ts:
+            out.append(f"time: {self.first_ts} .. {self.last_ts}")
+        if self.levels:
+            out.append("levels: " + ", ".join(f"{level} {n:,}" for level, n in self.levels.most_common()))
+        if self.traces:
+            out.append(f"stack traces ({len(self.traces) + self.other_traces} distinct):")
+            for trace in sorted(self.traces.values(), key=lambda t: -t["count"]):
+                out.append(f"- {trace['count']:,}x {trace['exception'] or '(no exception line)'}")
+                if trace["omitted"]:
+                    out.append(f"    ... {trace['omitted']} frames omitted")
+                out.extend(f"    {frame}" for frame in trace["frames"])
+                out.extend(f"  {cause}" for cause in trace.get("causes", ()))
+        if self.signatures:
+            out.append(f"errors and warnings ({len(self.signatures)} distinct, most frequent first):")
+            ranked = sorted(self.signatures.values(), key=lambda e: (_RANK[e[1]], -e[0]))
+            out.extend(f"- {count:,}x {example}" for count, _, example in ranked)
+        if not (self.traces or self.signatures):
+            out.append("first lines:")
+            out.extend(f"  {line[:EXAMPLE_CHARS]}" for line in self.head)
+            out.append("last lines:")
+            out.extend(f"  {line[:EXAMPLE_CHARS]}" for line in self.tail)
+
+        text = ""
+        for line in out:
+            if len(text) + len(line) + 1 > limit - 4:
+                return text + "..."
+            text += line + "\n"
+        return text.rstrip("\n")
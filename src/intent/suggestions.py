@@ -0,0 +1,77 @@
+"""Per tool suggestion templates.
+
+Everything about a suggestion except its score and prefill values is fixed
+per tool, so it is computed once from `TOOLS` at import: the expected fields,
+the set of fields a prefill may carry, the description and the title
+placeholders. The LLM only returns tool, score and prefill, and suggestions
+are built with `model_construct` after a few targeted checks instead of a
+full pydantic validation of LLM output.
+"""
+import logging
+import string
+from dataclasses import dataclass
+
+from src.api.schemas import SuggestedAction
+from src.integrations import TOOLS, Tool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SuggestionTemplate:
+    tool: str
+    expected_fields: tuple[str, ...]
+    allowed: frozenset[str]
+    title: str
+    title_fields: tuple[str, ...]
+    fallback_title: str
+    description: str
+
+
+def _template(tool: Tool) -> SuggestionTemplate:
+    expected = (*tool.fields, *tool.form_fields)
+    title_fields = tuple(name for _, name, _, _ in string.Formatter().parse(tool.title) if name)
+    return SuggestionTemplate(
+        tool=tool.id,
+        expected_fields=expected,
+        allowed=frozenset(expected),
+        title=tool.title,
+        title_fields=title_fields,
+        fallback_title=tool.summary,
+        description=tool.description,
+    )
+
+
+TEMPLATES = {tool_id: _template(tool) for tool_id, tool in TOOLS.items()}
+
+
+def _short(value) -> str:
+    text = ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+    return text if len(text) <= 80 else text[:77] + "..."
+
+
+def make_suggestion(tool, score, prefill) -> SuggestedAction | None:
+    """Builds a suggestion from the variable parts; None if `tool` is unknown."""
+    template = TEMPLATES.get(tool) if isinstance(tool, str) else None
+    if template is None:
+        logger.warning(f"Dropping suggestion for unknown tool {tool!r}")
+        return None
+    try:
+        score = min(1.0, max(0.0, float(score or 0.0)))
+    except (TypeError, ValueError):
+        score = 0.0
+    if not isinstance(prefill, dict):
+        prefill = {}
+    prefill = {k: v for k, v in prefill.items() if k in template.allowed and v not in (None, "")}
+    if all(prefill.get(name) for name in template.title_fields):
+        title = template.title.format(**{name: _short(prefill[name]) for name in template.title_fields})
+    else:
+        title = template.fallback_title
+    return SuggestedAction.model_construct(
+        tool=template.tool,
+        score=score,
+        title=title,
+        description=template.description,
+        prefill=prefill,
+        expected_fields=list(template.expected_fields),
+    )
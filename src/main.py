@@ -1,12 +1,48 @@
-import dotenv
-import uvicorn
+import argparse
 import logging
-from src.api import app
+import os
+
+import dotenv
 
 dotenv.load_dotenv()
 
-logging.basicConfig(level=logging.DEBUG)
+import uvicorn
+
+from src.constants import LOG_LEVEL, SHUTDOWN_GRACE, STATE_BACKEND, WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the actionizer backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes (env WEB_CONCURRENCY)")
+    parser.add_argument("--log-level", default=LOG_LEVEL, help="DEBUG, INFO, WARNING... (env LOG_LEVEL)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_level = args.log_level.upper()
+    # worker processes read the level back from the environment in the app lifespan
+    os.environ["LOG_LEVEL"] = log_level
+    # upstream rate budgets are split between the (spawned) workers
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    logging.basicConfig(level=log_level)
+
+    if args.workers > 1 and STATE_BACKEND == "memory":
+        logger.warning("STATE_BACKEND=memory with several workers: tokens and actions will not be shared")
+
+    uvicorn.run(
+        "src.api:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=log_level.lower(),
+        timeout_graceful_shutdown=SHUTDOWN_GRACE,
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
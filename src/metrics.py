@@ -0,0 +1,93 @@
+"""Per tenant request metrics.
+
+Each worker counts requests, errors, throttled requests, latency and queue
+wait per tenant in memory and periodically writes a snapshot to the shared
+store under its pid. `collect()` sums the snapshots of all live workers, so
+`/metrics/tenants` shows the whole host no matter which worker answers.
+Counters are cumulative since the worker started. Tenants are counted once
+they passed `set_tenant`, so with `TENANT_SECRET` set only tenants holding a
+key can add rows.
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+
+from src.constants import METRICS_FLUSH
+from src.state import get_store
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+METRICS_NS = "tenant_metrics"
+
+_counters: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+
+def record(name: str, value: float = 1, tenant: str | None = None):
+    """Adds `value` to counter `name` of the current (or given) tenant; `*_max` names keep the maximum."""
+    counters = _counters[tenant or current_tenant.get()]
+    if name.endswith("_max"):
+        counters[name] = max(counters[name], value)
+    else:
+        counters[name] += value
+
+
+def track(route: str):
+    """Decorator counting calls, errors and latency of an endpoint for the request's tenant."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            status_code = 500
+            try:
+                response = await func(*args, **kwargs)
+                status_code = getattr(response, "status_code", 200)
+                return response
+            except HTTPException as exc:
+                status_code = exc.status_code
+                raise
+            finally:
+                # read after the call, the route sets the tenant
+                latency = time.monotonic() - start
+                record(f"{route}.requests")
+                record(f"{route}.latency_sum", latency)
+                record(f"{route}.latency_max", latency)
+                if status_code == 429:
+                    record(f"{route}.throttled")
+                elif status_code >= 400:
+                    record(f"{route}.errors")
+        return wrapper
+    return decorator
+
+
+async def flush():
+    await get_store().aset(METRICS_NS, str(os.getpid()), _counters, ttl=METRICS_FLUSH * 3)
+
+
+async def collect() -> dict[str, dict[str, float]]:
+    """Sums the latest snapshot of every worker, per tenant."""
+    await flush()
+    store = get_store()
+    totals: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for pid in store.keys(METRICS_NS):
+        for tenant, counters in (store.get(METRICS_NS, pid) or {}).items():
+            for name, value in counters.items():
+                if name.endswith("_max"):
+                    totals[tenant][name] = max(totals[tenant][name], value)
+                else:
+                    totals[tenant][name] += value
+    return totals
+
+
+async def flush_periodically():
+    while True:
+        await asyncio.sleep(METRICS_FLUSH)
+        try:
+            await flush()
+        except Exception as exc:
+            logger.warning(f"Metrics flush failed: {exc!r}")
@@ -0,0 +1,189 @@
+"""Per tenant, per upstream rate limiting and adaptive concurrency.
+
+Zoho enforces request budgets per org, so every (tenant, upstream) pair gets:
+    - a token bucket sized to the provider's documented ceiling, and
+    - an AIMD concurrency limit that grows while latency stays near its
+      baseline and is cut back on 429s, timeouts or latency spikes.
+
+Callers that exceed the budget queue for at most `RATE_LIMIT_MAX_WAIT`
+seconds, after which `RateLimited` is raised so the API can answer 429 with a
+Retry-After instead of an opaque failure.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from src.constants import RATE_LIMIT_MAX_WAIT, TENANTS_TRACKED, UPSTREAM_LIMITS
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Raised when a call could not get a slot within the allowed wait."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} rate limit reached, retry after {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()  # FIFO among waiters
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    async def acquire(self, deadline: float):
+        async with self._lock:
+            while True:
+                wait = self.wait_time()
+                if wait <= 0:
+                    self.tokens -= 1
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise RateLimited("bucket", wait)
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Upstream told us to back off: stop handing out tokens for `seconds`."""
+        self.tokens = 0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit driven by latency and throttling signals."""
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 64,
+                 tolerance: float = 2.0, backoff: float = 0.7):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.inflight = 0
+        self.baseline: float | None = None  # smoothed "healthy" latency
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, deadline: float):
+        async with self._cond:
+            while self.inflight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited("concurrency", 1.0)
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    raise RateLimited("concurrency", 1.0)
+            self.inflight += 1
+
+    async def release(self, latency: float | None, throttled: bool):
+        async with self._cond:
+            self.inflight -= 1
+            self._update(latency, throttled)
+            self._cond.notify_all()
+
+    def _update(self, latency: float | None, throttled: bool):
+        now = time.monotonic()
+        congested = throttled or latency is None
+        if latency is not None:
+            if self.baseline is None:
+                self.baseline = latency
+            elif latency > self.baseline * self.tolerance:
+                congested = True
+            else:
+                # track the healthy latency slowly so one slow call doesn't move it
+                self.baseline = 0.95 * self.baseline + 0.05 * latency
+
+        if congested:
+            # decrease at most once per baseline window so a burst of failures isn't counted N times
+            if now - self._last_decrease > (self.baseline or 1.0):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                logger.debug(f"Concurrency limit decreased to {self.limit:.1f}")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class Permit:
+    throttled: bool = False
+
+
+class UpstreamLimiter:
+    def __init__(self, upstream: str, rate: float, burst: float, concurrency: int):
+        self.upstream = upstream
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(concurrency)
+
+    @asynccontextmanager
+    async def slot(self, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        """Waits (bounded) for a token and a concurrency slot.
+
+        Set `permit.throttled = True` inside the block when the upstream answered 429.
+        """
+        deadline = time.monotonic() + max_wait
+        try:
+            await self.bucket.acquire(deadline)
+            await self.concurrency.acquire(deadline)
+        except RateLimited as exc:
+            raise RateLimited(self.upstream, exc.retry_after) from None
+
+        permit = Permit()
+        start = time.monotonic()
+        latency = None
+        try:
+            yield permit
+            latency = time.monotonic() - start
+        finally:
+            await self.concurrency.release(None if permit.throttled else latency, permit.throttled)
+
+    def has_headroom(self, fraction: float) -> bool:
+        """True while at least `fraction` of the burst and of the concurrency limit are unused."""
+        self.bucket.wait_time()  # refills
+        return (
+            self.bucket.tokens >= self.bucket.burst * fraction
+            and self.concurrency.inflight <= int(self.concurrency.limit) * (1 - fraction)
+        )
+
+    def pause(self, seconds: float):
+        logger.warning(f"{self.upstream} for tenant {current_tenant.get()} throttled, pausing {seconds:.1f}s")
+        self.bucket.pause(seconds)
+
+
+# most recently used last; tenants idle long enough to drop out start with a full budget again
+_limiters: OrderedDict[tuple[str, str], UpstreamLimiter] = OrderedDict()
+
+
+def get_limiter(upstream: str, tenant: str | None = None) -> UpstreamLimiter:
+    """Returns the limiter for `upstream` and the current (or given) tenant."""
+    key = (tenant or current_tenant.get(), upstream)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        rate, burst, concurrency = UPSTREAM_LIMITS.get(upstream, UPSTREAM_LIMITS["default"])
+        limiter = _limiters[key] = UpstreamLimiter(upstream, rate, burst, concurrency)
+        excess = len(_limiters) - TENANTS_TRACKED * len(UPSTREAM_LIMITS)
+        if excess > 0:
+            for old_key, old in list(_limiters.items())[:excess]:
+                if not old.concurrency.inflight:
+                    del _limiters[old_key]
+    else:
+        _limiters.move_to_end(key)
+    return limiter
@@ -0,0 +1,119 @@
+"""Retries with backoff and per upstream circuit breakers.
+
+Retry policy (see `http_client.request`):
+    - idempotent requests (GET, HEAD, PUT, DELETE, OPTIONS or explicitly marked)
+      are retried on connection errors, timeouts and 502/503/504
+    - any request is retried on 429 and on errors raised before the request
+      reached the server (connect errors), since nothing was executed upstream
+    - delays use full-jitter exponential backoff, or `Retry-After` when given,
+      and never exceed the overall `RETRY_BUDGET`
+
+A breaker opens after `BREAKER_FAILURES` consecutive failures of an upstream
+and then fails calls immediately with `UpstreamUnavailable` instead of letting
+each one wait out the timeout. After `BREAKER_RESET` seconds a single probe is
+let through; its outcome closes the breaker or re-opens it.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+
+from src.constants import BREAKER_FAILURES, BREAKER_RESET, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+from src.ratelimit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+RETRY_STATUSES = {502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling the upstream while its circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable, retry after {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, upstream: str, failures: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.upstream = upstream
+        self.max_failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        """Raises `UpstreamUnavailable` if the call must not go out."""
+        if self.state == self.CLOSED:
+            return
+        wait = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and wait <= 0:
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit for {self.upstream} half-open, probing")
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise UpstreamUnavailable(self.upstream, max(wait, 1.0))
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for {self.upstream} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self):
+        # an aborted call tells nothing about the upstream; let the next call probe
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.max_failures:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit for {self.upstream} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def guard(self, is_failure=lambda exc: True):
+        """Wraps a non-http call (e.g. the jira client) in the breaker.
+
+        A call cancelled or rate limited locally never reached the upstream, so it is counted neither way.
+        """
+        self.before_call()
+        try:
+            yield
+        except (asyncio.CancelledError, RateLimited):
+            self.release_probe()
+            raise
+        except Exception as exc:
+            if is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Breakers are per upstream, not per tenant: an outage affects everyone."""
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        breaker = _breakers[upstream] = CircuitBreaker(upstream)
+    return breaker
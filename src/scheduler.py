@@ -0,0 +1,107 @@
+"""Fair sharing of a worker's request slots between tenants.
+
+Upstream budgets are already per tenant (`src.ratelimit`), but the worker
+itself (LLM calls, event loop, connection pool) is shared. A `FairScheduler`
+caps how many requests run at once and how many of those one tenant may hold.
+When it is full, waiters queue per tenant and freed slots are handed out
+round-robin across tenants, so a tenant with a deep backlog gets one slot per
+turn like everyone else instead of draining the queue first.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from src.constants import ANALYZE_SLOTS, EXECUTE_SLOTS, TENANT_QUEUE_WAIT
+from src.metrics import record
+from src.ratelimit import RateLimited
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class FairScheduler:
+    def __init__(self, name: str, capacity: int, per_tenant: int):
+        self.name = name
+        self.capacity = capacity
+        self.per_tenant = min(per_tenant, capacity)
+        self.running = 0
+        self._active: dict[str, int] = {}
+        self._waiters: dict[str, deque[asyncio.Future]] = {}
+        self._order: deque[str] = deque()  # tenants with waiters, in round-robin order
+
+    def queued(self, tenant: str) -> int:
+        return sum(not f.done() for f in self._waiters.get(tenant, ()))
+
+    def _can_run(self, tenant: str) -> bool:
+        return self.running < self.capacity and self._active.get(tenant, 0) < self.per_tenant
+
+    def _take(self, tenant: str):
+        self.running += 1
+        self._active[tenant] = self._active.get(tenant, 0) + 1
+
+    def _release(self, tenant: str):
+        self.running -= 1
+        self._active[tenant] -= 1
+        if not self._active[tenant]:
+            del self._active[tenant]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hands free slots to queued tenants, one per tenant per turn."""
+        blocked = 0
+        while self._order and self.running < self.capacity and blocked < len(self._order):
+            tenant = self._order.popleft()
+            queue = self._waiters[tenant]
+            while queue and queue[0].done():  # gave up waiting
+                queue.popleft()
+            if not queue:
+                del self._waiters[tenant]
+                continue
+            if self._active.get(tenant, 0) >= self.per_tenant:
+                self._order.append(tenant)
+                blocked += 1
+                continue
+            queue.popleft().set_result(None)
+            self._take(tenant)
+            blocked = 0
+            if queue:
+                self._order.append(tenant)
+            else:
+                del self._waiters[tenant]
+
+    @asynccontextmanager
+    async def slot(self, tenant: str | None = None, max_wait: float = TENANT_QUEUE_WAIT):
+        """Holds one slot for the block; raises `RateLimited` after `max_wait` in the queue."""
+        tenant = tenant or current_tenant.get()
+        if tenant not in self._waiters and self._can_run(tenant):
+            self._take(tenant)
+        else:
+            start = time.monotonic()
+            future = asyncio.get_running_loop().create_future()
+            if tenant not in self._waiters:
+                self._waiters[tenant] = deque()
+                self._order.append(tenant)
+            self._waiters[tenant].append(future)
+            self._dispatch()
+            try:
+                await asyncio.wait_for(future, max_wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+                if future.done() and not future.cancelled():
+                    # the slot was granted just as we gave up, hand it on
+                    self._release(tenant)
+                if isinstance(exc, asyncio.TimeoutError):
+                    logger.warning(f"Tenant {tenant} waited {max_wait}s for a {self.name} slot")
+                    record("throttled", tenant=tenant)
+                    raise RateLimited(self.name, 1.0) from None
+                raise
+            record("queue_wait", time.monotonic() - start, tenant=tenant)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+
+analyze_scheduler = FairScheduler("analyze", *ANALYZE_SLOTS)
+execute_scheduler = FairScheduler("execute", *EXECUTE_SLOTS)
@@ -0,0 +1,118 @@
+"""JSON encoding shared by API responses, upstream parsing and the state store.
+
+Uses orjson, which is several times faster than the stdlib encoder and
+handles UUIDs/datetimes natively. Pydantic models are dumped through their
+own (rust) serializer via the `default` hook.
+
+`Base64Body` wraps file bytes that must be returned base64 encoded (WorkDrive
+downloads). It is encoded lazily: `iter_json` streams it in chunks so large
+files never exist as one big base64 string plus one big JSON string. Values
+that are cached (idempotent replays) go through `without_bodies` first, so
+file bodies are never written to the store.
+"""
+import base64
+from typing import Any, Iterator
+
+import orjson
+from pydantic import BaseModel
+
+STREAM_CHUNK = 3 * 64 * 1024  # multiple of 3 so base64 chunks concatenate cleanly
+
+
+class Base64Body:
+    """Raw bytes that serialize as a base64 JSON string."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def encode(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+    def iter_encoded(self, chunk: int = STREAM_CHUNK) -> Iterator[bytes]:
+        view = memoryview(self.data)
+        for i in range(0, len(view), chunk):
+            yield base64.b64encode(view[i:i + chunk])
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Base64Body):
+        return obj.encode()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data: bytes | str) -> Any:
+    return orjson.loads(data)
+
+
+def has_large_body(obj: Any, threshold: int) -> bool:
+    """True if `obj` contains a `Base64Body` of at least `threshold` bytes."""
+    if isinstance(obj, Base64Body):
+        return len(obj) >= threshold
+    if isinstance(obj, BaseModel):
+        obj = obj.__dict__
+    if isinstance(obj, dict):
+        return any(has_large_body(v, threshold) for v in obj.values())
+    if isinstance(obj, list):
+        return any(has_large_body(v, threshold) for v in obj)
+    return False
+
+
+BODY_REF = "$body_omitted"
+
+
+def without_bodies(obj: Any) -> Any:
+    """Copy of `obj` with every `Base64Body` replaced by a small placeholder."""
+    if isinstance(obj, Base64Body):
+        return {BODY_REF: len(obj)}
+    if isinstance(obj, BaseModel):
+        obj = obj.model_dump()
+    if isinstance(obj, dict):
+        return {k: without_bodies(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [without_bodies(v) for v in obj]
+    return obj
+
+
+def is_body_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BODY_REF in value
+
+
+def iter_json(obj: Any) -> Iterator[bytes]:
+    """Yields the JSON encoding of `obj` in pieces, streaming `Base64Body` values."""
+    if isinstance(obj, BaseModel):
+        obj = obj.model_dump()
+    if not has_large_body(obj, 0):
+        # nothing to stream below this point, one orjson call is fastest
+        yield dumps(obj)
+    elif isinstance(obj, Base64Body):
+        yield b'"'
+        yield from obj.iter_encoded()
+        yield b'"'
+    elif isinstance(obj, dict):
+        yield b"{"
+        for i, (k, v) in enumerate(obj.items()):
+            yield (b"," if i else b"") + dumps(str(k)) + b":"
+            yield from iter_json(v)
+        yield b"}"
+    else:
+        yield b"["
+        for i, v in enumerate(obj):
+            if i:
+                yield b","
+            yield from iter_json(v)
+        yield b"]"
@@ -0,0 +1,241 @@
+"""Shared state for tokens, suggested actions and caches.
+
+Every uvicorn worker is its own process, so anything kept in a module level
+dict is invisible to the other workers. State that must survive across
+workers (and restarts) goes through the store returned by `get_store()`.
+
+Two backends are available, picked by `STATE_BACKEND`:
+    - sqlite: a WAL-mode sqlite file shared by all workers on the host (default)
+    - memory: a process-local dict, only useful with a single worker / in tests
+
+Request handlers use the async methods (`aget`, `aset`, `aadd`, `adelete`):
+when another worker holds sqlite's write lock they back off with
+`asyncio.sleep` instead of blocking the event loop in sqlite's busy handler.
+"""
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from src.constants import STATE_BACKEND, STATE_BUSY_MAX, STATE_BUSY_TIMEOUT, STATE_DB
+from src.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """Process-local store. Values are kept encoded to match the sqlite backend."""
+
+    def __init__(self):
+        self._data: dict[tuple[str, str], tuple[bytes, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, k):
+        item = self._data.get(k)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[k]
+            return None
+        return value
+
+    def get(self, namespace: str, key: str, default=None) -> Any:
+        with self._lock:
+            value = self._live((namespace, key))
+        return default if value is None else loads(value)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[(namespace, key)] = (dumps(value), expires_at)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        """Sets `key` only if it is absent. Returns True when the value was stored."""
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if self._live((namespace, key)) is not None:
+                return False
+            self._data[(namespace, key)] = (dumps(value), expires_at)
+            return True
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def keys(self, namespace: str) -> list[str]:
+        with self._lock:
+            return [k for (ns, k) in list(self._data) if ns == namespace and self._live((ns, k)) is not None]
+
+    async def aget(self, namespace: str, key: str, default=None) -> Any:
+        return self.get(namespace, key, default)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        self.set(namespace, key, value, ttl)
+
+    async def aadd(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        return self.add(namespace, key, value, ttl)
+
+    async def adelete(self, namespace: str, key: str):
+        self.delete(namespace, key)
+
+    def close(self):
+        pass
+
+
+def _busy(exc: sqlite3.OperationalError) -> bool:
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+class SqliteStore:
+    """Store backed by a sqlite file so that all workers on a host share it.
+
+    Calls are synchronous point lookups that sqlite in WAL mode answers in well
+    under a millisecond. Only writes can wait, on another worker's write lock;
+    sqlite's busy handler waits at most `STATE_BUSY_TIMEOUT` per attempt, and
+    attempts are retried with backoff for up to `STATE_BUSY_MAX` seconds, on
+    `asyncio.sleep` in the async methods.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=STATE_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._retry(lambda: self._conn.execute("PRAGMA journal_mode=WAL"))
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._retry(lambda: self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL,"
+            " PRIMARY KEY (ns, key))"
+        ))
+
+    @staticmethod
+    def _retry(attempt, *args):
+        deadline = time.monotonic() + STATE_BUSY_MAX
+        delay = STATE_BUSY_TIMEOUT
+        while True:
+            try:
+                return attempt(*args)
+            except sqlite3.OperationalError as exc:
+                if not _busy(exc) or time.monotonic() > deadline:
+                    raise
+            time.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, 1.0)
+
+    @staticmethod
+    async def _aretry(attempt, *args):
+        deadline = time.monotonic() + STATE_BUSY_MAX
+        delay = STATE_BUSY_TIMEOUT
+        while True:
+            try:
+                return attempt(*args)
+            except sqlite3.OperationalError as exc:
+                if not _busy(exc) or time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, 1.0)
+
+    def _get(self, namespace: str, key: str, default=None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE ns=? AND key=? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return default if row is None else loads(row[0])
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, dumps(value), expires_at),
+            )
+
+    def _add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # may raise busy, before anything needs rolling back
+            try:
+                self._conn.execute(
+                    "DELETE FROM kv WHERE ns=? AND key=? AND expires_at IS NOT NULL AND expires_at <= ?",
+                    (namespace, key, now),
+                )
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, dumps(value), expires_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cur.rowcount == 1
+
+    def _delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE ns=? AND key=?", (namespace, key))
+
+    def get(self, namespace: str, key: str, default=None) -> Any:
+        return self._retry(self._get, namespace, key, default)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        self._retry(self._set, namespace, key, value, ttl)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        """Sets `key` only if it is absent (or expired). Returns True when the value was stored."""
+        return self._retry(self._add, namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        self._retry(self._delete, namespace, key)
+
+    async def aget(self, namespace: str, key: str, default=None) -> Any:
+        return await self._aretry(self._get, namespace, key, default)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        await self._aretry(self._set, namespace, key, value, ttl)
+
+    async def aadd(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> bool:
+        return await self._aretry(self._add, namespace, key, value, ttl)
+
+    async def adelete(self, namespace: str, key: str):
+        await self._aretry(self._delete, namespace, key)
+
+    def _keys(self, namespace: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM kv WHERE ns=? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def keys(self, namespace: str) -> list[str]:
+        return self._retry(self._keys, namespace)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: MemoryStore | SqliteStore | None = None
+
+
+def get_store() -> MemoryStore | SqliteStore:
+    """Returns the process wide store, opening it on first use."""
+    global _store
+    if _store is None:
+        if STATE_BACKEND == "memory":
+            _store = MemoryStore()
+        else:
+            _store = SqliteStore(STATE_DB)
+        logger.info(f"Opened {STATE_BACKEND} state store")
+    return _store
+
+
+def close_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,52 @@
+"""Tenant resolution for the current request.
+
+Routes call `set_tenant()` once per request; anything downstream (token
+lookup, action store, rate limit budgets, caches, metrics) reads
+`current_tenant` instead of threading a tenant argument through every
+integration function. Background tasks started from a request inherit it.
+
+With `TENANT_SECRET` set, a request only acts for a tenant when it carries
+that tenant's key (`X-Tenant-Key`, or `key=` on `/auth`), the hex
+HMAC-SHA256 of the tenant id under the secret; `python -m src.tenancy <id>`
+prints it. Without the secret the tenant is taken as given, so every caller
+must be trusted (e.g. only the Cliq extension can reach the service).
+"""
+import hashlib
+import hmac
+import re
+import sys
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+
+from src.constants import TENANT_SECRET
+
+DEFAULT_TENANT = "1"
+
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+_TENANT_ID = re.compile(r"^[\w.@-]{1,64}$")
+
+
+def tenant_key(tenant: str) -> str:
+    return hmac.new(TENANT_SECRET.encode(), tenant.encode(), hashlib.sha256).hexdigest()
+
+
+def set_tenant(tenant: str | None, key: str | None = None, *, verified: bool = False) -> str:
+    """Makes `tenant` (or the default tenant) current for this request.
+
+    `verified` is for callers that authenticated the tenant some other way
+    (signed webhooks, the server side OAuth state).
+    """
+    tenant = tenant or DEFAULT_TENANT
+    if not _TENANT_ID.match(tenant):
+        raise HTTPException(status_code=400, detail="Invalid tenant id")
+    if TENANT_SECRET and not verified:
+        if not key or not hmac.compare_digest(key.encode(), tenant_key(tenant).encode()):
+            raise HTTPException(status_code=401, detail="Invalid or missing tenant key")
+    current_tenant.set(tenant)
+    return tenant
+
+
+if __name__ == "__main__":
+    print(tenant_key(sys.argv[1]))
@@ -0,0 +1,213 @@
+"""Refresh-ahead warming of hot tenants' tokens and caches.
+
+Routes call `record_usage()`; each worker keeps the counts in memory and
+merges them into a per tenant profile in the shared store every pass:
+    - activity per hour of the week
+    - tools, Projects projects, WorkDrive searches and calendar users used
+Counts fade with a half life of `USAGE_HALF_LIFE`, so changed habits win over
+old ones. Profiles are merged read-modify-write; two workers flushing at the
+same moment can lose a few counts, which doesn't matter for a heuristic.
+
+Every `WARM_INTERVAL` each worker looks for tenants expected to be active
+within `WARM_LEAD` (their current or upcoming hour holds at least
+`WARM_MIN_SHARE` of their busiest hour) and, for those:
+    - refreshes the Zoho token if it would expire within the lead window; a
+      tenant whose token has expired is skipped unless this worker may refresh it
+    - refreshes the worker's task and free/busy indexes for the hot projects
+      and users when they are due
+    - fills the shared WorkDrive search cache for hot searches
+These calls also keep connections to the upstreams open in the worker's pool.
+
+Warming never competes with live traffic: a pass makes at most `WARM_BUDGET`
+upstream calls, is skipped while the worker is more than half busy, and only
+calls an upstream whose tenant budget has `WARM_HEADROOM` to spare. Shared
+entries (tokens, searches) are warmed by one worker per pass. Cache lookups
+served from warmed data count as `warm.saved` in the tenant metrics, warming
+calls as `warm.calls`.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from src.auth import UserNotFound, get_zoho_access_token, load_token
+from src.constants import (
+    USAGE_HALF_LIFE, USAGE_HOT_ITEMS, WARM_BUDGET, WARM_HEADROOM, WARM_INTERVAL, WARM_LEAD, WARM_MIN_SHARE,
+)
+from src.indexes import freebusy, tasks
+from src.indexes.changes import webhooks_live
+from src.indexes.files import cached_search, is_cached
+from src.integrations.zoho.workdrive import workdrive_search_files
+from src.metrics import record
+from src.ratelimit import get_limiter
+from src.scheduler import analyze_scheduler, execute_scheduler
+from src.state import get_store
+from src.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+USAGE_NS = "tenant_usage"
+LEASES_NS = "warm_leases"
+KINDS = ("tools", "projects", "files", "users")
+SEP = "\x1f"
+
+_pending: dict[str, dict] = defaultdict(lambda: {"hours": Counter(), **{k: Counter() for k in KINDS}})
+
+
+def _hour_of_week(ts: float) -> int:
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return dt.weekday() * 24 + dt.hour
+
+
+def record_usage(tool: str | None = None, fields: dict | None = None, user: str | None = None):
+    """Counts one request of the current tenant, with the resources it touched."""
+    usage = _pending[current_tenant.get()]
+    usage["hours"][_hour_of_week(time.time())] += 1
+    if user:
+        usage["users"][user] += 1
+    if not tool:
+        return
+    usage["tools"][tool] += 1
+    fields = fields or {}
+    if tool.startswith("zoho_projects") and fields.get("portal_id") and fields.get("project_id"):
+        usage["projects"][f"{fields['portal_id']}{SEP}{fields['project_id']}"] += 1
+    if tool == "zoho_workdrive":
+        queries = fields.get("name_or_query")
+        for query in queries if isinstance(queries, list) else [queries]:
+            if query:
+                usage["files"][f"{fields.get('org_id') or ''}{SEP}{query}"] += 1
+
+
+def flush_usage(now: float | None = None):
+    """Merges this worker's counts into the shared profiles."""
+    now = now or time.time()
+    store = get_store()
+    pending = dict(_pending)
+    _pending.clear()
+    for tenant, usage in pending.items():
+        profile = store.get(USAGE_NS, tenant) or {"hours": [0.0] * 168, **{k: {} for k in KINDS}, "updated": now}
+        decay = 0.5 ** ((now - profile["updated"]) / USAGE_HALF_LIFE)
+        profile["hours"] = [h * decay for h in profile["hours"]]
+        for hour, n in usage["hours"].items():
+            profile["hours"][hour] += n
+        for kind in KINDS:
+            merged = Counter({k: v * decay for k, v in profile[kind].items()})
+            merged.update(usage[kind])
+            # keep a few more than are warmed, so items can climb into the top
+            profile[kind] = dict(merged.most_common(USAGE_HOT_ITEMS * 4))
+        profile["updated"] = now
+        store.set(USAGE_NS, tenant, profile)
+
+
+def expected_active(profile: dict, now: float) -> bool:
+    hours = profile["hours"]
+    busiest = max(hours)
+    if busiest <= 0:
+        return False
+    return any(hours[_hour_of_week(t)] >= busiest * WARM_MIN_SHARE for t in (now, now + WARM_LEAD))
+
+
+def _hot(profile: dict, kind: str) -> list[str]:
+    return [k for k, _ in Counter(profile[kind]).most_common(USAGE_HOT_ITEMS)]
+
+
+def _lease(name: str) -> bool:
+    """True for the one worker that warms a shared entry this pass."""
+    return get_store().add(LEASES_NS, f"{current_tenant.get()}:{name}", True, ttl=WARM_INTERVAL)
+
+
+def _busy() -> bool:
+    return (analyze_scheduler.running > analyze_scheduler.capacity / 2
+            or execute_scheduler.running > execute_scheduler.capacity / 2)
+
+
+async def warm_tenant(profile: dict, budget: int) -> int:
+    """Warms the current tenant's hot resources; returns the upstream calls made."""
+    tenant = current_tenant.get()
+    calls = 0
+
+    def can_call(upstream: str) -> bool:
+        return calls < budget and get_limiter(upstream).has_headroom(WARM_HEADROOM)
+
+    try:
+        token = load_token(tenant)
+    except UserNotFound:
+        return 0
+    min_valid = WARM_LEAD + WARM_INTERVAL
+    if token.expiry_ts < time.time() + min_valid and can_call("zoho_accounts") and _lease("token"):
+        access_token = await get_zoho_access_token(tenant, min_valid=min_valid)
+        calls += 1
+    elif token.access_token and token.expiry_ts > time.time() + 60:
+        access_token = token.access_token
+    else:
+        # expired, and refreshing it is up to the lease holder or the next request
+        return 0
+
+    for key in _hot(profile, "projects"):
+        portal_id, project_id = key.split(SEP)
+        idx = tasks.get_index(portal_id, project_id)
+        if not idx.poll.due(idx.synced_at, webhooks_live("projects")) or not can_call("zoho_projects"):
+            continue
+        if calls + tasks.pages_needed(idx) > budget:
+            continue  # a full sync that doesn't fit is left to the regular refresh
+        calls += await tasks.refresh(portal_id, project_id, access_token, tenant, max_pages=budget - calls)
+        idx.warmed = True
+
+    for user in _hot(profile, "users"):
+        cal = freebusy.get_calendar(user)
+        if not cal.near_stale() or not can_call("zoho_calendar"):
+            continue
+        calls += await freebusy.refresh(user, access_token, tenant, max_calls=budget - calls)
+        cal.warmed = True
+
+    for key in _hot(profile, "files"):
+        org_id, query = key.split(SEP, 1)
+        if is_cached(org_id or None, query, 5) or not can_call("zoho_workdrive") or not _lease(f"file:{key}"):
+            continue
+        await cached_search(
+            org_id or None, query, 5,
+            lambda: workdrive_search_files(access_token, org_id or None, query, limit=5),
+            warming=True,
+        )
+        calls += 1
+
+    if calls:
+        record("warm.calls", calls)
+    return calls
+
+
+async def warm_once(now: float | None = None) -> int:
+    """One warming pass over every tenant expected to be active soon."""
+    now = now or time.time()
+    flush_usage(now)
+    if _busy():
+        logger.debug("Skipping warming, worker is busy")
+        return 0
+    store = get_store()
+    budget = WARM_BUDGET
+    for tenant in store.keys(USAGE_NS):
+        profile = store.get(USAGE_NS, tenant)
+        if budget <= 0:
+            break
+        if not profile or not expected_active(profile, now):
+            continue
+        token = current_tenant.set(tenant)
+        try:
+            budget -= await warm_tenant(profile, budget)
+        except Exception as exc:
+            logger.warning(f"Warming tenant {tenant} failed: {exc!r}")
+        finally:
+            current_tenant.reset(token)
+    return WARM_BUDGET - budget
+
+
+async def warm_periodically():
+    while True:
+        await asyncio.sleep(WARM_INTERVAL)
+        try:
+            calls = await warm_once()
+            if calls:
+                logger.info(f"Warming pass made {calls} upstream calls")
+        except Exception as exc:
+            logger.warning(f"Warming pass failed: {exc!r}")
@@ -0,0 +1,90 @@
+import asyncio
+
+from src import state
+from src.indexes import changes, tasks
+
+
+def test_change_log_replays_and_detects_gaps(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    assert changes.since("r", 0) == ([], 0, False)
+    changes.publish("r", {"n": 1})
+    changes.publish("r", {"n": 2})
+    assert changes.since("r", 0) == ([{"n": 1}, {"n": 2}], 2, False)
+    assert changes.since("r", 1) == ([{"n": 2}], 2, False)
+    state._store.delete(changes.CHANGES_NS, "1:r:1")  # expired
+    assert changes.since("r", 0) == ([], 2, True)
+
+
+def test_webhook_changes_patch_task_index(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    idx = tasks.get_index("p", "q")
+    idx.upsert("1", "Fix payment retries")
+    tasks.publish_change("p", "q", "2", name="Update pricing page")
+    tasks.publish_change("p", "q", "1", removed=True)
+    tasks.apply_changes("p", "q")
+    assert list(idx.tasks) == ["2"]
+
+
+def test_adaptive_interval_backs_off_while_quiet():
+    poll = changes.AdaptiveInterval(10, 100)
+    for _ in range(5):
+        poll.record(False)
+    assert poll.interval == 100
+    poll.record(True)
+    assert poll.interval == 10
+
+
+def test_file_change_drops_only_affected_searches(monkeypatch):
+    import asyncio
+    from src.indexes import files
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+
+    async def fill():
+        await files.cached_search("o", "roadmap", 5, lambda: _result(["f1"]))
+        await files.cached_search("o", "budget sheet", 5, lambda: _result(["f2"]))
+        await files.cached_search("o", "logo", 5, lambda: _result(["f3"]))
+
+    async def _result(ids):
+        return {"data": [{"id": i} for i in ids]}
+
+    asyncio.run(fill())
+    assert files.invalidate_file("f1") == 1
+    assert files.invalidate_file("f9", "Budget sheet 2025.xlsx") == 1
+    assert not files.is_cached("o", "roadmap", 5) and not files.is_cached("o", "budget sheet", 5)
+    assert files.is_cached("o", "logo", 5)
+
+
+def test_webhook_signature_and_replays(monkeypatch):
+    from src.api import webhooks
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(webhooks, "ZOHO_WEBHOOK_SECRET", "s3cret")
+    body = b'{"event_type": "file_created"}'
+    secret = webhooks.webhook_secret("a").encode()
+    good = webhooks.hmac.new(secret, body, webhooks.hashlib.sha256).hexdigest()
+    assert webhooks._verified("a", body, good, None) and webhooks._verified("a", body, None, secret.decode())
+    assert not webhooks._verified("a", body, "sïgnature", None) and not webhooks._verified("a", body, None, "tökén")
+    # neither the shared secret nor tenant a's credentials are valid for tenant b
+    shared = webhooks.hmac.new(b"s3cret", body, webhooks.hashlib.sha256).hexdigest()
+    assert not webhooks._verified("a", body, shared, None) and not webhooks._verified("a", body, None, "s3cret")
+    assert not webhooks._verified("b", body, good, None) and not webhooks._verified("b", body, None, secret.decode())
+    assert not asyncio.run(webhooks._replayed(body)) and asyncio.run(webhooks._replayed(body))
+
+
+def test_webhook_token_of_one_tenant_is_rejected_for_another(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.api import webhooks
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(webhooks, "ZOHO_WEBHOOK_SECRET", "s3cret")
+    app = FastAPI()
+    app.include_router(webhooks.router)
+    client = TestClient(app)
+    token_a = webhooks.webhook_secret("a")
+    body = {"event_type": "task_deleted", "portal_id": "p", "project_id": "q", "task": {"id": "1"}}
+    resp = client.post(f"/webhooks/zoho?tenant=b&source=projects&token={token_a}", json=body)
+    assert resp.status_code == 401
+    resp = client.post(f"/webhooks/zoho?tenant=a&source=projects&token={token_a}", json=body)
+    assert resp.status_code == 200 and resp.json()["source"] == "projects"
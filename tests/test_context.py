@@ -0,0 +1,65 @@
+import asyncio
+
+from src import state
+from src.api.schemas import MessageMeta
+from src.constants import CONTEXT_RING
+from src.intent import context
+from src.intent.context import record_message, record_messages, render_context
+
+
+def test_context_stays_bounded_and_keeps_facts(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    meta = MessageMeta(channel="general", sender="alice")
+
+    async def main():
+        await record_message("general", "Crash in PAY-123, logs are in checkout.log, deploy by 2025-01-11 7 PM", meta)
+        for i in range(50):
+            await record_message("general", f"unrelated chatter number {i} " + "x" * 500, meta)
+
+        ctx = render_context("general")
+        assert "PAY-123" in ctx and "checkout.log" in ctx and "2025-01-11" in ctx
+        assert ctx.count("\n- alice:") == CONTEXT_RING
+        size_after_50 = len(ctx)
+        for i in range(200):
+            await record_message("general", f"more chatter {i} " + "y" * 500, meta)
+        # bounded: growing the thread 5x barely moves the prompt size
+        assert len(render_context("general")) < size_after_50 * 1.2
+
+    asyncio.run(main())
+
+
+def test_duplicate_message_ids_are_recorded_once(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    meta = MessageMeta(channel="c", sender="bob", message_id="m1")
+    asyncio.run(record_message("c", "hello", meta))
+    asyncio.run(record_message("c", "hello", meta))
+    assert render_context("c").count("bob: hello") == 1
+    assert render_context(None) == ""
+
+
+def test_resent_context_messages_are_recorded_once(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    thread = [f"thread message {i}" for i in range(CONTEXT_RING * 2)]
+
+    async def main():
+        await record_message("c", "thread message 0", MessageMeta(channel="c", sender="bob", message_id="m0"))
+        for _ in range(3):  # every request re-sends the whole thread
+            await record_messages("c", [(text, None) for text in thread])
+
+    asyncio.run(main())
+    ctx = state._store.get(context.CONTEXT_NS, "1:c")
+    assert ctx["folded"] + len(ctx["recent"]) == len(thread)
+
+
+def test_updates_wait_for_the_channel_lock(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+
+    async def main():
+        async with context._locked("1:c"):
+            writer = asyncio.create_task(record_message("c", "hello"))
+            await asyncio.sleep(0.05)
+            assert not writer.done() and render_context("c") == ""
+        await writer
+        assert "someone: hello" in render_context("c")
+
+    asyncio.run(main())
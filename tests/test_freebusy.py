@@ -0,0 +1,55 @@
+from src.indexes.freebusy import BusyIndex
+
+
+def test_busy_index_merges_and_clears():
+    idx = BusyIndex()
+    idx.add(10, 20)
+    idx.add(30, 40)
+    idx.add(18, 32)  # bridges both
+    assert (idx.starts, idx.ends) == ([10], [40])
+    idx.clear_range(15, 35)
+    assert (idx.starts, idx.ends) == ([10, 35], [15, 40])
+
+
+def test_conflicts_and_next_free():
+    idx = BusyIndex()
+    for s, e in [(100, 200), (250, 300), (320, 400)]:
+        idx.add(s, e)
+    assert idx.conflicts(150, 160)
+    assert not idx.conflicts(200, 250)
+    assert idx.next_free(150, 50) == 200  # gap 200-250 fits exactly
+    assert idx.next_free(150, 60) == 400  # too small gaps are skipped
+    assert idx.next_free(150, 60, not_after=350) is None
+
+
+def test_prefill_with_mixed_offsets_moves_to_a_free_slot(monkeypatch):
+    import time
+    from datetime import datetime, timezone
+
+    from src import state
+    from src.indexes import freebusy
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(freebusy, "_calendars", freebusy.OrderedDict())
+    start = datetime(2030, 1, 10, 12, tzinfo=timezone.utc).timestamp()
+    cal = freebusy.get_calendar("alice")
+    cal.near_fetched_at, cal.covered_until = time.time(), start + 86400 * 30
+    cal.index.add(start, start + 3600)
+
+    prefill = {"start_iso": "2030-01-10T12:00:00Z", "end_iso": "2030-01-10T12:30:00"}  # end without offset
+    assert freebusy.prefill_free_slot(prefill, "alice")
+    assert prefill["start_iso"] == "2030-01-10T13:00:00+00:00" and prefill["requested_end_iso"] == "2030-01-10T12:30:00"
+
+
+def test_calendars_are_bounded(monkeypatch):
+    from src import state
+    from src.indexes import freebusy
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(freebusy, "_calendars", freebusy.OrderedDict())
+    monkeypatch.setattr(freebusy, "FREEBUSY_CALENDARS", 3)
+    first = freebusy.get_calendar("u0")
+    for i in range(1, 6):
+        freebusy.get_calendar(f"u{i}")
+        assert freebusy.get_calendar("u0") is first  # recently used, kept
+    assert len(freebusy._calendars) == 3
@@ -1,21 +1,51 @@
 import asyncio
+
+import pytest
+
 from src.api.schemas import MessageMeta
 from src.intent.analysis import call_llm
+from src.intent.backends import RecordingStore, ReplayBackend, ReplayMiss, set_backend
 from src.integrations import TOOLS_INFO
 
+METADATA = MessageMeta(channel="general", sender="alice", timestamp="2025-01-10T12:00:00Z", message_id="msg123")
+ANSWER = """```json
+{"suggestions": [
+  {"tool": "zoho_projects", "score": 0.7, "prefill": {"name": "Fix payment bug", "end_date": "2025-01-11"}},
+  {"tool": "jira", "score": 0.9, "prefill": {"summary": "Payment bug fix", "duedate": "2025-01-11T17:00:00Z"}}
+]}
+```"""
+
+
+class StubBackend:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, prompt, model):
+        self.prompts.append((prompt, model))
+        return ANSWER, {"prompt_tokens": 120, "completion_tokens": 40, "latency": 0.0}
+
 
-async def test():
-    message = "We need to fix the payment bug before tomorrow 5 PM"
-    metadata = MessageMeta(
-        channel="general",
-        sender="alice",
-        timestamp="2025-01-10T12:00:00Z",
-        message_id="msg123",
-    )
+def test_call_llm_parses_and_ranks_suggestions():
+    stub = StubBackend()
+    previous = set_backend(stub)
+    try:
+        usage = {}
+        resp = asyncio.run(call_llm("We need to fix the payment bug before tomorrow 5 PM", METADATA, TOOLS_INFO,
+                                    usage=usage))
+    finally:
+        set_backend(previous)
 
-    resp = await call_llm(message, metadata, TOOLS_INFO)
-    print(resp)
+    assert [s["tool"] for s in resp] == ["jira", "zoho_projects"]
+    assert resp[0]["prefill"]["summary"] == "Payment bug fix"
+    assert usage["prompt_tokens"] == 120
+    prompt, _ = stub.prompts[0]
+    assert "We need to fix the payment bug before tomorrow 5 PM" in prompt and "msg123" in prompt
 
 
-    if __name__ == "__main__":
-        asyncio.run(test())
\ No newline at end of file
+def test_unrecorded_prompt_does_not_reach_the_api(tmp_path):
+    previous = set_backend(ReplayBackend(RecordingStore(str(tmp_path / "empty.jsonl"))))
+    try:
+        with pytest.raises(ReplayMiss):
+            asyncio.run(call_llm("Schedule a sync", METADATA, TOOLS_INFO))
+    finally:
+        set_backend(previous)
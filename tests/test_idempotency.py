@@ -0,0 +1,81 @@
+import asyncio
+
+from src import state
+from src.idempotency import execution_key, run_once
+
+
+def test_key_ignores_param_order_and_prefers_header():
+    assert execution_key("a", {"x": 1, "y": 2}) == execution_key("a", {"y": 2, "x": 1})
+    assert execution_key("a", {"x": 1}) != execution_key("a", {"x": 2})
+    assert execution_key("a", {"x": 1}, "k") == execution_key("b", {"x": 2}, "k")
+
+
+def test_concurrent_duplicates_execute_once(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    calls = 0
+
+    async def execute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"success": True, "result": {"n": calls}}
+
+    async def main():
+        key = execution_key("action-1", {"summary": "dup"})
+        first, second = await asyncio.gather(run_once(key, execute), run_once(key, execute))
+        replay = await run_once(key, execute)
+        return first, second, replay
+
+    first, second, replay = asyncio.run(main())
+    assert calls == 1
+    assert first == ({"success": True, "result": {"n": 1}}, False)
+    assert second[1] and replay[1]
+    assert replay[0] == first[0]
+
+
+def test_file_bodies_are_not_cached(monkeypatch):
+    from src.integrations.zoho import workdrive
+    from src.serialization import Base64Body, is_body_ref
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    downloads = []
+
+    async def download(access_token, file_id):
+        downloads.append(file_id)
+        return b"file body"
+    monkeypatch.setattr(workdrive, "workdrive_download_file_bytes", download)
+
+    async def execute():
+        return {"success": True, "result": {"action_resp": {"file_id": "f1", "file_base64": Base64Body(b"file body")}}}
+
+    async def main():
+        key = execution_key("action-2", {})
+        await run_once(key, execute)
+        replay, replayed = await run_once(key, execute)
+        return replay, replayed, await workdrive.restore_file_bodies("token", replay["result"])
+
+    replay, replayed, restored = asyncio.run(main())
+    assert replayed and is_body_ref(replay["result"]["action_resp"]["file_base64"])
+    assert restored["action_resp"]["file_base64"].data == b"file body" and downloads == ["f1"]
+
+
+def test_claim_is_renewed_while_the_execution_runs(monkeypatch):
+    from src import idempotency
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_CLAIM_TTL", 0.06)
+
+    async def execute():
+        await asyncio.sleep(0.3)  # five claim TTLs, e.g. an upload with retries
+        return {"success": True}
+
+    async def main():
+        key = execution_key("action-3", {})
+        running = asyncio.create_task(run_once(key, execute))
+        await asyncio.sleep(0.2)
+        # another worker can't claim the key
+        assert not state._store.add(idempotency.CLAIMS_NS, key, True)
+        await running
+        assert state._store.get(idempotency.CLAIMS_NS, key) is None
+
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+
+from src.intent.backends import RecordingBackend, RecordingStore, ReplayBackend, ReplayMiss
+
+
+class CannedBackend:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, model):
+        self.calls += 1
+        return f'{{"suggestions": [], "echo": "{prompt}"}}', {"prompt_tokens": 3, "completion_tokens": 2, "latency": 0.2}
+
+
+def test_record_then_replay(tmp_path):
+    async def main():
+        path = str(tmp_path / "rec.jsonl")
+        inner = CannedBackend()
+        recorded = await RecordingBackend(inner, RecordingStore(path)).generate("hi", "m")
+
+        replay = ReplayBackend(RecordingStore(path))  # fresh store, reads the file back
+        assert await replay.generate("hi", "m") == recorded
+        with pytest.raises(ReplayMiss):
+            await replay.generate("hi", "other-model")
+
+        slow = ReplayBackend(RecordingStore(path), latency="recorded")
+        start = time.monotonic()
+        await slow.generate("hi", "m")
+        assert time.monotonic() - start >= 0.2
+        assert inner.calls == 1
+
+    asyncio.run(main())
+
+
+def _record_many(path, worker):
+    store = RecordingStore(path)
+    for i in range(200):
+        store.put(f"{worker}-{i}", "x" * 5000, {"latency": 0.1})
+
+
+def test_workers_append_whole_records(tmp_path):
+    path = str(tmp_path / "rec.jsonl")
+    procs = [multiprocessing.Process(target=_record_many, args=(path, w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert len(RecordingStore(path)) == 800  # every line parses
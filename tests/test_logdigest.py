@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from src import state
+from src.api.schemas import Attachment
+from src.constants import LOG_DIGEST_CHARS, LOG_INLINE_CHARS
+from src.intent.attachments import add_digests, digest_attachment, digest_message
+from src.intent.logdigest import LogDigest, signature
+
+PY_TRACE = """Traceback (most recent call last):
+  File "app/checkout.py", line 42, in pay
+    gateway.charge(order)
+  File "app/gateway.py", line 88, in charge
+    raise TimeoutError(f"gateway timed out after {ms}ms")
+TimeoutError: gateway timed out after 3001ms
+"""
+
+
+def _log(repeats: int) -> str:
+    lines = []
+    for i in range(repeats):
+        lines.append(f"2025-01-11T10:{i % 60:02d}:00Z INFO request {i} served in {i % 97}ms")
+        if i % 10 == 0:
+            lines.append(f"2025-01-11T10:{i % 60:02d}:01Z ERROR payment failed for order {i} (id 3f2a9c1e0b7d4e11)")
+        if i % 50 == 0:
+            lines.append(PY_TRACE.replace("3001", str(3000 + i)))
+    return "\n".join(lines)
+
+
+def test_signatures_ignore_volatile_parts():
+    assert signature("order 12 from 10.0.0.1:443 at 2025-01-11T10:00:00Z") == signature(
+        "order 99 from 10.0.0.7:80 at 2025-02-01T09:30:12Z")
+    assert signature("id 3f2a9c1e0b7d4e11 failed") == "id <hex> failed"
+
+
+def test_digest_dedupes_errors_and_traces():
+    digest = LogDigest("checkout.log")
+    data = _log(2000).encode()
+    for i in range(0, len(data), 1000):  # chunk borders split lines and characters
+        digest.feed(data[i:i + 1000])
+    digest.finish()
+
+    assert digest.format == "timestamped"
+    assert digest.levels["ERROR"] == 200 + 40  # error lines and the traces' exception lines
+    assert len(digest.traces) == 1 and next(iter(digest.traces.values()))["count"] == 40
+    text = digest.render()
+    assert "200x 2025-01-11T10:00:01Z ERROR payment failed" in text
+    assert "40x TimeoutError: gateway timed out" in text and 'File "app/gateway.py", line 88' in text
+    assert len(text) <= LOG_DIGEST_CHARS
+
+
+def test_digest_memory_and_size_stay_bounded():
+    digest = LogDigest()
+    for i in range(20000):  # every error distinct
+        digest.feed(f"ERROR unique failure {'abcdefghij'[i % 10]}{i:x}{'-' * (i % 7)}\n".encode())
+    digest.feed(b"x" * 100000)  # one endless line
+    digest.finish()
+    assert len(digest.signatures) <= 256 and len(digest.render()) <= LOG_DIGEST_CHARS
+
+
+def test_pasted_log_and_attachments_become_digests():
+    message = "Create a ticket for this crash log\n" + _log(400)
+    assert len(message) > LOG_INLINE_CHARS
+    att = Attachment(name="worker.log", content=PY_TRACE * 3)
+
+    start = time.perf_counter()
+    text, digests = asyncio.run(digest_message(message, [att]))
+    assert time.perf_counter() - start < 1
+
+    assert text.startswith("Create a ticket for this crash log") and len(text) < 600
+    assert digests[0].startswith("worker.log: ") and "3x TimeoutError" in digests[0]
+    assert digests[1].startswith("pasted log: ")
+    prefill = {"summary": "Checkout crash", "description": "Payments time out"}
+    add_digests(prefill, digests)
+    assert prefill["description"].startswith("Payments time out\n\nworker.log: ")
+
+
+def test_attachments_need_zoho_urls_and_authorization(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())  # no token for the tenant
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(digest_message("see log", [Attachment(url="https://example.com/zoho.com/app.log")]))
+    assert exc.value.status_code == 400
+
+    text, digests = asyncio.run(digest_message("see log", [
+        Attachment(url="https://cliq.zoho.com/api/v2/attachments/a1/app.log"), Attachment(file_id="f1")]))
+    assert text == "see log"
+    assert digests == ["app.log: not read, Zoho authorization required",
+                       "WorkDrive file f1: not read, Zoho authorization required"]
+
+    prefill = {"summary": "Crash", "description": ""}
+    add_digests(prefill, digests)
+    assert prefill["description"].startswith("app.log: ")
+    add_digests(prefill, [])
+    assert prefill["description"].count("\n\n") == 1
+
+
+def test_timeout_waits_for_the_running_feed(monkeypatch):
+    events = []
+    feed = LogDigest.feed
+
+    def slow_feed(self, chunk):
+        time.sleep(0.2)
+        feed(self, chunk)
+        events.append("fed")
+
+    finish = LogDigest.finish
+
+    def finish_after_feed(self):
+        events.append("finish")
+        finish(self)
+
+    monkeypatch.setattr(LogDigest, "feed", slow_feed)
+    monkeypatch.setattr(LogDigest, "finish", finish_after_feed)
+    att = Attachment(name="slow.log", content=PY_TRACE * 5000)
+    text = asyncio.run(digest_attachment(att, None, time.monotonic() + 0.05))
+    assert events == ["fed", "finish"]
+    assert text.startswith("slow.log: ") and "only the beginning was read" in text
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from src.ratelimit import AdaptiveConcurrency, RateLimited, UpstreamLimiter
+
+
+def test_bucket_queues_then_rejects():
+    async def main():
+        limiter = UpstreamLimiter("test", rate=20, burst=2, concurrency=4)
+        start = time.monotonic()
+        for _ in range(3):  # third call waits ~1/20s for a token
+            async with limiter.slot(max_wait=1):
+                pass
+        assert time.monotonic() - start >= 0.04
+
+        limiter.pause(5)
+        with pytest.raises(RateLimited):
+            async with limiter.slot(max_wait=0.1):
+                pass
+
+    asyncio.run(main())
+
+
+def test_aimd_backs_off_on_throttle_and_recovers():
+    ac = AdaptiveConcurrency(initial=8)
+    ac._update(0.1, throttled=False)
+    ac._update(0.1, throttled=True)
+    assert ac.limit < 8
+    low = ac.limit
+    for _ in range(20):
+        ac._update(0.1, throttled=False)
+    assert ac.limit > low
+    # a latency spike well above baseline counts as congestion
+    ac._last_decrease = 0
+    before = ac.limit
+    ac._update(1.0, throttled=False)
+    assert ac.limit < before
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from src.resilience import CircuitBreaker, UpstreamUnavailable, backoff_delay
+
+
+def test_breaker_opens_then_probes():
+    breaker = CircuitBreaker("test", failures=2, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # the probe goes out
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_backoff_is_capped():
+    assert all(0 <= backoff_delay(n, base=0.1, cap=1.0) <= 1.0 for n in range(10))
+
+
+def test_locally_rate_limited_probe_leaves_the_breaker_open():
+    import asyncio
+    from src.ratelimit import RateLimited
+
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    async def probe():
+        async with breaker.guard():
+            raise RateLimited("test", 1.0)
+
+    with pytest.raises(RateLimited):
+        asyncio.run(probe())
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.failures == 1
+    breaker.before_call()  # the next call may probe
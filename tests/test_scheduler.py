@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from src.ratelimit import RateLimited
+from src.scheduler import FairScheduler
+
+
+def test_noisy_tenant_does_not_starve_others():
+    async def main():
+        sched = FairScheduler("test", capacity=2, per_tenant=2)
+        order = []
+        gate = asyncio.Event()
+
+        async def job(tenant, n):
+            async with sched.slot(tenant, max_wait=5):
+                order.append((tenant, n))
+                await gate.wait()
+
+        noisy = [asyncio.create_task(job("a", i)) for i in range(6)]
+        await asyncio.sleep(0)
+        quiet = asyncio.create_task(job("b", 0))
+        await asyncio.sleep(0)
+        assert order == [("a", 0), ("a", 1)]
+        gate.set()
+        await asyncio.gather(*noisy, quiet)
+        # b queued behind four of a's requests but gets the next free slot
+        assert order.index(("b", 0)) <= 3
+
+    asyncio.run(main())
+
+
+def test_queue_wait_is_bounded():
+    async def main():
+        sched = FairScheduler("test", capacity=1, per_tenant=1)
+        async with sched.slot("a"):
+            with pytest.raises(RateLimited):
+                async with sched.slot("a", max_wait=0.05):
+                    pass
+        assert sched.running == 0 and sched.queued("a") == 0
+
+    asyncio.run(main())
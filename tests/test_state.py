@@ -0,0 +1,64 @@
+import time
+
+from src.state import MemoryStore, SqliteStore
+
+
+def _check_store(store):
+    store.set("ns", "a", {"x": 1})
+    assert store.get("ns", "a") == {"x": 1}
+    assert store.get("other", "a") is None
+
+    assert not store.add("ns", "a", 2)
+    assert store.add("ns", "b", 2)
+    assert sorted(store.keys("ns")) == ["a", "b"]
+
+    store.set("ns", "short", 1, ttl=0.05)
+    time.sleep(0.1)
+    assert store.get("ns", "short") is None
+    assert store.add("ns", "short", 3)
+
+    store.delete("ns", "a")
+    assert store.get("ns", "a", default="gone") == "gone"
+
+
+def test_memory_store():
+    _check_store(MemoryStore())
+
+
+def test_sqlite_store_shared_between_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    _check_store(SqliteStore(path))
+    # a second connection (another worker) sees the same data
+    other = SqliteStore(path)
+    assert other.get("ns", "b") == 2
+
+
+def test_sqlite_writes_wait_for_the_lock_without_blocking_the_loop(tmp_path):
+    import asyncio
+    import sqlite3
+
+    path = str(tmp_path / "state.db")
+    store = SqliteStore(path)
+    other = sqlite3.connect(path, isolation_level=None)  # another worker, mid write
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        writer = asyncio.create_task(store.aset("ns", "k", 1))
+        await asyncio.sleep(0.3)
+        assert not writer.done() and ticks > 5  # waiting, while the loop keeps running
+        other.execute("COMMIT")
+        await writer
+        ticker.cancel()
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert store.get("ns", "k") == 1 and time.monotonic() - start < 3
@@ -0,0 +1,21 @@
+from src.integrations import TOOLS_INFO
+from src.intent.suggestions import make_suggestion
+
+
+def test_suggestion_from_template():
+    s = make_suggestion("jira", "1.7", {"summary": "Payment bug", "issuetype": "Bug", "bogus": 1, "duedate": None})
+    assert s.tool == "jira" and s.score == 1.0
+    assert s.title == "Create Jira ticket: Payment bug"
+    assert s.prefill == {"summary": "Payment bug", "issuetype": "Bug"}
+    assert s.expected_fields[:2] == ["project_key", "summary"]
+    assert s.action_id is not None
+
+
+def test_fallback_title_and_unknown_tool():
+    assert make_suggestion("jira", 0.5, None).title == "Create a Jira ticket"
+    assert make_suggestion("slack", 0.5, {}) is None
+
+
+def test_tools_info_lists_llm_tools_only():
+    assert "- jira: Create a Jira ticket." in TOOLS_INFO
+    assert "zoho_projects_update" not in TOOLS_INFO
@@ -0,0 +1,79 @@
+import asyncio
+
+from src.indexes.tasks import TaskIndex
+
+
+def test_similar_ranks_near_duplicate_first():
+    idx = TaskIndex()
+    idx.upsert("1", "Fix payment gateway timeout", "Checkout fails when the gateway takes over 30s")
+    idx.upsert("2", "Update onboarding docs", "Add screenshots for the new signup flow")
+    idx.upsert("3", "Quarterly budget review", "Prepare the Q3 budget sheet")
+
+    top = idx.similar("Fix the payment gateway timeouts at checkout", k=2)
+    assert top[0][0] == "1"
+    assert top[0][1] > 0.5 > top[1][1]
+
+
+def test_large_project_finds_exact_task_in_sparse_rows():
+    idx = TaskIndex()
+    for i in range(2000):
+        idx.upsert(str(i), f"Task {i} for component {i % 37}", "some longer description text " * 5)
+    idx.build()
+    assert idx.similar("Task 42 for component 5", k=1)[0][0] == "42"
+    # sparse: far below a dense float32 row per task
+    assert idx._built.weights.nbytes + idx._built.buckets.nbytes + idx._built.rows.nbytes < 2000 * 4096 * 4 / 20
+
+
+def test_remove_drops_task():
+    idx = TaskIndex()
+    idx.upsert("1", "Deploy release", "")
+    idx.remove("1")
+    assert idx.similar("Deploy release") == []
+
+
+def test_changes_patch_a_built_index_without_rebuilding():
+    idx = TaskIndex()
+    for i in range(50):
+        idx.upsert(str(i), f"Task {i} for component {i}", "")
+    idx.build()
+    built = idx._built
+    idx.upsert("7", "Fix payment gateway timeout", "")
+    idx.upsert("new", "Rotate the signing keys", "")
+    idx.remove("3")
+
+    assert idx.similar("payment gateway timeout", k=1)[0][0] == "7"
+    assert idx.similar("rotate signing keys", k=1)[0][0] == "new"
+    assert "3" not in [t for t, _ in idx.similar("Task 3 for component 3", k=50)]
+    assert idx._built is built and idx.pending == 3
+
+    asyncio.run(idx.rebuild())
+    assert idx.pending == 0 and idx.similar("rotate signing keys", k=1)[0][0] == "new"
+
+
+def test_changes_during_the_first_rebuild_are_replayed():
+    idx = TaskIndex()
+    idx.upsert("1", "Deploy release", "")
+    idx.upsert("2", "Rotate the signing keys", "")
+
+    async def run():
+        build = asyncio.create_task(idx.rebuild())
+        await asyncio.sleep(0)  # snapshot taken, `_compute` running in a thread
+        idx.remove("1")
+        idx.upsert("3", "Fix payment gateway timeout", "")
+        await build
+
+    asyncio.run(run())
+    assert "1" not in [t for t, _ in idx.similar("Deploy release", k=3)]
+    assert idx.similar("payment gateway timeout", k=1)[0][0] == "3"
+
+
+def test_indexes_are_capped(monkeypatch):
+    from src.indexes import tasks
+
+    monkeypatch.setattr(tasks, "_indexes", tasks.OrderedDict())
+    monkeypatch.setattr(tasks, "TASK_INDEXES", 2)
+    first = tasks.get_index("p", "1", tenant="t")
+    tasks.get_index("p", "2", tenant="t")
+    assert tasks.get_index("p", "1", tenant="t") is first  # most recently used again
+    tasks.get_index("p", "3", tenant="t")
+    assert list(tasks._indexes) == [("t", "p", "1"), ("t", "p", "3")]
@@ -0,0 +1,70 @@
+import asyncio
+import contextvars
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi import HTTPException
+
+from src import auth, ratelimit, state, tenancy
+from src.auth import consume_oauth_state, grant_code_auth_url
+
+
+def test_oauth_state_is_a_one_time_nonce(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    url = grant_code_auth_url("acme")
+    nonce = parse_qs(urlsplit(url).query)["state"][0]
+    assert "acme" not in nonce
+    assert consume_oauth_state("acme") is None
+    assert consume_oauth_state(nonce) == "acme"
+    assert consume_oauth_state(nonce) is None  # replayed callback
+
+
+def test_tenant_key_is_required_when_configured(monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANT_SECRET", "s3cret")
+    # in a copy, so the tenant doesn't leak into later tests
+    set_tenant = lambda *args, **kwargs: contextvars.copy_context().run(tenancy.set_tenant, *args, **kwargs)
+    key = tenancy.tenant_key("acme")
+    assert set_tenant("acme", key) == "acme"
+    for bad in (None, tenancy.tenant_key("other"), "ключ"):
+        with pytest.raises(HTTPException) as exc:
+            set_tenant("acme", bad)
+        assert exc.value.status_code == 401
+    assert set_tenant("acme", verified=True) == "acme"
+
+
+def test_idle_tenants_state_is_bounded(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiters", ratelimit.OrderedDict())
+    monkeypatch.setattr(ratelimit, "TENANTS_TRACKED", 2)
+    for i in range(50):
+        ratelimit.get_limiter("zoho_projects", tenant=f"t{i}")
+    assert len(ratelimit._limiters) <= 2 * len(ratelimit.UPSTREAM_LIMITS)
+
+    async def refresh(user_id):
+        return "token"
+    monkeypatch.setattr(auth, "load_token", lambda user_id: auth.ZohoTokenStore())
+    monkeypatch.setattr(auth, "refresh_zoho_access_token", refresh)
+    for i in range(50):
+        asyncio.run(auth.get_zoho_access_token(f"t{i}"))
+    assert len(auth._refresh_locks) == 0
+
+
+def test_tenant_metrics_only_show_the_callers_tenant(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src import metrics
+    from src.api import routes
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    monkeypatch.setattr(metrics, "_counters", metrics.defaultdict(lambda: metrics.defaultdict(float)))
+    metrics.record("analyze.calls", tenant="acme")
+    metrics.record("analyze.calls", tenant="other")
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(app)
+    assert set(client.get("/metrics/tenants").json()) == {"acme", "other"}  # trusted deployment
+
+    monkeypatch.setattr(routes, "TENANT_SECRET", "s3cret")
+    monkeypatch.setattr(tenancy, "TENANT_SECRET", "s3cret")
+    assert client.get("/metrics/tenants?tenant=acme").status_code == 401
+    resp = client.get("/metrics/tenants?tenant=acme", headers={"X-Tenant-Key": tenancy.tenant_key("acme")})
+    assert resp.json() == {"acme": {"analyze.calls": 1.0}}
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src import metrics, state, warmer
+from src.auth import ZohoTokenStore, save_token
+from src.indexes.files import cached_search
+from src.tenancy import current_tenant
+
+
+def test_usage_profile_predicts_active_hours_and_hot_items(monkeypatch):
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    for _ in range(3):
+        warmer.record_usage("zoho_projects", {"portal_id": "p", "project_id": "q"})
+    warmer.record_usage("zoho_workdrive", {"org_id": "o", "name_or_query": ["roadmap", "logo"]})
+    now = time.time()
+    warmer.flush_usage(now)
+
+    profile = state._store.get(warmer.USAGE_NS, "1")
+    assert warmer._hot(profile, "projects") == [f"p{warmer.SEP}q"]
+    assert len(warmer._hot(profile, "files")) == 2
+    assert warmer.expected_active(profile, now)
+    assert not warmer.expected_active(profile, now + 12 * 3600)
+
+    # counts fade with age
+    warmer.record_usage("jira")
+    warmer.flush_usage(now + warmer.USAGE_HALF_LIFE)
+    profile = state._store.get(warmer.USAGE_NS, "1")
+    assert profile["tools"]["zoho_projects"] == 1.5
+
+
+def _setup(monkeypatch, expires_in: float, files: int = 3):
+    """A tenant active around the clock with `files` hot searches; returns the upstream calls made."""
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    calls = {"refresh": 0, "search": 0}
+
+    async def refresh(tenant, min_valid=60):
+        calls["refresh"] += 1
+        return "fresh"
+
+    async def search(access_token, org_id, query, limit):
+        calls["search"] += 1
+        return {"data": [], "token": access_token}
+
+    monkeypatch.setattr(warmer, "get_zoho_access_token", refresh)
+    monkeypatch.setattr(warmer, "workdrive_search_files", search)
+    save_token("t", ZohoTokenStore("cached", "r", time.time() + expires_in))
+    profile = {"hours": [1.0] * 168, "tools": {}, "projects": {}, "users": {},
+               "files": {f"o{warmer.SEP}doc {i}": 10 - i for i in range(files)}, "updated": time.time()}
+    state._store.set(warmer.USAGE_NS, "t", profile)
+    return calls
+
+
+def test_expired_token_is_only_refreshed_by_the_lease_holder(monkeypatch):
+    calls = _setup(monkeypatch, expires_in=-10)
+    state._store.add(warmer.LEASES_NS, "t:token", True)  # another worker refreshes it this pass
+    assert asyncio.run(warmer.warm_once()) == 0
+    assert calls == {"refresh": 0, "search": 0}
+
+    state._store.delete(warmer.LEASES_NS, "t:token")
+    assert asyncio.run(warmer.warm_once()) == 4  # the refresh counts against the budget
+    assert calls == {"refresh": 1, "search": 3}
+
+
+def test_valid_token_is_used_without_a_refresh(monkeypatch):
+    calls = _setup(monkeypatch, expires_in=3600 * 2)
+    assert asyncio.run(warmer.warm_once()) == 3
+    assert calls == {"refresh": 0, "search": 3}
+    # shared searches are leased per pass, and cached afterwards
+    assert asyncio.run(warmer.warm_once()) == 0
+
+
+def test_budget_headroom_and_busy_workers_limit_warming(monkeypatch):
+    calls = _setup(monkeypatch, expires_in=3600 * 2, files=5)
+    monkeypatch.setattr(warmer, "WARM_BUDGET", 2)
+    assert asyncio.run(warmer.warm_once()) == 2 and calls["search"] == 2
+
+    calls = _setup(monkeypatch, expires_in=3600 * 2)
+    monkeypatch.setattr(warmer, "get_limiter", lambda upstream: SimpleNamespace(has_headroom=lambda f: False))
+    assert asyncio.run(warmer.warm_once()) == 0 and calls["search"] == 0
+    monkeypatch.undo()
+
+    calls = _setup(monkeypatch, expires_in=3600 * 2)
+    monkeypatch.setattr(warmer.analyze_scheduler, "running", warmer.analyze_scheduler.capacity)
+    assert asyncio.run(warmer.warm_once()) == 0 and calls["search"] == 0
+
+
+def test_lookups_of_warmed_searches_count_as_saved(monkeypatch):
+    calls = _setup(monkeypatch, expires_in=3600 * 2, files=1)
+    asyncio.run(warmer.warm_once())
+
+    async def lookup():
+        current_tenant.set("t")
+        return await cached_search("o", "doc 0", 5, lambda: None)
+
+    before = metrics._counters["t"]["warm.saved"]
+    assert asyncio.run(lookup())["token"] == "cached"
+    assert metrics._counters["t"]["warm.saved"] == before + 1
+    assert calls["search"] == 1
+
+
+def test_budget_counts_every_page_and_range(monkeypatch):
+    from src.indexes import freebusy, tasks
+
+    calls = _setup(monkeypatch, expires_in=3600 * 2, files=0)
+    profile = state._store.get(warmer.USAGE_NS, "t")
+    profile["projects"] = {f"p{warmer.SEP}q": 1}
+    state._store.set(warmer.USAGE_NS, "t", profile)
+    monkeypatch.setattr(tasks, "_indexes", tasks.OrderedDict())
+    pages = []
+
+    async def list_tasks(access_token, portal_id, project_id, page, per_page, sort_by):
+        pages.append(page)  # a project with endless full pages
+        return {"tasks": [{"id": f"{page}-{i}", "name": f"task {page} {i}"} for i in range(per_page)]}
+
+    monkeypatch.setattr(tasks, "list_zoho_project_tasks", list_tasks)
+    monkeypatch.setattr(warmer, "WARM_BUDGET", 4)
+    assert asyncio.run(warmer.warm_once()) == 4 and pages == [1, 2, 3, 4]
+    idx = tasks.get_index("p", "q", "t")
+    assert idx.synced_at == 0 and len(idx.tasks) == 4 * tasks.PAGE_SIZE  # cut short, so not a sync
+
+    # the next full sync needs more pages than the budget: left to the regular refresh
+    assert asyncio.run(warmer.warm_once()) == 0 and len(pages) == 4
+
+    fetched = []
+
+    async def get_freebusy(access_token, user, start, end):
+        fetched.append(start)
+        return []
+
+    monkeypatch.setattr(freebusy, "get_zoho_freebusy", get_freebusy)
+    cal = freebusy.get_calendar("alice", "t")
+    cal.covered_until = time.time() + freebusy.FREEBUSY_NEAR * 2  # near window stale: two ranges to fetch
+    assert asyncio.run(freebusy.refresh("alice", "token", "t", max_calls=1)) == 1 and len(fetched) == 1
+    assert asyncio.run(freebusy.refresh("alice", "token", "t")) == 1  # only the tail is left
+    assert calls["search"] == 0
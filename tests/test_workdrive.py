@@ -0,0 +1,202 @@
+import asyncio
+import io
+
+from src.integrations.zoho.workdrive import aiter_chunks
+
+
+async def _collect(source, chunk_size, skip=0):
+    return [c async for c in aiter_chunks(source, chunk_size, skip)]
+
+
+async def _pieces(data, n):
+    for i in range(0, len(data), n):
+        yield data[i:i + n]
+
+
+def test_aiter_chunks_same_for_every_source():
+    data = bytes(range(256)) * 40
+    expected = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+    for source in (data, io.BytesIO(data), _pieces(data, 333)):
+        assert asyncio.run(_collect(source, 1000)) == expected
+
+
+def test_aiter_chunks_resumes_after_skip():
+    data = b"x" * 2500 + b"y" * 500
+    for source in (data, io.BytesIO(data), _pieces(data, 700)):
+        assert b"".join(asyncio.run(_collect(source, 1000, skip=2000))) == data[2000:]
+
+
+def _upload_stub(monkeypatch, fail_at=None):
+    """Records chunk uploads; raises once on the chunk starting at `fail_at`."""
+    import httpx
+    from src import state
+    from src.integrations.zoho import workdrive
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    sent = []
+    failing = [fail_at]
+
+    async def request(upstream, method, url, headers=None, content=None, **kwargs):
+        start = int(headers["Content-Range"].split()[1].split("-")[0])
+        if start in failing:
+            failing.remove(start)
+            raise httpx.ConnectError("connection dropped")
+        sent.append((headers["upload-id"], headers["Content-Range"], content))
+        return httpx.Response(200, json={"data": {"id": "new-file"}}, request=httpx.Request(method, url))
+    monkeypatch.setattr(workdrive, "request", request)
+    return sent
+
+
+def test_chunked_upload_sends_ranges_in_order(monkeypatch):
+    from src.integrations.zoho.workdrive import create_workdrive_file
+
+    sent = _upload_stub(monkeypatch)
+    data = b"a" * 2500
+    result = asyncio.run(create_workdrive_file("t", "folder", "report v2.pdf", data, chunk_size=1000))
+    assert result == {"data": {"id": "new-file"}}
+    assert [r for _, r, _ in sent] == ["bytes 0-999/2500", "bytes 1000-1999/2500", "bytes 2000-2499/2500"]
+    assert b"".join(c for _, _, c in sent) == data
+
+
+def test_chunked_upload_resumes_and_finalizes(monkeypatch):
+    import httpx
+    import pytest
+    from src.integrations.zoho.workdrive import UPLOADS_NS, create_workdrive_file
+    from src import state
+
+    sent = _upload_stub(monkeypatch, fail_at=2000)
+    data = bytes(range(250)) * 12  # 3000 bytes, 3 chunks
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(create_workdrive_file("t", "folder", "big.bin", data, chunk_size=1000, resume_key="k"))
+    assert len(sent) == 2
+
+    upload = lambda: asyncio.run(create_workdrive_file("t", "folder", "big.bin", data, chunk_size=1000, resume_key="k"))
+    monkeypatch.setattr(state._store, "delete", lambda ns, key: None)  # completed, but the cleanup was lost
+    assert upload() == {"data": {"id": "new-file"}}
+    assert [r for _, r, _ in sent] == ["bytes 0-999/3000", "bytes 1000-1999/3000", "bytes 2000-2999/3000"]
+    assert len({upload_id for upload_id, _, _ in sent}) == 1
+    # resuming a completed upload returns the created file instead of failing
+    assert upload() == {"data": {"id": "new-file"}} and len(sent) == 3
+    assert state._store.get(UPLOADS_NS, "k")["result"] == {"data": {"id": "new-file"}}
+
+
+def _workdrive_stub(monkeypatch, files: dict[str, bytes], sizes: dict[str, int] | None = None):
+    """Serves search, metadata and downloads of `files` through a mocked HTTP client."""
+    import httpx
+    from src import http_client, state
+
+    monkeypatch.setattr(state, "_store", state.MemoryStore())
+    sizes = sizes or {}
+    calls = {"download": 0, "active": 0, "max_active": 0}
+
+    def meta(file_id):
+        size = sizes.get(file_id, len(files[file_id]))
+        return {"id": file_id, "attributes": {"name": f"{file_id}.txt", "storage_info": {"size_in_bytes": size}}}
+
+    async def handler(req: httpx.Request):
+        path = req.url.path
+        if path.endswith("/files/search"):
+            return httpx.Response(200, json={"data": [meta(req.url.params["q"])]})
+        if path.endswith("/download"):
+            calls["download"] += 1
+            calls["active"] += 1
+            calls["max_active"] = max(calls["max_active"], calls["active"])
+            await asyncio.sleep(0.01)
+            calls["active"] -= 1
+            return httpx.Response(200, content=files[path.split("/")[-2]])
+        return httpx.Response(200, json={"data": meta(path.split("/")[-1])})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return calls
+
+
+def test_fetch_keeps_order_and_bounds_concurrency(monkeypatch):
+    from src.integrations.zoho import workdrive
+
+    files = {f"f{i}": f"body {i}".encode() * 100 for i in range(6)}
+    calls = _workdrive_stub(monkeypatch, files)
+    monkeypatch.setattr(workdrive, "WORKDRIVE_FANOUT", 2)
+
+    fetched = asyncio.run(workdrive.fetch_workdrive_files("t", "org", ["f4", "f5"], ["f0", "f1", "f2", "f3"]))
+    assert [ref["id"] for ref, _ in fetched] == ["f0", "f1", "f2", "f3", "f4", "f5"]
+    assert [body.read() for _, body in fetched] == [files[f"f{i}"] for i in range(6)]
+    assert calls["max_active"] == 2
+
+
+def test_fetch_enforces_byte_budget(monkeypatch):
+    import pytest
+    from fastapi import HTTPException
+    from src.integrations.zoho import workdrive
+
+    monkeypatch.setattr(workdrive, "WORKDRIVE_MAX_TOTAL_BYTES", 1000)
+    monkeypatch.setattr(workdrive, "UPLOAD_CHUNK_SIZE", 100)
+    files = {"a": b"x" * 600, "b": b"y" * 600}
+
+    # over budget by metadata: nothing is downloaded
+    calls = _workdrive_stub(monkeypatch, files)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(workdrive.fetch_workdrive_files("t", "org", [], ["a", "b"]))
+    assert exc.value.status_code == 413 and calls["download"] == 0
+
+    # metadata understates the size: cut off while streaming
+    calls = _workdrive_stub(monkeypatch, files, sizes={"a": 10, "b": 10})
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(workdrive.fetch_workdrive_files("t", "org", [], ["a", "b"]))
+    assert exc.value.status_code == 413
+
+
+def test_zip_bundles_spooled_files_with_unique_names():
+    import zipfile
+    from src.integrations.zoho.workdrive import _unique_names, zip_files
+
+    names = _unique_names(["notes.txt", "notes.txt", "logo.png", "notes.txt"])
+    assert names == ["notes.txt", "1_notes.txt", "logo.png", "2_notes.txt"]
+    bodies = [io.BytesIO(b"one"), b"two", io.BytesIO(b"three"), io.BytesIO(b"four")]
+    with zipfile.ZipFile(zip_files(list(zip(names, bodies)))) as zf:
+        assert zf.namelist() == names
+        assert [zf.read(n) for n in names] == [b"one", b"two", b"three", b"four"]
+
+
+def test_chunked_upload_stops_at_the_first_failed_chunk(monkeypatch):
+    import httpx
+    import pytest
+    from src.integrations.zoho.workdrive import create_workdrive_file
+
+    sent = _upload_stub(monkeypatch, fail_at=1000)
+    read = []
+
+    async def source():
+        for i in range(8):
+            read.append(i)
+            yield bytes([i]) * 1000
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(create_workdrive_file("t", "folder", "big.bin", source(), chunk_size=1000))
+    assert [r for _, r, _ in sent] == ["bytes 0-999/*"]
+    assert len(read) < 8  # the rest of the source isn't even read
+
+
+def test_cliq_share_streams_spooled_files_without_rolling_them_to_disk(monkeypatch):
+    import tempfile
+
+    import httpx
+    from src.integrations.zoho import workdrive
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    spooled.write(b"z" * 5000)
+    sent = []
+
+    async def request(upstream, method, url, headers=None, content=None, **kwargs):
+        for _ in range(2):  # a retried request iterates the body again
+            sent.append((headers, b"".join([c async for c in content])))
+        return httpx.Response(200, json={"ok": True}, request=httpx.Request(method, url))
+    monkeypatch.setattr(workdrive, "request", request)
+
+    files = [("a.txt", b"plain"), ('b "x".bin', spooled)]
+    assert asyncio.run(workdrive.cliq_share_files_to_chat("t", "chat", files, message_text="hi")) == {"ok": True}
+    assert not spooled._rolled
+    headers, body = sent[0]
+    assert sent[1][1] == body and int(headers["Content-Length"]) == len(body)
+    expected = httpx.Request("POST", "https://cliq", headers={"Content-Type": headers["Content-Type"]}, data={"text": "hi"},
+                             files=[("file", ("a.txt", b"plain")), ("file", ('b "x".bin', b"z" * 5000))])
+    assert body == expected.read()